@@ -1,372 +1,271 @@
+import os
+import time
+from importlib.util import find_spec
+from multiprocessing import get_all_start_methods, get_context
+
 import streamlit as st
-import pulp
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-from copy import deepcopy
-
-# --- Constants and Configuration ---
-# Default values, these can be overridden by user input below
-
-# Ingredients
-INGREDIENTS = ['Coffee Beans', 'Milk Foam', 'Steamed Milk', 'Chocolate Powder']
-DRINKS = ['Cappuccino', 'Latte', 'Mocha']
-DAYS = list(range(7))
-DAY_NAMES = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
-
-# Default Costs per kg
-DEFAULT_STANDARD_COSTS = {
-    'Coffee Beans': 14.0, 'Milk Foam': 8.0, 'Steamed Milk': 6.0, 'Chocolate Powder': 5.0
-}
-# Default Thursday discount rate (e.g., 0.15 for 15%)
-DEFAULT_THURSDAY_DISCOUNT_RATE = 0.15
-
-# Default Inventory holding costs per kg per day
-DEFAULT_HOLDING_COSTS = {
-    'Coffee Beans': 2.6, 'Milk Foam': 0.6, 'Steamed Milk': 1.0, 'Chocolate Powder': 0.3
-}
-
-# Days when ordering is NOT allowed (0-indexed: Tue, Fri)
-NO_ORDER_DAYS = [1, 4]
-
-# Ingredient quantities per drink (kg) - ASSUMPTIONS
-KG_PER_DRINK = {
-    'Coffee Beans':     {'Cappuccino': 0.040, 'Latte': 0.025, 'Mocha': 0.030},
-    'Milk Foam':        {'Cappuccino': 0.010, 'Latte': 0.005, 'Mocha': 0.0},
-    'Steamed Milk':     {'Cappuccino': 0.010, 'Latte': 0.020, 'Mocha': 0.020},
-    'Chocolate Powder': {'Cappuccino': 0.0,   'Latte': 0.0,   'Mocha': 0.015}
-}
-
-# Predicted weekly sales (used if 'Use Predicted Demand' is checked)
-PREDICTED_SALES = {
-    'Cappuccino': np.array([51, 48, 55, 113, 136, 112, 69]),
-    'Latte':      np.array([80, 43, 56, 94, 120, 140, 64]),
-    'Mocha':      np.array([55, 45, 58, 131, 165, 132, 83])
-}
-
-# --- Helper Function: Calculate Demand ---
-# (No changes needed in this function)
-def calculate_demand_from_sales(daily_sales):
-    """Calculates ingredient demand based on drink sales."""
-    demand_kg = {ing: np.zeros(len(DAYS)) for ing in INGREDIENTS}
-    for ing in INGREDIENTS:
-        for drink in DRINKS:
-            # Check if ingredient is used in the drink and recipe exists
-            if drink in KG_PER_DRINK.get(ing, {}):
-                 demand_kg[ing] += daily_sales[drink] * KG_PER_DRINK[ing][drink]
-
-    # Format into the dictionary structure needed by the solver
-    demand_dict = {
-        ing: {day: demand_kg[ing][day] for day in DAYS} for ing in INGREDIENTS
-    }
-    return demand_dict
-
-# --- Core LP Solver Function ---
-# Modified to accept cost parameters
-def solve_ordering_plan(demand, standard_costs, thursday_discount_rate, holding_costs):
-    """Solves the LP model for material ordering using provided cost parameters."""
-
-    # Calculate Thursday costs based on the discount rate
-    thursday_costs = {k: v * (1 - thursday_discount_rate) for k, v in standard_costs.items()}
-
-    # Create effective cost dictionary: cost[ingredient][day]
-    effective_cost = {}
-    for ing in INGREDIENTS:
-        effective_cost[ing] = {}
-        for day in DAYS:
-            effective_cost[ing][day] = thursday_costs[ing] if day == 3 else standard_costs[ing]
-
-    # Create the minimization problem
-    prob = pulp.LpProblem("Material_Ordering_Plan_UI_Dynamic", pulp.LpMinimize) # Renamed for clarity
-
-    # Define Decision Variables
-    order_vars = pulp.LpVariable.dicts("Order",
-                                       ((ing, day) for ing in INGREDIENTS for day in DAYS),
-                                       lowBound=0, cat='Continuous')
-    inventory_vars = pulp.LpVariable.dicts("Inventory",
-                                           ((ing, day) for ing in INGREDIENTS for day in DAYS),
-                                           lowBound=0, cat='Continuous')
-
-    # Define Objective Function - using passed holding_costs and calculated effective_cost
-    prob += pulp.lpSum(effective_cost[ing][day] * order_vars[ing, day] for ing in INGREDIENTS for day in DAYS) + \
-            pulp.lpSum(holding_costs[ing] * inventory_vars[ing, day] for ing in INGREDIENTS for day in DAYS), \
-            "Total Cost"
-
-    # Define Constraints
-    # Inventory Balance
-    for ing in INGREDIENTS:
-        for day in DAYS:
-            if day == 0:
-                prob += inventory_vars[ing, day] == order_vars[ing, day] - demand[ing][day], \
-                        f"Inv_Balance_{ing}_Day_{day}"
-            else:
-                prob += inventory_vars[ing, day] == inventory_vars[ing, day-1] + order_vars[ing, day] - demand[ing][day], \
-                        f"Inv_Balance_{ing}_Day_{day}"
-    # Ordering Restriction
-    for ing in INGREDIENTS:
-        for day in NO_ORDER_DAYS:
-            prob += order_vars[ing, day] == 0, f"No_Order_{ing}_Day_{day}"
-
-    # Solve the Problem
-    # Set a short timeout for the solver (e.g., 10 seconds)
-    solver = pulp.PULP_CBC_CMD(msg=0, timeLimit=10) 
-    prob.solve(solver)
-
-    # --- Extract Results ---
-    results = {"status": pulp.LpStatus[prob.status]}
-    if prob.status == pulp.LpStatusOptimal:
-        results["total_cost"] = pulp.value(prob.objective)
-
-        # Extract order quantities
-        order_plan = pd.DataFrame(index=INGREDIENTS, columns=DAY_NAMES, dtype=float)
-        for ing in INGREDIENTS:
-            for day in DAYS:
-                order_val = order_vars[ing, day].varValue
-                order_plan.loc[ing, DAY_NAMES[day]] = order_val if order_val is not None and order_val > 1e-6 else 0.0
-
-        # Extract inventory levels
-        inventory_levels = pd.DataFrame(index=INGREDIENTS, columns=DAY_NAMES, dtype=float)
-        for ing in INGREDIENTS:
-            for day in DAYS:
-                inv_val = inventory_vars[ing, day].varValue
-                inventory_levels.loc[ing, DAY_NAMES[day]] = inv_val if inv_val is not None and inv_val > 1e-6 else 0.0
-
-        results["order_plan_df"] = order_plan
-        results["inventory_levels_df"] = inventory_levels
-        
-    elif prob.status == pulp.LpStatusNotSolved:
-        results["status"] = "TimeLimitReached" # Provide a more specific status
-
 
-    return results
-
-def enhanced_solve_ordering_plan(demand, standard_costs, thursday_discount_rate, holding_costs, 
-                          expiry_days=None, min_order_quantities=None, stockout_costs=None, 
-                          ordering_days=None, max_solver_time=20):
+# matplotlib, PuLP and the scenario models (scipy) are imported where they are
+# first used, so a cold start and a rerun that needs none of them stay fast
+from ordering_model import (
+    INGREDIENTS, DAYS, DAY_NAMES,
+    DEFAULT_STANDARD_COSTS, DEFAULT_THURSDAY_DISCOUNT_RATE, DEFAULT_HOLDING_COSTS,
+    NO_ORDER_DAYS, DISCOUNT_DAYS,
+    solve_ordering_plan, enhanced_solve_ordering_plan,
+    apply_seasonal_factors, run_sensitivity_analysis,
+)
+from menu_registry import DEFAULT_MENU, MenuRegistry
+from solve_cache import default_cache
+from job_executor import ACTIVE_STATES, JobExecutor
+from diagnostics import log_diagnostics
+
+# Scenario-based planning needs scipy
+STOCHASTIC_AVAILABLE = find_spec("scipy") is not None
+# A persistent HiGHS model in the session (re-solves of MIPs from the kept model) needs highspy
+HIGHS_AVAILABLE = find_spec("highspy") is not None
+
+ADVANCED_TABS = ["New Product Design", "Seasonal Demand", "Ordering Policy", "Expiry Constraints",
+                 "Stockout Analysis", "Sensitivity Analysis"]
+# Keys (or key prefixes) of the advanced-feature widgets, whose values must outlive their tab
+ADVANCED_WIDGET_KEYS = ("new_drink_name", "new_recipe_", "use_seasonal", "seasonal_", "policy_type", "order_day_",
+                        "min_order_", "use_expiry", "expiry_", "use_stockout", "stockout_", "use_stochastic",
+                        "n_scenarios", "analysis_param", "parametric_curve")
+
+
+def show_diagnostics(results):
+    """Optional panel with per-phase timings, model size and solver statistics."""
+    diagnostics = results.get("diagnostics")
+    if not diagnostics or not st.session_state.get("show_diagnostics"):
+        return
+    with st.expander("Solver Diagnostics", expanded=False):
+        source = " (from solve cache)" if diagnostics.get("cached") else ""
+        st.caption(f"Backend: {diagnostics['backend']}{source}")
+        phases = pd.DataFrame(diagnostics["phases"]).T.rename(
+            columns={"wall_s": "Wall (ms)", "cpu_s": "CPU (ms)"}) * 1e3
+        st.dataframe(phases.style.format("{:.2f}"))
+        stats = {**diagnostics["model"], **diagnostics["solver"]}
+        if stats:
+            st.dataframe(pd.DataFrame({"Value": pd.Series(stats, dtype=object)}))
+
+def plan_download(results, key):
+    """Download button for a plan as Parquet (long format, see data_io.plan_table)."""
+    from data_io import parquet_bytes, plan_table
+
+    st.download_button("Download plan (Parquet)", parquet_bytes(plan_table(results)),
+                       file_name="order_plan.parquet", mime="application/vnd.apache.parquet", key=key)
+
+@st.cache_data
+def cached_forecast_residuals(drinks, history_path="demand_history.xlsx"):
+    """Forecast errors of ``drinks`` on the sales history (cached across reruns), or None if one has no history."""
+    from stochastic_model import forecast_residuals
+    try:
+        return forecast_residuals(history_path, drinks=list(drinks))
+    except ValueError:
+        return None
+
+def scenario_residuals(menu):
+    """Residuals for scenario sampling on ``menu``; warns and returns None when a drink has no sales history."""
+    residuals = cached_forecast_residuals(menu.drinks)
+    if residuals is None:
+        st.warning("Scenario planning needs sales history for every drink on the menu. Drinks added in this "
+                   "session have none, so the plan under demand uncertainty is not available.")
+    return residuals
+
+# The menu caches are keyed by menu version (unique per snapshot); the snapshot itself is not hashed
+@st.cache_data
+def default_sales_table(version, _menu):
+    """Predicted sales as the (drink x day) table of the demand editor, per menu version."""
+    return pd.DataFrame({day_name: {drink: int(_menu.default_sales[drink][i]) for drink in _menu.drinks}
+                         for i, day_name in enumerate(DAY_NAMES)})
+
+@st.cache_data
+def predicted_demand(version, _menu):
+    """Ingredient demand of the predicted sales, per menu version."""
+    return _menu.demand_from_sales(_menu.default_sales)
+
+@st.cache_resource
+def recipe_table(version, _menu):
+    """Recipe matrix as a (drink x ingredient) table, built once per menu version and shared by all sessions."""
+    return pd.DataFrame(_menu.recipe.T, index=list(_menu.drinks), columns=list(_menu.ingredients))
+
+def ingredient_demand_for(sales, menu):
+    """Ingredient demand of ``sales``; the menu's predicted sales are exploded once per version."""
+    if sales is menu.default_sales:
+        return predicted_demand(menu.version, menu)
+    return menu.demand_from_sales(sales)
+
+def keep_widget_state(keys):
     """
-    Enhanced LP solver that includes additional features:
-    - Ingredient expiry constraints
-    - Minimum order quantities
-    - Stockout costs
-    - Custom ordering days
+    Keep the values of widgets that are not drawn in this run (Streamlit drops
+    the state of widgets that are not rendered), by re-saving them before any
+    widget is created.
     """
-    # Calculate Thursday costs based on the discount rate
-    thursday_costs = {k: v * (1 - thursday_discount_rate) for k, v in standard_costs.items()}
-
-    # Create effective cost dictionary: cost[ingredient][day]
-    effective_cost = {}
-    for ing in INGREDIENTS:
-        effective_cost[ing] = {}
-        for day in DAYS:
-            effective_cost[ing][day] = thursday_costs[ing] if day == 3 else standard_costs[ing]
-
-    # Create the minimization problem
-    prob = pulp.LpProblem("Enhanced_Material_Ordering_Plan", pulp.LpMinimize)
-
-    # Define Decision Variables
-    order_vars = pulp.LpVariable.dicts("Order",
-                                     ((ing, day) for ing in INGREDIENTS for day in DAYS),
-                                     lowBound=0, cat='Continuous')
-    
-    inventory_vars = pulp.LpVariable.dicts("Inventory",
-                                         ((ing, day) for ing in INGREDIENTS for day in DAYS),
-                                         lowBound=0, cat='Continuous')
-    
-    # Define stockout variables if needed
-    stockout_vars = None
-    if stockout_costs:
-        stockout_vars = pulp.LpVariable.dicts("Stockout",
-                                           ((ing, day) for ing in INGREDIENTS for day in DAYS),
-                                           lowBound=0, cat='Continuous')
-    
-    # Define binary variables for minimum order quantities if needed
-    order_decision_vars = None
-    if min_order_quantities:
-        order_decision_vars = pulp.LpVariable.dicts("OrderDecision",
-                                                 ((ing, day) for ing in INGREDIENTS for day in DAYS),
-                                                 cat='Binary')
-
-    # Define Objective Function
-    obj_function = pulp.lpSum(effective_cost[ing][day] * order_vars[ing, day] 
-                            for ing in INGREDIENTS for day in DAYS) + \
-                 pulp.lpSum(holding_costs[ing] * inventory_vars[ing, day] 
-                            for ing in INGREDIENTS for day in DAYS)
-    
-    # Add stockout costs to objective function if applicable
-    if stockout_costs:
-        obj_function += pulp.lpSum(stockout_costs[ing] * stockout_vars[ing, day]
-                                for ing in INGREDIENTS for day in DAYS)
-    
-    prob += obj_function, "Total Cost"
-
-    # Define Constraints
-    # Inventory Balance
-    for ing in INGREDIENTS:
-        for day in DAYS:
-            if stockout_costs:  # If we're handling stockouts
-                if day == 0:
-                    prob += inventory_vars[ing, day] - stockout_vars[ing, day] == \
-                            order_vars[ing, day] - demand[ing][day], \
-                            f"Inv_Balance_{ing}_Day_{day}"
-                else:
-                    prob += inventory_vars[ing, day] - stockout_vars[ing, day] == \
-                            inventory_vars[ing, day-1] + order_vars[ing, day] - demand[ing][day], \
-                            f"Inv_Balance_{ing}_Day_{day}"
-            else:  # Standard inventory balance
-                if day == 0:
-                    prob += inventory_vars[ing, day] == order_vars[ing, day] - demand[ing][day], \
-                            f"Inv_Balance_{ing}_Day_{day}"
-                else:
-                    prob += inventory_vars[ing, day] == inventory_vars[ing, day-1] + \
-                            order_vars[ing, day] - demand[ing][day], \
-                            f"Inv_Balance_{ing}_Day_{day}"
-    
-    # Ordering Restriction - use custom ordering days if provided, else use default NO_ORDER_DAYS
-    no_order_days_to_use = NO_ORDER_DAYS
-    if ordering_days is not None:
-        no_order_days_to_use = [day for day in DAYS if day not in ordering_days]
-    
-    for ing in INGREDIENTS:
-        for day in no_order_days_to_use:
-            prob += order_vars[ing, day] == 0, f"No_Order_{ing}_Day_{day}"
-    
-    # Minimum Order Quantity constraints
-    if min_order_quantities and order_decision_vars:
-        for ing in INGREDIENTS:
-            min_qty = min_order_quantities.get(ing, 0)
-            if min_qty > 0:
-                for day in DAYS:
-                    if day not in no_order_days_to_use:
-                        # If ordered, must be at least min_qty
-                        prob += order_vars[ing, day] <= 1000 * order_decision_vars[ing, day], \
-                                f"Order_Decision_Upper_{ing}_{day}"
-                        prob += order_vars[ing, day] >= min_qty * order_decision_vars[ing, day], \
-                                f"Min_Order_{ing}_{day}"
-    
-    # Expiry constraints - ensure inventory age doesn't exceed expiry days
-    if expiry_days:
-        # This is a simplified approach - for each ingredient with an expiry constraint
-        # we ensure that inventory ordered on a specific day is used within its expiry period
-        for ing in INGREDIENTS:
-            max_days = expiry_days.get(ing)
-            if max_days and max_days > 0 and max_days < len(DAYS):
-                for start_day in range(len(DAYS) - max_days + 1):
-                    end_day = start_day + max_days - 1
-                    # Sum of orders from start to end must equal sum of demand in that period
-                    if end_day < len(DAYS):
-                        total_orders = pulp.lpSum(order_vars[ing, day] for day in range(start_day, end_day + 1))
-                        total_demand = pulp.lpSum(demand[ing][day] for day in range(start_day, end_day + 1))
-                        # Ensure we don't order more than can be consumed within expiry period
-                        prob += total_orders <= total_demand + \
-                                (0 if start_day == 0 else inventory_vars[ing, start_day-1]), \
-                                f"Expiry_{ing}_StartDay_{start_day}_EndDay_{end_day}"
-
-    # Solve the Problem
-    solver = pulp.PULP_CBC_CMD(msg=0, timeLimit=max_solver_time)
-    prob.solve(solver)
-
-    # --- Extract Results ---
-    results = {"status": pulp.LpStatus[prob.status]}
-    
-    if prob.status == pulp.LpStatusOptimal:
-        results["total_cost"] = pulp.value(prob.objective)
-
-        # Extract order quantities
-        order_plan = pd.DataFrame(index=INGREDIENTS, columns=DAY_NAMES, dtype=float)
-        for ing in INGREDIENTS:
-            for day in DAYS:
-                order_val = order_vars[ing, day].varValue
-                order_plan.loc[ing, DAY_NAMES[day]] = order_val if order_val is not None and order_val > 1e-6 else 0.0
-
-        # Extract inventory levels
-        inventory_levels = pd.DataFrame(index=INGREDIENTS, columns=DAY_NAMES, dtype=float)
-        for ing in INGREDIENTS:
-            for day in DAYS:
-                inv_val = inventory_vars[ing, day].varValue
-                inventory_levels.loc[ing, DAY_NAMES[day]] = inv_val if inv_val is not None and inv_val > 1e-6 else 0.0
-
-        results["order_plan_df"] = order_plan
-        results["inventory_levels_df"] = inventory_levels
-        
-        # Extract stockout information if applicable
-        if stockout_vars:
-            stockout_levels = pd.DataFrame(index=INGREDIENTS, columns=DAY_NAMES, dtype=float)
-            for ing in INGREDIENTS:
-                for day in DAYS:
-                    stockout_val = stockout_vars[ing, day].varValue
-                    stockout_levels.loc[ing, DAY_NAMES[day]] = stockout_val if stockout_val is not None and stockout_val > 1e-6 else 0.0
-            results["stockout_levels_df"] = stockout_levels
+    for key in list(st.session_state.keys()):
+        if key.startswith(keys):
+            st.session_state[key] = st.session_state[key]
+
+@st.cache_resource
+def job_executor():
+    """One background solve executor shared by all sessions of this server."""
+    # forkserver: workers are not forked from the multi-threaded server process
+    context = get_context("forkserver") if "forkserver" in get_all_start_methods() else None
+    return JobExecutor(max_workers=int(os.environ.get("COFFEE_SOLVE_WORKERS", 0)) or None, mp_context=context)
+
+
+def _job_progress(state_key, label, render_partial=None):
+    """Progress bar, cancel button and partial results of a running job."""
+    status = job_executor().status(st.session_state.get(state_key))
+    if status is None or status["state"] not in ACTIVE_STATES:
+        st.rerun()  # finished: redraw the page with the results
+    st.progress(status["done"] / max(status["total"], 1),
+                text=f"{label}... {status['done']}/{status['total']} done ({status['elapsed_s']:.0f}s)")
+    if st.button("Cancel", key=f"{state_key}_cancel"):
+        job_executor().cancel(status["id"])
+        st.rerun()
+    if render_partial is not None and status["results"]:
+        render_partial(status["results"])
+
+
+# Re-run only the progress panel while a job is running (Streamlit >= 1.33)
+_fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None)
+_job_progress_live = _fragment(run_every=0.5)(_job_progress) if _fragment else None
+
+
+def poll_job(state_key, label, render_partial=None):
+    """
+    Show the progress of the session's job stored under ``state_key``.
+    Returns the job status once it has finished, otherwise None.
+    """
+    job_id = st.session_state.get(state_key)
+    if job_id is None:
+        return None
+    status = job_executor().status(job_id)
+    if status is None:  # forgotten by the executor (e.g. after a server restart)
+        del st.session_state[state_key]
+        return None
+    if status["state"] == "cancelled":
+        st.warning(f"{label} was cancelled.")
+        return None
+    if status["state"] == "done":
+        return status
+    if _job_progress_live is not None:
+        _job_progress_live(state_key, label, render_partial)
+    else:
+        _job_progress(state_key, label, render_partial)
+        time.sleep(0.5)
+        st.rerun()
+    return None
+
+
+def job_result(state_key, label, source):
+    """Result of the session's finished single-solve job (logged once), or None."""
+    status = poll_job(state_key, label)
+    if status is None or not status["results"]:
+        return None
+    result = status["results"][0][1]
+    if st.session_state.get(f"{state_key}_logged") != status["id"]:
+        log_diagnostics(result, source=source)
+        st.session_state[f"{state_key}_logged"] = status["id"]
+    return result
+
+def plot_sensitivity(job_results, param_name, x_label, final=True, estimated=()):
+    """Cost curve and table of the sensitivity points solved so far plus those ``estimated`` from ranging."""
+    solved = [point for _, result in job_results if isinstance(result, list) for point in result]
+    sources = {x: "Re-solved" for x, _ in solved}
+    sources.update({x: "Ranging (no re-solve)" for x, _ in estimated})
+    valid_results = sorted((x, y) for x, y in [*solved, *estimated] if y is not None)
+    if not valid_results:
+        if final:
+            st.error("Sensitivity analysis failed to produce valid results. Try different parameter values.")
+        return
+    x_vals, y_vals = zip(*valid_results)
+    
+    import matplotlib.pyplot as plt
+    fig, ax = plt.subplots(figsize=(10, 6))
+    ax.plot(x_vals, y_vals, marker='o', linestyle='-', linewidth=2, markersize=8)
+    if estimated:
+        est_x, est_y = zip(*estimated)
+        ax.scatter(est_x, est_y, s=160, facecolors='none', edgecolors='green', linewidths=2, zorder=3,
+                   label="From ranging (no re-solve)")
+        ax.legend()
+    
+    if param_name == "thursday_discount":
+        ax.set_xlabel("Thursday Discount Rate")
+        ax.set_xticks(x_vals)
+        ax.set_xticklabels([f"{x*100:.0f}%" for x in x_vals])
+    else:
+        ax.set_xlabel(x_label)
         
-    elif prob.status == pulp.LpStatusNotSolved:
-        results["status"] = "TimeLimitReached"  # Provide a more specific status
-
-    return results
-
-# --- Helper Functions for Extensions ---
-def apply_seasonal_factors(sales_data, seasonal_factors):
-    """Apply seasonal adjustment factors to sales data."""
-    adjusted_sales = deepcopy(sales_data)
+    ax.set_ylabel("Total Cost ($)")
+    ax.set_title(f"Sensitivity Analysis: Impact of {x_label} on Total Cost")
+    ax.grid(True, linestyle='--', alpha=0.7)
     
-    for drink in adjusted_sales:
-        for day_idx, day_name in enumerate(DAY_NAMES):
-            factor = seasonal_factors.get(day_name, 1.0)
-            adjusted_sales[drink][day_idx] = int(adjusted_sales[drink][day_idx] * factor)
-            
-    return adjusted_sales
-
-def create_new_drink(name, recipe):
-    """Add a new drink to the system with its recipe."""
-    # Add drink name to the list
-    if name in DRINKS:
-        return False, f"Drink '{name}' already exists."
-    
-    # Add recipe for each ingredient
-    for ing in INGREDIENTS:
-        if ing not in KG_PER_DRINK:
-            KG_PER_DRINK[ing] = {}
-        KG_PER_DRINK[ing][name] = recipe[ing]
-    
-    # Add the drink to the global list
-    DRINKS.append(name)
-    
-    return True, f"Drink '{name}' added successfully."
-
-def run_sensitivity_analysis(base_demand, base_costs, parameter_name, values, current_value, 
-                           holding_costs, thursday_discount=None):
-    """Run a sensitivity analysis by varying one parameter and solving the model for each value."""
-    results = []
-    
-    for val in values:
-        if parameter_name == 'thursday_discount':
-            # Vary Thursday discount rate
-            result = solve_ordering_plan(
-                base_demand, base_costs, val, holding_costs
-            )
-        elif parameter_name == 'holding_cost_factor':
-            # Vary holding costs by a factor
-            modified_holding_costs = {ing: cost * val for ing, cost in holding_costs.items()}
-            result = solve_ordering_plan(
-                base_demand, base_costs, thursday_discount, modified_holding_costs
-            )
-        elif parameter_name == 'demand_factor':
-            # Vary demand by a factor
-            modified_demand = {}
-            for ing in INGREDIENTS:
-                modified_demand[ing] = {day: base_demand[ing][day] * val for day in DAYS}
-            result = solve_ordering_plan(
-                modified_demand, base_costs, thursday_discount, holding_costs
-            )
-            
-        if result["status"] == 'Optimal':
-            results.append((val, result["total_cost"]))
-        else:
-            results.append((val, None))
-            
-    return results
+    # Add data labels
+    for x, y in zip(x_vals, y_vals):
+        ax.annotate(f"${y:.2f}", 
+                   (x, y),
+                   textcoords="offset points",
+                   xytext=(0,10), 
+                   ha='center')
+    
+    st.pyplot(fig)
+    plt.close(fig)
+    
+    # Show data table
+    result_df = pd.DataFrame({
+        x_label: x_vals,
+        "Total Cost": [f"${y:.2f}" for y in y_vals],
+        "Source": [sources[x] for x in x_vals]
+    })
+    st.dataframe(result_df)
+
+def plot_cost_curve(curve, x_label):
+    """Exact piecewise-linear cost curve from ``parametric_cost_curve``, its segments and the plan on each."""
+    segments = curve["segments"]
+    x_vals = [segment["start"] for segment in segments] + [segments[-1]["end"]]
+    y_vals = [segment["cost_start"] for segment in segments] + [segments[-1]["cost_end"]]
+    percent = curve["parameter"] == "thursday_discount"
+    fmt = (lambda x: f"{x*100:.2f}%") if percent else (lambda x: f"{x:.4g}")
+
+    import matplotlib.pyplot as plt
+    fig, ax = plt.subplots(figsize=(10, 6))
+    ax.plot(x_vals, y_vals, linestyle='-', linewidth=2)
+    ax.scatter(x_vals[1:-1], y_vals[1:-1], s=60, color='red', zorder=3, label="Breakpoint")
+    for x, y in zip(x_vals[1:-1], y_vals[1:-1]):
+        ax.annotate(f"{fmt(x)}\n${y:.2f}", (x, y), textcoords="offset points", xytext=(0, 10), ha='center')
+    if len(x_vals) > 2:
+        ax.legend()
+    ax.set_xlabel(x_label)
+    ax.set_ylabel("Total Cost ($)")
+    ax.set_title(f"Exact Cost Curve: Impact of {x_label} on Total Cost")
+    ax.grid(True, linestyle='--', alpha=0.7)
+    st.pyplot(fig)
+    plt.close(fig)
+
+    st.caption(f"{len(segments)} segment(s), {len(curve['breakpoints'])} breakpoint(s), "
+               f"{curve['solves']} solve(s). The total cost is linear on each segment.")
+    labels = [f"{fmt(segment['start'])} to {fmt(segment['end'])}" for segment in segments]
+    st.dataframe(pd.DataFrame({
+        x_label: labels,
+        "Cost at Start": [f"${segment['cost_start']:.2f}" for segment in segments],
+        "Cost at End": [f"${segment['cost_end']:.2f}" for segment in segments],
+        "Cost per Unit": [f"${segment['slope']:,.2f}" for segment in segments],
+    }))
+    chosen = st.selectbox("Order plan on segment", range(len(segments)), format_func=labels.__getitem__,
+                          key="parametric_segment")
+    st.dataframe(pd.DataFrame(segments[chosen]["orders"], index=INGREDIENTS, columns=DAY_NAMES).round(2))
 
 # --- Streamlit User Interface ---
 
 st.set_page_config(layout="wide") # Use wide layout for better table display
+keep_widget_state(ADVANCED_WIDGET_KEYS)
+# Each session has its own menu registry, so drinks added here stay in this session.
+# The whole run uses one immutable snapshot of it.
+if "menu_registry" not in st.session_state:
+    st.session_state.menu_registry = MenuRegistry(DEFAULT_MENU)
+menu = st.session_state.menu_registry.current()
 st.title("☕ Coffee Shop Material Ordering Planner")
 
 # --- Input Sections in Columns ---
@@ -390,15 +289,11 @@ with input_col1:
 
     st.subheader("Daily Drink Sales Forecast (Units)")
     # Initialize dictionary to store user inputs
-    manual_sales = {drink: np.zeros(len(DAYS), dtype=int) for drink in DRINKS}
+    manual_sales = {drink: np.zeros(len(DAYS), dtype=int) for drink in menu.drinks}
 
     # Use st.data_editor for a more compact input table
     # Prepare data for the editor
-    demand_data = {}
-    for i, day_name in enumerate(DAY_NAMES):
-        demand_data[day_name] = {drink: int(PREDICTED_SALES[drink][i]) for drink in DRINKS}
-    
-    demand_df = pd.DataFrame(demand_data)
+    demand_df = default_sales_table(menu.version, menu)
     
     # Display the editor - only editable if use_predicted is False
     edited_demand_df = st.data_editor(
@@ -409,7 +304,7 @@ with input_col1:
     
     # Convert edited data back to the required format if not using predicted
     if not use_predicted:
-        for drink in DRINKS:
+        for drink in menu.drinks:
              manual_sales[drink] = edited_demand_df.loc[drink].values.astype(int)
 
 
@@ -466,10 +361,10 @@ current_holding_costs = {ing: st.session_state.get(f"holding_{ing}", DEFAULT_HOL
 
 # Determine which sales data to use outside the columns
 if use_predicted:
-    sales_to_use = PREDICTED_SALES
+    sales_to_use = menu.default_sales
     # Display the predicted sales being used
     st.sidebar.info("Using pre-defined predicted sales data.")
-    # st.sidebar.dataframe(pd.DataFrame({drink: sales_to_use[drink] for drink in DRINKS}, index=DAY_NAMES).T) 
+    # st.sidebar.dataframe(pd.DataFrame({drink: sales_to_use[drink] for drink in menu.drinks}, index=DAY_NAMES).T) 
 else:
     sales_to_use = manual_sales
     st.sidebar.info("Using manually entered sales data.")
@@ -484,21 +379,24 @@ if st.button("Calculate Optimal Ordering Plan", key="calculate_button"):
     # 1. Calculate ingredient demand based on selected sales data
     # Ensure sales_to_use is correctly formatted if using manual data from data_editor
     if not use_predicted:
-        sales_data_for_calc = {drink: edited_demand_df.loc[drink].values.astype(int) for drink in DRINKS}
+        sales_data_for_calc = {drink: edited_demand_df.loc[drink].values.astype(int) for drink in menu.drinks}
     else:
         sales_data_for_calc = sales_to_use
 
-    ingredient_demand = calculate_demand_from_sales(sales_data_for_calc)
+    ingredient_demand = ingredient_demand_for(sales_data_for_calc, menu)
 
-    # 2. Solve the LP problem using current cost parameters from the UI
-    with st.spinner("Calculating optimal plan..."):
-        results = solve_ordering_plan(
-            ingredient_demand,
-            current_standard_costs,
-            current_thursday_discount_rate,
-            current_holding_costs
-        )
+    # 2. Solve the LP problem in the background using current cost parameters from the UI
+    st.session_state.basic_job = job_executor().submit(
+        solve_ordering_plan,
+        label="Optimal plan",
+        demand=ingredient_demand,
+        standard_costs=current_standard_costs,
+        thursday_discount_rate=current_thursday_discount_rate,
+        holding_costs=current_holding_costs
+    )
 
+results = job_result("basic_job", "Calculating optimal plan", "app.basic")
+if results is not None:
     # 3. Display Results
     st.subheader("4. Results") # Renumbered section
     if results["status"] == 'Optimal':
@@ -511,6 +409,7 @@ if st.button("Calculate Optimal Ordering Plan", key="calculate_button"):
 
         st.markdown("#### End-of-Day Inventory Levels (kg)")
         st.dataframe(results["inventory_levels_df"].style.format("{:.2f}"))
+        plan_download(results, "download_basic_plan")
 
     elif results["status"] == 'TimeLimitReached':
          st.warning(f"Solver stopped due to time limit. The solution might not be optimal.")
@@ -525,8 +424,9 @@ if st.button("Calculate Optimal Ordering Plan", key="calculate_button"):
     else:
         st.error(f"Solver Status: {results['status']}. Could not find an optimal solution.")
         st.warning("Check if demand is feasible with ordering constraints and costs.")
+    show_diagnostics(results)
 
-else:
+elif "basic_job" not in st.session_state:
     st.info("Adjust demand and/or cost parameters, then click the button to calculate the plan.") # Updated info message
 
 # Add some explanation in the sidebar
@@ -546,24 +446,19 @@ to minimize total costs (ordering + holding) based on demand forecasts and cost
 # --- Extension Features (Problem 6) ---
 st.divider()
 st.header("5. Advanced Features")
-tab_new_drink, tab_seasonal, tab_ordering_policy, tab_expiry, tab_stockout, tab_sensitivity = st.tabs([
-    "New Product Design", 
-    "Seasonal Demand", 
-    "Ordering Policy",
-    "Expiry Constraints", 
-    "Stockout Analysis",
-    "Sensitivity Analysis"
-])
+# Only the selected feature's widgets are built on a rerun (st.tabs would build all six)
+active_tab = st.radio("Feature", ADVANCED_TABS, horizontal=True, key="advanced_tab",
+                      label_visibility="collapsed")
 
 # --- Tab 1: New Product Design ---
-with tab_new_drink:
+if active_tab == "New Product Design":
     st.subheader("Add New Drink Product")
     st.write("Design a new drink by defining its ingredient recipe.")
     
     col1, col2 = st.columns([2, 3])
     
     with col1:
-        new_drink_name = st.text_input("New Drink Name", "")
+        new_drink_name = st.text_input("New Drink Name", "", key="new_drink_name")
         
     with col2:
         st.write("Recipe (kg per drink):")
@@ -582,7 +477,9 @@ with tab_new_drink:
     
     if st.button("Add New Drink", key="add_drink_btn"):
         if new_drink_name.strip():
-            success, message = create_new_drink(new_drink_name, new_recipe)
+            # Add a placeholder default demand for the new drink
+            default_demand = np.array([50, 45, 55, 100, 120, 110, 65])  # reasonable default values
+            success, message = st.session_state.menu_registry.add_drink(new_drink_name, new_recipe, default_demand)
             if success:
                 st.success(message)
                 # Update the input table to include the new drink
@@ -590,10 +487,7 @@ with tab_new_drink:
                 if "use_predicted_demand" in st.session_state:
                     # Create a flag to indicate we should rerun with use_predicted_demand=False next time
                     st.session_state["force_manual_input"] = True
-                # Add a placeholder default demand for the new drink
-                default_demand = np.array([50, 45, 55, 100, 120, 110, 65])  # reasonable default values
-                PREDICTED_SALES[new_drink_name] = default_demand
-                st.experimental_rerun()  # Rerun to refresh UI with new drink
+                st.rerun()  # Rerun to refresh UI with new drink
             else:
                 st.error(message)
         else:
@@ -601,18 +495,15 @@ with tab_new_drink:
     
     # Display current drinks and recipes
     with st.expander("View Current Drinks and Recipes", expanded=False):
-        # 使用 if True 来确保每次展开时都会重新计算最新的饮品列表
+        # 按当前饮品列表缓存配方表，添加新饮品后会重新生成
         if True:
-            recipe_df = pd.DataFrame(index=DRINKS)
-            for ing in INGREDIENTS:
-                recipe_df[ing] = [KG_PER_DRINK[ing].get(drink, 0.0) for drink in DRINKS]
-            st.dataframe(recipe_df.style.format("{:.3f} kg"))
+            st.dataframe(recipe_table(menu.version, menu).style.format("{:.3f} kg"))
             
             # 显示当前饮品列表，确保用户可以看到最新添加的饮品
-            st.write(f"当前饮品列表: {', '.join(DRINKS)}")
+            st.write(f"当前饮品列表: {', '.join(menu.drinks)}")
 
 # --- Tab 2: Seasonal Demand Adjustments ---
-with tab_seasonal:
+if active_tab == "Seasonal Demand":
     st.subheader("Seasonal Demand Adjustment")
     st.write("Adjust daily demand by applying seasonal factors.")
     
@@ -636,7 +527,7 @@ with tab_seasonal:
         
         # Preview the effect
         if st.button("Preview Adjusted Demand", key="preview_seasonal"):
-            base_sales = sales_to_use if use_predicted else {drink: edited_demand_df.loc[drink].values for drink in DRINKS}
+            base_sales = sales_to_use if use_predicted else {drink: edited_demand_df.loc[drink].values for drink in menu.drinks}
             adjusted_sales = apply_seasonal_factors(base_sales, seasonal_factors)
             
             # Show before/after comparison
@@ -654,7 +545,7 @@ with tab_seasonal:
         st.info("Seasonal adjustment is disabled. Enable it to apply day-specific demand multipliers.")
 
 # --- Tab 3: Ordering Policy ---
-with tab_ordering_policy:
+if active_tab == "Ordering Policy":
     st.subheader("Ordering Policy Optimization")
     st.write("Adjust ordering constraints to explore different policies.")
     
@@ -696,9 +587,10 @@ with tab_ordering_policy:
                 )
 
 # --- Tab 4: Expiry Constraints ---
-with tab_expiry:
+if active_tab == "Expiry Constraints":
     st.subheader("Ingredient Expiry Constraints")
-    st.write("Set expiry periods for ingredients to prevent waste.")
+    st.write("Set expiry periods for ingredients to prevent waste. Stock is used first-in, first-out, "
+             "and anything older than its expiry period is discarded.")
     
     use_expiry = st.checkbox("Enable Expiry Constraints", value=False, key="use_expiry")
     
@@ -721,7 +613,7 @@ with tab_expiry:
         st.info("Expiry constraints are disabled. Enable to limit how long ingredients can be stored.")
 
 # --- Tab 5: Stockout Analysis ---
-with tab_stockout:
+if active_tab == "Stockout Analysis":
     st.subheader("Stockout Cost Analysis")
     st.write("Include stockout costs to analyze trade-offs between stockouts and inventory.")
     
@@ -743,12 +635,21 @@ with tab_stockout:
                     format="%.1f",
                     key=f"stockout_{ing}"
                 )
+        
+        if STOCHASTIC_AVAILABLE:
+            use_stochastic = st.checkbox(
+                "Plan against demand uncertainty (scenarios from forecast errors)", value=False, key="use_stochastic",
+                help="Samples demand scenarios from the forecast errors on the sales history and finds the "
+                     "order plan with the lowest expected cost over all of them.")
+            if use_stochastic and scenario_residuals(menu) is not None:
+                st.slider("Number of demand scenarios", min_value=100, max_value=1000, value=200, step=100,
+                          key="n_scenarios")
     else:
         stockout_costs = None
         st.info("Stockout costs are disabled. Enable to allow the model to consider stockout penalties.")
 
 # --- Tab 6: Sensitivity Analysis ---
-with tab_sensitivity:
+if active_tab == "Sensitivity Analysis":
     st.subheader("Sensitivity Analysis")
     st.write("Analyze how changes in key parameters affect the optimal cost.")
     
@@ -775,69 +676,88 @@ with tab_sensitivity:
         st.write(f"Analyzing demand factors: {', '.join([str(v) for v in values])}")
         x_label = "Demand Factor"
         param_name = "demand_factor"
-    
+
+    trace_curve = st.checkbox(
+        "Trace the exact cost curve over this range (breakpoints and the plan on each segment)",
+        key="parametric_curve")
+
     if st.button("Run Sensitivity Analysis", key="run_sensitivity"):
-        with st.spinner("Running analysis..."):
-            # Calculate base demand from sales data
-            if use_predicted:
-                sales_data_for_calc = PREDICTED_SALES
-            else:
-                sales_data_for_calc = {drink: edited_demand_df.loc[drink].values.astype(int) for drink in DRINKS}
-                
-            # Apply seasonal adjustments if enabled
-            if "use_seasonal" in st.session_state and st.session_state.use_seasonal:
-                seasonal_factors_to_use = {day: st.session_state.get(f"seasonal_{day}", 1.0) for day in DAY_NAMES}
-                sales_data_for_calc = apply_seasonal_factors(sales_data_for_calc, seasonal_factors_to_use)
-                
-            base_demand = calculate_demand_from_sales(sales_data_for_calc)
+        # Calculate base demand from sales data
+        if use_predicted:
+            sales_data_for_calc = menu.default_sales
+        else:
+            sales_data_for_calc = {drink: edited_demand_df.loc[drink].values.astype(int) for drink in menu.drinks}
             
-            # Run sensitivity analysis
-            sensitivity_results = run_sensitivity_analysis(
-                base_demand, 
-                current_standard_costs,
-                param_name,
-                values,
-                current_thursday_discount_rate if param_name == "thursday_discount" else None,
-                current_holding_costs
-            )
+        # Apply seasonal adjustments if enabled
+        if "use_seasonal" in st.session_state and st.session_state.use_seasonal:
+            seasonal_factors_to_use = {day: st.session_state.get(f"seasonal_{day}", 1.0) for day in DAY_NAMES}
+            sales_data_for_calc = apply_seasonal_factors(sales_data_for_calc, seasonal_factors_to_use)
             
-            # Plot results
-            valid_results = [(x, y) for x, y in sensitivity_results if y is not None]
-            if valid_results:
-                x_vals, y_vals = zip(*valid_results)
-                
-                fig, ax = plt.subplots(figsize=(10, 6))
-                ax.plot(x_vals, y_vals, marker='o', linestyle='-', linewidth=2, markersize=8)
-                
-                if param_name == "thursday_discount":
-                    ax.set_xlabel("Thursday Discount Rate")
-                    x_tick_labels = [f"{x*100:.0f}%" for x in x_vals]
-                    ax.set_xticklabels(x_tick_labels)
-                else:
-                    ax.set_xlabel(x_label)
-                    
-                ax.set_ylabel("Total Cost ($)")
-                ax.set_title(f"Sensitivity Analysis: Impact of {x_label} on Total Cost")
-                ax.grid(True, linestyle='--', alpha=0.7)
-                
-                # Add data labels
-                for x, y in zip(x_vals, y_vals):
-                    ax.annotate(f"${y:.2f}", 
-                               (x, y),
-                               textcoords="offset points",
-                               xytext=(0,10), 
-                               ha='center')
-                
-                st.pyplot(fig)
-                
-                # Show data table
-                result_df = pd.DataFrame({
-                    x_label: x_vals,
-                    "Total Cost": [f"${y:.2f}" for y in y_vals]
-                })
-                st.dataframe(result_df)
+        base_demand = ingredient_demand_for(sales_data_for_calc, menu)
+
+        if trace_curve:
+            # Parametric mode: the exact curve from a few solves, no background job needed
+            from parametric import parametric_cost_curve
+            st.session_state.pop("sensitivity_job", None)
+            try:
+                st.session_state.sensitivity_curve = (parametric_cost_curve(
+                    base_demand, current_standard_costs, current_holding_costs, param_name, min(values),
+                    max(values), thursday_discount=current_thursday_discount_rate), x_label)
+            except ValueError as exc:
+                st.session_state.pop("sensitivity_curve", None)
+                st.error(f"Parametric analysis failed: {exc}")
+            except RuntimeError as exc:  # too many breakpoints in the range
+                st.session_state.pop("sensitivity_curve", None)
+                st.warning(f"{exc}. Narrow the range, or untick \"Trace the exact cost curve\" "
+                           "to solve the listed values only.")
+        else:
+            st.session_state.pop("sensitivity_curve", None)
+
+            # Values inside the range where the current optimal plan stays optimal are exact first-order
+            # estimates from its duals and ranging; only the values outside it are re-solved
+            from lp_sensitivity import first_order_estimates, parameter_range, sensitivity_report
+            report = sensitivity_report(base_demand, current_standard_costs, current_thursday_discount_rate,
+                                        current_holding_costs)
+            if report is not None:
+                estimates = first_order_estimates(report, param_name, values)
+                st.session_state.sensitivity_range = parameter_range(report, param_name)
             else:
-                st.error("Sensitivity analysis failed to produce valid results. Try different parameter values.")
+                estimates = [(v, None, False) for v in values]
+                st.session_state.sensitivity_range = None
+            st.session_state.sensitivity_estimates = [(v, cost) for v, cost, in_range in estimates if in_range]
+            values = [v for v, _, in_range in estimates if not in_range]
+
+            # Run sensitivity analysis in the background, one task per value so points show up as they finish
+            point_inputs = dict(
+                base_demand=base_demand,
+                base_costs=current_standard_costs,
+                parameter_name=param_name,
+                current_value=current_thursday_discount_rate if param_name == "thursday_discount" else None,
+                holding_costs=current_holding_costs,
+                thursday_discount=current_thursday_discount_rate
+            )
+            st.session_state.sensitivity_job = job_executor().submit_batch(
+                run_sensitivity_analysis, [(v, {**point_inputs, "values": [v]}) for v in values],
+                label="Sensitivity analysis")
+            st.session_state.sensitivity_context = (param_name, x_label)
+    
+    if "sensitivity_curve" in st.session_state:
+        plot_cost_curve(*st.session_state.sensitivity_curve)
+    elif "sensitivity_job" in st.session_state:
+        job_param, job_x_label = st.session_state.sensitivity_context
+        estimated = st.session_state.get("sensitivity_estimates", [])
+        valid_range = st.session_state.get("sensitivity_range")
+        if valid_range is not None:
+            low, high, _, slope = valid_range
+            st.caption(f"The current optimal plan stays optimal for {job_x_label} in [{low:.3g}, {high:.3g}], "
+                       f"where the total cost changes by ${slope:,.2f} per unit: {len(estimated)} value(s) "
+                       f"estimated instantly, the others re-solved.")
+        sensitivity_status = poll_job(
+            "sensitivity_job", "Running analysis",
+            render_partial=lambda partial: plot_sensitivity(partial, job_param, job_x_label, final=False,
+                                                            estimated=estimated))
+        if sensitivity_status is not None:
+            plot_sensitivity(sensitivity_status["results"], job_param, job_x_label, estimated=estimated)
     else:
         st.info("Click 'Run Sensitivity Analysis' to see how the selected parameter affects total cost.")
 
@@ -848,9 +768,9 @@ st.header("6. Calculate with Advanced Features")
 if st.button("Calculate Enhanced Ordering Plan", type="primary", key="enhanced_calculate"):
     # Determine which sales data to use
     if use_predicted:
-        sales_data_for_calc = PREDICTED_SALES.copy()
+        sales_data_for_calc = menu.default_sales
     else:
-        sales_data_for_calc = {drink: edited_demand_df.loc[drink].values.astype(int) for drink in DRINKS}
+        sales_data_for_calc = {drink: edited_demand_df.loc[drink].values.astype(int) for drink in menu.drinks}
     
     # Apply seasonal factors if enabled
     if "use_seasonal" in st.session_state and st.session_state.use_seasonal:
@@ -858,7 +778,7 @@ if st.button("Calculate Enhanced Ordering Plan", type="primary", key="enhanced_c
         sales_data_for_calc = apply_seasonal_factors(sales_data_for_calc, seasonal_factors_to_use)
     
     # Calculate ingredient demand
-    ingredient_demand = calculate_demand_from_sales(sales_data_for_calc)
+    ingredient_demand = ingredient_demand_for(sales_data_for_calc, menu)
     
     # Get policy settings
     policy_type = st.session_state.get("policy_type", "Standard (Tue & Fri No Orders)")
@@ -885,17 +805,73 @@ if st.button("Calculate Enhanced Ordering Plan", type="primary", key="enhanced_c
         stockout_costs_to_use = {ing: st.session_state.get(f"stockout_{ing}", 0.0) for ing in INGREDIENTS}
     
     # Solve enhanced model
-    with st.spinner("Calculating enhanced ordering plan..."):
-        enhanced_results = enhanced_solve_ordering_plan(
-            ingredient_demand,
-            current_standard_costs,
-            current_thursday_discount_rate,
-            current_holding_costs,
-            expiry_days=expiry_days_to_use,
-            min_order_quantities=min_order_quantities_to_use,
+    enhanced_inputs = dict(
+        demand=ingredient_demand,
+        standard_costs=current_standard_costs,
+        thursday_discount_rate=current_thursday_discount_rate,
+        holding_costs=current_holding_costs,
+        expiry_days=expiry_days_to_use,
+        min_order_quantities=min_order_quantities_to_use,
+        stockout_costs=stockout_costs_to_use,
+        ordering_days=ordering_days_to_use
+    )
+    st.session_state.pop("enhanced_inline", None)
+    if HIGHS_AVAILABLE and min_order_quantities_to_use and (expiry_days_to_use or stockout_costs_to_use):
+        # A MIP (the fast path does not cover it): keep the built model in the session and
+        # re-solve it in place, starting from the previous plan
+        from incremental_model import solve_in_session
+        st.session_state.pop("enhanced_job", None)
+        with st.spinner("Calculating enhanced ordering plan..."):
+            st.session_state.enhanced_inline = solve_in_session(st.session_state, **enhanced_inputs)
+        log_diagnostics(st.session_state.enhanced_inline, source="app.enhanced")
+    else:
+        st.session_state.enhanced_job = job_executor().submit(
+            enhanced_solve_ordering_plan, label="Enhanced plan", **enhanced_inputs)
+    st.session_state.enhanced_context = dict(
+        policy_type=policy_type,
+        ordering_days=ordering_days_to_use,
+        min_order_quantities=min_order_quantities_to_use,
+        expiry_days=expiry_days_to_use,
+        stockout_costs=stockout_costs_to_use,
+        sales=sales_data_for_calc,
+        menu=menu
+    )
+    
+    # Stochastic plan: one order plan for many sampled demand scenarios
+    st.session_state.pop("stochastic_job", None)
+    residuals = None
+    if STOCHASTIC_AVAILABLE and stockout_costs_to_use and st.session_state.get("use_stochastic"):
+        residuals = scenario_residuals(menu)
+    if residuals is not None:
+        from stochastic_model import sample_demand_scenarios, stochastic_solve_ordering_plan
+        n_scenarios = st.session_state.get("n_scenarios", 200)
+        _, demand_scenarios = sample_demand_scenarios(
+            sales_data_for_calc, residuals, n_scenarios, seed=0, recipe=menu.recipe, drinks=menu.drinks)
+        st.session_state.stochastic_job = job_executor().submit(
+            stochastic_solve_ordering_plan,
+            label=f"Plan over {n_scenarios} scenarios",
+            demand_scenarios=demand_scenarios,
+            standard_costs=current_standard_costs,
+            thursday_discount_rate=current_thursday_discount_rate,
+            holding_costs=current_holding_costs,
             stockout_costs=stockout_costs_to_use,
-            ordering_days=ordering_days_to_use
+            min_order_quantities=min_order_quantities_to_use,
+            ordering_days=ordering_days_to_use,
+            expiry_days=expiry_days_to_use
         )
+
+enhanced_results = (st.session_state.get("enhanced_inline")
+                    or job_result("enhanced_job", "Calculating enhanced ordering plan", "app.enhanced"))
+if enhanced_results is not None:
+    # Settings the plan was calculated with
+    enhanced_context = st.session_state.enhanced_context
+    policy_type = enhanced_context["policy_type"]
+    ordering_days_to_use = enhanced_context["ordering_days"]
+    min_order_quantities_to_use = enhanced_context["min_order_quantities"]
+    expiry_days_to_use = enhanced_context["expiry_days"]
+    stockout_costs_to_use = enhanced_context["stockout_costs"]
+    sales_data_for_calc = enhanced_context["sales"]
+    plan_menu = enhanced_context["menu"]
     
     # Display Results
     st.subheader("7. Enhanced Results")
@@ -947,6 +923,16 @@ if st.button("Calculate Enhanced Ordering Plan", type="primary", key="enhanced_c
             else:
                 st.info("No stockouts in the optimal solution.")
         
+        # Show expired (discarded) stock if applicable
+        if "waste_levels_df" in enhanced_results:
+            st.markdown("#### Expired / Discarded Stock (kg)")
+            waste_df = enhanced_results["waste_levels_df"]
+            if waste_df.values.sum() > 0:
+                st.dataframe(waste_df.style.format("{:.2f}").highlight_max(axis=1, color='orange'))
+            else:
+                st.info("Nothing expires in the optimal solution.")
+        plan_download(enhanced_results, "download_enhanced_plan")
+        
         # Calculate cost breakdown
         if st.checkbox("Show Cost Breakdown", key="show_cost_breakdown"):
             order_costs = {}
@@ -956,7 +942,7 @@ if st.button("Calculate Enhanced Ordering Plan", type="primary", key="enhanced_c
                 order_costs[ing] = 0
                 for day_idx, day in enumerate(DAY_NAMES):
                     if enhanced_results["order_plan_df"].loc[ing, day] > 0:
-                        cost_multiplier = 1.0 if day_idx != 3 else (1.0 - current_thursday_discount_rate)
+                        cost_multiplier = 1.0 if day_idx not in DISCOUNT_DAYS else (1.0 - current_thursday_discount_rate)
                         order_costs[ing] += enhanced_results["order_plan_df"].loc[ing, day] * current_standard_costs[ing] * cost_multiplier
                 
                 inventory_costs[ing] = 0
@@ -967,6 +953,7 @@ if st.button("Calculate Enhanced Ordering Plan", type="primary", key="enhanced_c
             total_inventory_cost = sum(inventory_costs.values())
             
             # Prepare data for pie chart
+            import matplotlib.pyplot as plt
             fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(12, 5))
             
             # Cost type breakdown
@@ -989,6 +976,7 @@ if st.button("Calculate Enhanced Ordering Plan", type="primary", key="enhanced_c
             
             plt.tight_layout()
             st.pyplot(fig)
+            plt.close(fig)
             
             # Cost breakdown table
             cost_data = {
@@ -1017,3 +1005,54 @@ if st.button("Calculate Enhanced Ordering Plan", type="primary", key="enhanced_c
     else:
         st.error(f"Solver Status: {enhanced_results['status']}. Could not find an optimal solution.")
         st.warning("Check if your constraints are feasible. Try relaxing some constraints.")
+    show_diagnostics(enhanced_results)
+    
+    # Stochastic plan: one order plan for many sampled demand scenarios
+    if "stochastic_job" in st.session_state:
+        st.subheader("8. Plan Under Demand Uncertainty")
+        stochastic_results = job_result("stochastic_job", "Solving over the demand scenarios", "app.stochastic")
+    else:
+        stochastic_results = None
+    if stochastic_results is not None:
+        if stochastic_results["status"] in ("Optimal", "TimeLimitReached"):
+            scenario_costs = stochastic_results["scenario_costs"]
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Expected Total Cost", f"${stochastic_results['total_cost']:.2f}")
+            col2.metric("Cost Range (5%-95%)",
+                        f"${np.percentile(scenario_costs, 5):.0f} - ${np.percentile(scenario_costs, 95):.0f}")
+            col3.metric("Expected Fill Rate", f"{stochastic_results['fill_rate'] * 100:.1f}%")
+            st.markdown("#### Order Plan for All Scenarios (kg)")
+            st.dataframe(stochastic_results["order_plan_df"].style.format("{:.2f}"))
+            st.markdown("#### Expected Stockouts (kg)")
+            st.dataframe(stochastic_results["stockout_levels_df"].style.format("{:.2f}"))
+            if "waste_levels_df" in stochastic_results:
+                st.markdown("#### Expected Expired / Discarded Stock (kg)")
+                st.dataframe(stochastic_results["waste_levels_df"].style.format("{:.2f}"))
+            
+            # Replay both plans against fresh demand paths (not the ones the scenario plan was fitted to)
+            st.markdown("#### Simulated Outcomes on 10,000 New Demand Paths (mean per week)")
+            from stochastic_model import sample_demand_scenarios
+            from plan_simulation import simulate_results, summarize_simulation
+            _, test_paths = sample_demand_scenarios(
+                sales_data_for_calc, cached_forecast_residuals(plan_menu.drinks), 10000, seed=1,
+                recipe=plan_menu.recipe, drinks=plan_menu.drinks)
+            comparison = {}
+            for label, plan in (("Point-forecast plan", enhanced_results), ("Scenario plan", stochastic_results)):
+                if "order_plan_df" in plan:
+                    simulation = simulate_results(
+                        plan, test_paths, current_standard_costs, current_thursday_discount_rate,
+                        current_holding_costs, stockout_costs_to_use, expiry_days_to_use)
+                    comparison[label] = summarize_simulation(simulation)["mean"]
+            st.dataframe(pd.DataFrame(comparison).style.format("{:.3f}"))
+        else:
+            st.error(f"Solver Status: {stochastic_results['status']}. Could not find a plan for the scenarios.")
+        show_diagnostics(stochastic_results)
+
+st.sidebar.checkbox("Show solver diagnostics", key="show_diagnostics")
+
+# Solve cache counters (repeated what-if queries are answered from the cache)
+cache_stats = default_cache.stats()
+st.sidebar.caption(
+    f"Solve cache: {cache_stats['hits'] + cache_stats['disk_hits']} hits, "
+    f"{cache_stats['misses']} misses, {cache_stats['entries']}/{cache_stats['max_entries']} entries"
+)
@@ -0,0 +1,89 @@
+"""Cold-start and rerun time of the Streamlit app, measured headless with ``streamlit.testing``.
+
+Usage: python benchmarks/bench_app.py [--app app.py] [--repeat 5] [--output results.json]
+
+Cold start is the first script run in a fresh interpreter, including all imports
+the app triggers, and is measured in a subprocess. Rerun times are the best of
+``--repeat`` runs for typical interactions: a plain rerun, switching the
+advanced-feature tab, toggling a checkbox and editing a cost input.
+"""
+import argparse
+import json
+import logging
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+_COLD_START = """
+import logging, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+logging.disable(logging.WARNING)
+at = AppTest.from_file(sys.argv[1], default_timeout=120)
+at.run()
+assert not at.exception, at.exception
+print(time.perf_counter() - start)
+"""
+
+
+def cold_start(app, repeat):
+    """Best first-run time (seconds) over ``repeat`` fresh interpreters."""
+    times = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", _COLD_START, str(app)], cwd=ROOT, capture_output=True,
+                             text=True, check=True)
+        times.append(float(out.stdout.strip().splitlines()[-1]))
+    return min(times)
+
+
+def rerun_times(app, repeat):
+    """Best time (seconds) per interaction on an already running app."""
+    from streamlit.testing.v1 import AppTest
+
+    logging.disable(logging.WARNING)
+    at = AppTest.from_file(str(app), default_timeout=120)
+    at.run()
+
+    def timed(action):
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            action()
+            best = min(best, time.perf_counter() - start)
+        return best
+
+    interactions = {"rerun": lambda: at.run()}
+    if "advanced_tab" in [widget.key for widget in at.radio]:
+        tabs = iter(["Stockout Analysis", "Expiry Constraints"] * repeat)
+        interactions["switch_tab"] = lambda: at.radio(key="advanced_tab").set_value(next(tabs)).run()
+    flags = iter([True, False] * repeat)
+    interactions["toggle_checkbox"] = lambda: at.checkbox(key="show_diagnostics").set_value(next(flags)).run()
+    costs = iter([14.5, 14.0] * repeat)
+    interactions["edit_cost"] = lambda: at.number_input(key="cost_Coffee Beans").set_value(next(costs)).run()
+    return {name: timed(action) for name, action in interactions.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--app", default=str(ROOT / "app.py"))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="write the results as JSON")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, str(ROOT))
+    app = Path(args.app).resolve()
+    results = {"app": str(app), "cold_start_s": cold_start(app, args.repeat),
+               "rerun_s": rerun_times(app, args.repeat)}
+    print(f"cold start: {results['cold_start_s'] * 1e3:.0f}ms")
+    for name, seconds in results["rerun_s"].items():
+        print(f"{name:>16}: {seconds * 1e3:.1f}ms")
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""Compare model build and solve time: PuLP + CBC versus sparse matrices + in-process HiGHS.
+
+Usage: python benchmarks/bench_model_build.py
+"""
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pulp
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import ordering_model as om  # noqa: E402
+from sparse_model import build_sparse_model, solve_sparse_model  # noqa: E402
+
+SIZES = [(4, 7), (10, 28), (25, 91), (50, 182)]  # (ingredients, horizon days)
+
+
+def make_instance(n_items, n_days, seed=0):
+    """Random instance with stockouts and expiry so no fast path applies."""
+    rng = np.random.default_rng(seed)
+    demand = rng.uniform(0, 20, (n_items, n_days))
+    base_cost = rng.uniform(2, 15, n_items)
+    unit_costs = np.repeat(base_cost[:, None], n_days, axis=1)
+    unit_costs[:, 3::7] *= 0.85
+    holding = rng.uniform(0.1, 3, n_items)
+    stockout = holding * 10
+    order_mask = np.ones((n_items, n_days), dtype=bool)
+    order_mask[:, 1::7] = order_mask[:, 4::7] = False
+    expiry = np.where(np.arange(n_items) % 2 == 0, 3, 0)
+    return demand, unit_costs, holding, order_mask, stockout, expiry
+
+
+def bench_pulp(demand, unit_costs, holding, order_mask, stockout, expiry):
+    n_items, n_days = demand.shape
+    names = [f"Item_{i}" for i in range(n_items)]
+    days = list(range(n_days))
+    start = time.perf_counter()
+    prob, *_ = om._build_enhanced_model(
+        {ing: dict(enumerate(demand[i])) for i, ing in enumerate(names)},
+        {ing: dict(enumerate(unit_costs[i])) for i, ing in enumerate(names)},
+        dict(zip(names, holding)),
+        [d for d in days if not order_mask[0, d]],
+        expiry_days={ing: int(e) for ing, e in zip(names, expiry)},
+        stockout_costs=dict(zip(names, stockout)),
+        ingredients=names, days=days)
+    built = time.perf_counter()
+    prob.solve(pulp.PULP_CBC_CMD(msg=0))
+    solved = time.perf_counter()
+    return built - start, solved - built, pulp.value(prob.objective)
+
+
+def bench_sparse(demand, unit_costs, holding, order_mask, stockout, expiry):
+    start = time.perf_counter()
+    model = build_sparse_model(demand, unit_costs, holding, order_mask,
+                               stockout_costs=stockout, expiry_days=expiry)
+    built = time.perf_counter()
+    _, objective, _ = solve_sparse_model(model)
+    solved = time.perf_counter()
+    return built - start, solved - built, objective
+
+
+if __name__ == "__main__":
+    print(f"{'size':>10} | {'PuLP build':>10} {'CBC solve':>10} | {'sparse build':>12} {'HiGHS solve':>11} | {'|obj diff|':>10}")
+    for n_items, n_days in SIZES:
+        instance = make_instance(n_items, n_days)
+        p_build, p_solve, p_obj = bench_pulp(*instance)
+        s_build, s_solve, s_obj = bench_sparse(*instance)
+        print(f"{n_items:>4}x{n_days:<5} | {p_build * 1e3:>8.1f}ms {p_solve * 1e3:>8.1f}ms | "
+              f"{s_build * 1e3:>10.2f}ms {s_solve * 1e3:>9.1f}ms | {abs(p_obj - s_obj):>10.2e}")
@@ -0,0 +1,362 @@
+"""Reproducible benchmark suite for demand explosion, model build, solve and result extraction.
+
+Synthetic instances scale ingredients, drinks, horizon and store count. Every
+case is timed per phase (build / solve / extract, wall and CPU seconds, best of
+``--repeat`` runs) and run once more under tracemalloc for peak Python memory.
+Results are written as JSON; with ``--baseline`` the run fails when a phase is
+slower than the baseline by more than ``--tolerance``.
+
+Usage:
+    python benchmarks/bench_suite.py [--preset small|medium|large] [--cases fast_path,lp_cbc]
+                                     [--repeat 3] [--output results.json]
+                                     [--baseline baseline.json] [--tolerance 0.25]
+
+CPU times cover this process only; CBC runs as a subprocess, so for the
+``*_cbc`` cases only the wall time of the solve phase is meaningful.
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pulp
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import ordering_model as om  # noqa: E402
+from fast_solver import solve_uncapacitated  # noqa: E402
+from planning_engine import plan_stores, plan_to_frame, store_calendar  # noqa: E402
+from sparse_model import build_sparse_model, solve_sparse_model  # noqa: E402
+
+# (case, instance size) pairs per preset; sizes are ingredients, drinks, horizon days, stores
+PRESETS = {
+    "small": [
+        ("demand_explosion", dict(ingredients=4, drinks=3, horizon=7, stores=100)),
+        ("demand_explosion_dict", dict(ingredients=4, drinks=3, horizon=7, stores=100)),
+        ("fast_path", dict(ingredients=4, drinks=3, horizon=7, stores=1)),
+        ("lp_cbc", dict(ingredients=4, drinks=3, horizon=7, stores=1)),
+        ("milp_cbc", dict(ingredients=4, drinks=3, horizon=7, stores=1)),
+        ("sparse_highs", dict(ingredients=4, drinks=3, horizon=7, stores=1)),
+        ("resident_highs", dict(ingredients=4, drinks=3, horizon=7, stores=1)),
+        ("multi_store", dict(ingredients=4, drinks=3, horizon=28, stores=50)),
+    ],
+    "medium": [
+        ("demand_explosion", dict(ingredients=30, drinks=200, horizon=28, stores=500)),
+        ("demand_explosion_dict", dict(ingredients=4, drinks=3, horizon=7, stores=2000)),
+        ("fast_path", dict(ingredients=25, drinks=50, horizon=91, stores=1)),
+        ("lp_cbc", dict(ingredients=25, drinks=50, horizon=91, stores=1)),
+        ("milp_cbc", dict(ingredients=10, drinks=20, horizon=28, stores=1)),
+        ("sparse_highs", dict(ingredients=25, drinks=50, horizon=91, stores=1)),
+        ("resident_highs", dict(ingredients=25, drinks=50, horizon=91, stores=1)),
+        ("multi_store", dict(ingredients=4, drinks=3, horizon=364, stores=500)),
+    ],
+    "large": [
+        ("demand_explosion", dict(ingredients=60, drinks=200, horizon=364, stores=1000)),
+        ("demand_explosion_dict", dict(ingredients=4, drinks=3, horizon=7, stores=20000)),
+        ("fast_path", dict(ingredients=50, drinks=200, horizon=364, stores=1)),
+        ("lp_cbc", dict(ingredients=50, drinks=200, horizon=182, stores=1)),
+        ("milp_cbc", dict(ingredients=25, drinks=50, horizon=56, stores=1)),
+        ("sparse_highs", dict(ingredients=50, drinks=200, horizon=182, stores=1)),
+        ("resident_highs", dict(ingredients=50, drinks=200, horizon=182, stores=1)),
+        ("multi_store", dict(ingredients=20, drinks=50, horizon=364, stores=2000)),
+    ],
+}
+
+
+def make_instance(ingredients, drinks, horizon, stores, seed=0):
+    """Synthetic menu, sales and cost data with a weekly Thursday discount and Tue/Fri closures."""
+    rng = np.random.default_rng(seed)
+    names = [f"Ing_{i}" for i in range(ingredients)]
+    drink_names = [f"Drink_{d}" for d in range(drinks)]
+    recipe = np.where(rng.random((ingredients, drinks)) < max(0.1, 3 / ingredients),
+                      rng.uniform(0.005, 0.05, (ingredients, drinks)), 0.0)
+    recipes = {ing: {drink: recipe[i, d] for d, drink in enumerate(drink_names) if recipe[i, d]}
+               for i, ing in enumerate(names)}
+    sales = rng.poisson(60, (stores, drinks, horizon)).astype(float)
+    base_cost = rng.uniform(2, 15, ingredients)
+    discount_days, ordering_days = store_calendar(horizon)
+    unit_costs = np.repeat(base_cost[:, None], horizon, axis=1)
+    unit_costs[:, discount_days] *= 0.85
+    order_mask = np.zeros((ingredients, horizon), dtype=bool)
+    order_mask[:, ordering_days] = True
+    holding = rng.uniform(0.1, 3, ingredients)
+    return {
+        "names": names, "drinks": drink_names, "recipes": recipes, "sales": sales,
+        "demand": om.explode_demand(sales[0], recipe),
+        "unit_costs": unit_costs, "holding": holding, "order_mask": order_mask,
+        "stockout": holding * 10, "base_cost": base_cost,
+        "moq": np.where(np.arange(ingredients) % 2 == 0, 5.0, 0.0),
+        "expiry": np.where(np.arange(ingredients) % 3 == 0, 3, 0),
+        "discount_days": discount_days, "ordering_days": ordering_days,
+    }
+
+
+def _as_dicts(inst):
+    names, days = inst["names"], list(range(inst["demand"].shape[1]))
+    demand = {ing: dict(zip(days, inst["demand"][i])) for i, ing in enumerate(names)}
+    costs = {ing: dict(zip(days, inst["unit_costs"][i])) for i, ing in enumerate(names)}
+    no_order_days = [d for d in days if not inst["order_mask"][0, d]]
+    return names, days, demand, costs, no_order_days
+
+
+def _extract_pulp(prob, order_vars, inventory_vars, stockout_vars, names, days, output="dataframe"):
+    """Result extraction as the PuLP solvers do it."""
+    results = {"status": pulp.LpStatus[prob.status], "total_cost": pulp.value(prob.objective)}
+    blocks = {"order_plan": om._variable_values(order_vars, names, days),
+              "inventory_levels": om._variable_values(inventory_vars, names, days)}
+    if stockout_vars:
+        blocks["stockout_levels"] = om._variable_values(stockout_vars, names, days)
+    return om.package_results(results, blocks, output, ingredients=names, day_names=days)
+
+
+# --- Cases: each runs its phases inside ``phase(name)`` and returns an objective (or None) ---
+
+def case_demand_explosion(inst, phase):
+    with phase("build"):
+        recipe = om.recipe_matrix(inst["names"], inst["drinks"], inst["recipes"])
+    with phase("solve"):
+        demand = om.explode_demand(inst["sales"], recipe)
+    with phase("extract"):
+        frame = pd.DataFrame(demand.reshape(-1, demand.shape[-1]))
+    return float(frame.to_numpy().sum())
+
+
+def case_demand_explosion_dict(inst, phase):
+    """The dict API (repo menu and week) called once per store-week."""
+    with phase("build"):
+        weeks = [{drink: week[d % len(om.DRINKS)] for d, drink in enumerate(om.DRINKS)}
+                 for week in inst["sales"][:, :, :len(om.DAYS)]]
+    with phase("solve"):
+        demands = [om.calculate_demand_from_sales(week) for week in weeks]
+    with phase("extract"):
+        total = sum(sum(days.values()) for demand in demands for days in demand.values())
+    return float(total)
+
+
+def case_fast_path(inst, phase):
+    names, days, demand, costs, no_order_days = _as_dicts(inst)
+    with phase("build"):
+        demand_arr = np.array([[demand[ing][day] for day in days] for ing in names])
+        cost_arr = np.array([[costs[ing][day] for day in days] for ing in names])
+        mask = np.ones(demand_arr.shape, dtype=bool)
+        mask[:, no_order_days] = False
+    with phase("solve"):
+        solution = solve_uncapacitated(demand_arr, cost_arr, inst["holding"], mask)
+    with phase("extract"):
+        om.package_results({}, {"order_plan": solution["orders"], "inventory_levels": solution["inventory"]},
+                           ingredients=names, day_names=days)
+    return float(solution["total_cost"])
+
+
+def _case_cbc(inst, phase, mixed_integer):
+    names, days, demand, costs, no_order_days = _as_dicts(inst)
+    options = {"stockout_costs": dict(zip(names, inst["stockout"]))}
+    if mixed_integer:
+        options["min_order_quantities"] = dict(zip(names, inst["moq"]))
+        options["expiry_days"] = {ing: int(e) for ing, e in zip(names, inst["expiry"])}
+    with phase("build"):
+        prob, order_vars, inventory_vars, stockout_vars, _ = om._build_enhanced_model(
+            demand, costs, dict(zip(names, inst["holding"])), no_order_days,
+            ingredients=names, days=days, **options)
+    with phase("solve"):
+        prob.solve(pulp.PULP_CBC_CMD(msg=0, timeLimit=120))
+    with phase("extract"):
+        results = _extract_pulp(prob, order_vars, inventory_vars, stockout_vars, names, days)
+    return results["total_cost"]
+
+
+def case_lp_cbc(inst, phase):
+    return _case_cbc(inst, phase, mixed_integer=False)
+
+
+def case_milp_cbc(inst, phase):
+    return _case_cbc(inst, phase, mixed_integer=True)
+
+
+def _sparse_model(inst, unit_costs=None):
+    return build_sparse_model(inst["demand"], inst["unit_costs"] if unit_costs is None else unit_costs,
+                              inst["holding"], inst["order_mask"], stockout_costs=inst["stockout"],
+                              min_order_quantities=inst["moq"], expiry_days=inst["expiry"])
+
+
+def _extract_sparse(inst, model, x):
+    n_cells = inst["demand"].size
+    blocks = {name: x[model["offsets"][key]:model["offsets"][key] + n_cells].reshape(inst["demand"].shape)
+              for name, key in (("order_plan", "orders"), ("inventory_levels", "inventory"),
+                                ("stockout_levels", "stockouts"))}
+    om.package_results({}, blocks, ingredients=inst["names"], day_names=range(inst["demand"].shape[1]))
+
+
+def case_sparse_highs(inst, phase):
+    with phase("build"):
+        model = _sparse_model(inst)
+    with phase("solve"):
+        _, objective, x = solve_sparse_model(model, max_solver_time=120)
+    with phase("extract"):
+        _extract_sparse(inst, model, x)
+    return objective
+
+
+def case_resident_highs(inst, phase):
+    """
+    A first solve on a new resident model (HiGHS start-up and model load included),
+    then the re-solve after a discount change that a sweep or an edit makes; ``solve``
+    is the re-solve alone, comparable to ``solve`` of ``sparse_highs``.
+    """
+    from incremental_model import IncrementalOrderingModel
+
+    edited_costs = inst["unit_costs"].copy()
+    edited_costs[:, inst["discount_days"]] *= 0.95
+    with phase("build"):
+        model = _sparse_model(inst)
+    with phase("solve_first"):
+        resident = IncrementalOrderingModel(max_solver_time=120)
+        resident.load(model).run()
+    edited = _sparse_model(inst, edited_costs)
+    with phase("solve"):
+        _, objective, x = resident.load(edited).run()
+    with phase("extract"):
+        _extract_sparse(inst, edited, x)
+    return objective
+
+
+def case_multi_store(inst, phase):
+    recipe = om.recipe_matrix(inst["names"], inst["drinks"], inst["recipes"])
+    demand = om.explode_demand(inst["sales"], recipe)
+    with phase("build"):
+        standard_costs = dict(zip(inst["names"], inst["base_cost"]))
+        holding_costs = dict(zip(inst["names"], inst["holding"]))
+        stores = [{"name": f"Store_{s}", "demand": demand[s], "standard_costs": standard_costs,
+                   "holding_costs": holding_costs, "discount_rate": 0.15,
+                   "discount_days": inst["discount_days"], "ordering_days": inst["ordering_days"]}
+                  for s in range(len(demand))]
+    with phase("solve"):
+        plan = plan_stores(stores, demand.shape[-1], ingredients=inst["names"])
+    with phase("extract"):
+        plan_to_frame(plan)
+    return float(np.nansum(plan["total_cost"]))
+
+
+CASES = {name[len("case_"):]: fn for name, fn in globals().items() if name.startswith("case_")}
+
+
+def run_case(case, params, repeat=3):
+    """Best-of-``repeat`` phase timings plus peak traced memory for one case and size."""
+    inst = make_instance(**params)
+    best = {}
+    objective = None
+    for _ in range(repeat):
+        timings = {}
+
+        @contextmanager
+        def phase(name):
+            wall, cpu = time.perf_counter(), time.process_time()
+            yield
+            timings[name] = {"wall_s": time.perf_counter() - wall, "cpu_s": time.process_time() - cpu}
+
+        objective = CASES[case](inst, phase)
+        for name, t in timings.items():
+            if name not in best or t["wall_s"] < best[name]["wall_s"]:
+                best[name] = t
+
+    @contextmanager
+    def untimed(name):
+        yield
+
+    tracemalloc.start()
+    try:
+        CASES[case](inst, untimed)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "case": case,
+        "params": params,
+        "key": f"{case}[" + ",".join(f"{k}={v}" for k, v in params.items()) + "]",
+        "phases": best,
+        "total_wall_s": sum(t["wall_s"] for t in best.values()),
+        "peak_memory_mb": peak / 2**20,
+        "objective": None if objective is None else float(objective),
+    }
+
+
+def _metadata(preset, repeat):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=Path(__file__).resolve().parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit, "preset": preset, "repeat": repeat,
+        "python": platform.python_version(), "platform": platform.platform(),
+        "numpy": np.__version__, "pandas": pd.__version__, "pulp": pulp.__version__,
+    }
+
+
+def compare_to_baseline(results, baseline, tolerance=0.25, min_delta_s=0.005):
+    """Return regression messages: phases (or peak memory) worse than baseline by > tolerance."""
+    previous = {r["key"]: r for r in baseline["results"]}
+    regressions = []
+    for result in results:
+        old = previous.get(result["key"])
+        if old is None:
+            continue
+        for name, t in result["phases"].items():
+            old_wall = old["phases"].get(name, {}).get("wall_s")
+            if old_wall is not None and t["wall_s"] > old_wall * (1 + tolerance) + min_delta_s:
+                regressions.append(f"{result['key']} {name}: {t['wall_s']:.4f}s vs baseline {old_wall:.4f}s")
+        if result["peak_memory_mb"] > old["peak_memory_mb"] * (1 + tolerance) + 1.0:
+            regressions.append(f"{result['key']} peak memory: {result['peak_memory_mb']:.1f}MB "
+                               f"vs baseline {old['peak_memory_mb']:.1f}MB")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="small")
+    parser.add_argument("--cases", help="comma-separated subset of: " + ", ".join(CASES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="write JSON results here (default: stdout)")
+    parser.add_argument("--baseline", help="JSON results to compare against; exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown")
+    args = parser.parse_args(argv)
+
+    selected = set(args.cases.split(",")) if args.cases else set(CASES)
+    unknown = selected - set(CASES)
+    if unknown:
+        parser.error(f"unknown cases: {', '.join(sorted(unknown))}")
+
+    results = []
+    for case, params in PRESETS[args.preset]:
+        if case in selected:
+            result = run_case(case, params, args.repeat)
+            results.append(result)
+            phases = "  ".join(f"{n}={t['wall_s'] * 1e3:.1f}ms" for n, t in result["phases"].items())
+            print(f"{result['key']:<70} {phases}  peak={result['peak_memory_mb']:.1f}MB", file=sys.stderr)
+
+    report = json.dumps({"meta": _metadata(args.preset, args.repeat), "results": results}, indent=2)
+    if args.output:
+        Path(args.output).write_text(report)
+    else:
+        print(report)
+
+    if args.baseline:
+        regressions = compare_to_baseline(results, json.loads(Path(args.baseline).read_text()), args.tolerance)
+        for message in regressions:
+            print(f"REGRESSION {message}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,325 @@
+"""Columnar data layer: sales history, recipes, costs and store calendars in; partitioned plans out.
+
+Inputs are read as Arrow tables. Parquet files and Hive-partitioned Parquet
+directories are memory-mapped, and only the requested columns and partitions
+are decoded. Arrow IPC / Feather files are read zero-copy from a memory map,
+and CSV goes through pyarrow's multithreaded reader. xlsx still works as a
+fallback through pandas/openpyxl. It is parsed cell by cell, so use it only for
+small, hand-edited files.
+
+Plans are written as a Parquet dataset partitioned by store and week
+(``root/store=<name>/week=<n>/*.parquet``). The rows use the long layout of
+``package_results(output="arrow")`` plus store and week columns, so one store or
+week can be read back without reading the rest.
+
+pyarrow is imported on first use.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from forecast_pipeline import WEEKDAYS
+from ordering_model import DRINKS, INGREDIENTS, DAY_NAMES, package_results
+
+PARQUET_EXTENSIONS = (".parquet", ".pq")
+ARROW_EXTENSIONS = (".arrow", ".feather", ".ipc")
+EXCEL_EXTENSIONS = (".xlsx", ".xls")
+PLAN_PARTITIONS = ("store", "week")
+DEFAULT_STORE = "default"
+
+ENHANCED_COLUMNS = {"min_order_quantity": "min_order_quantities", "expiry_days": "expiry_days",
+                    "stockout_cost": "stockout_costs"}
+
+
+# --- Readers ---
+def read_table(path, columns=None, filters=None):
+    """
+    Read a table file, or a partitioned Parquet directory, as a pyarrow Table.
+
+    ``columns`` selects columns and ``filters`` (Parquet DNF, e.g.
+    ``[("store", "=", "north")]``) selects rows. For Parquet both are pushed
+    down, so skipped row groups, partitions and columns are never read.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    ext = os.path.splitext(path)[1].lower()
+    if os.path.isdir(path) or ext in PARQUET_EXTENSIONS:
+        return pq.read_table(path, columns=columns, filters=filters, memory_map=True)
+    if ext in ARROW_EXTENSIONS:
+        import pyarrow.feather as feather
+
+        table = feather.read_table(path, memory_map=True)
+    elif ext == ".csv":
+        import pyarrow.csv as pa_csv
+
+        table = pa_csv.read_csv(path)
+    elif ext in EXCEL_EXTENSIONS:
+        table = pa.Table.from_pandas(pd.read_excel(path), preserve_index=False)
+    else:
+        raise ValueError(f"Unsupported file format: {ext}")
+    if filters:
+        table = table.filter(pq.filters_to_expression(filters))
+    if columns is not None:
+        table = table.select(columns)
+    return table
+
+
+def read_frame(path):
+    """Read a table as a pandas DataFrame indexed by its first column (as strings)."""
+    df = read_table(path).to_pandas()
+    if isinstance(df.index, pd.RangeIndex):  # index was stored as a plain column
+        df = df.set_index(df.columns[0])
+    df.index = df.index.map(str)
+    return df
+
+
+def _column(table, *names):
+    """First of ``names`` present in ``table`` (None if none is)."""
+    return next((name for name in names if name in table.column_names), None)
+
+
+def _weekdays(table):
+    """Weekday per row (0=Mon .. 6=Sun) from a date, weekday number or weekday-name column."""
+    import pyarrow.compute as pc
+    import pyarrow.types as pat
+
+    date = _column(table, "date", "Date")
+    if date is not None:
+        return pc.day_of_week(table[date]).to_numpy(zero_copy_only=False)
+    number = _column(table, "weekday", "Weekday")
+    if number is not None and pat.is_integer(table[number].type):
+        return table[number].to_numpy(zero_copy_only=False)
+    for name in table.column_names:
+        column = table[name]
+        if pat.is_string(column.type) or pat.is_large_string(column.type):
+            values = [str(v).strip().lower() for v in column.to_pylist()]
+            if values and all(v in WEEKDAYS for v in values):
+                return np.array([WEEKDAYS[v] for v in values])
+    raise ValueError("No date, weekday number or weekday name column found in the sales history")
+
+
+def load_sales_history(path, drinks=DRINKS, stores=None):
+    """
+    Daily drink sales as a pyarrow Table with columns store, day, week, weekday,
+    promotion and one column per drink.
+
+    Accepts the layout of demand_history.xlsx (a weekday-name column,
+    "<drink> Sales" columns and "Promotion Day") or plain drink columns, with
+    optional ``store`` and ``date`` columns. ``day`` counts days from each store's
+    first row (by date when there is one, else by file order), and ``week``
+    counts Monday-to-Sunday weeks, with week 0 holding that first day. Rows
+    without sales (e.g. an empty forecast week) are dropped.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    table = read_table(path)
+    store = _column(table, "store", "Store")
+    if stores is not None and store is not None:
+        table = table.filter(pc.is_in(table[store].cast(pa.string()), pa.array(list(stores), pa.string())))
+    sales = {}
+    for drink in drinks:
+        name = _column(table, f"{drink} Sales", drink)
+        if name is None:
+            raise ValueError(f"{path}: no sales column for {drink}")
+        sales[drink] = name
+    complete = np.ones(table.num_rows, dtype=bool)
+    for name in sales.values():
+        complete &= ~pc.is_null(table[name], nan_is_null=True).to_numpy(zero_copy_only=False)
+    table = table.filter(pa.array(complete))
+    n_rows = table.num_rows
+
+    store_names = (np.asarray(table[store].cast(pa.string()).to_pylist(), dtype=object) if store is not None
+                   else np.full(n_rows, DEFAULT_STORE, dtype=object))
+    _, codes = np.unique(store_names, return_inverse=True)
+    weekday = _weekdays(table).astype(int)
+    date = _column(table, "date", "Date")
+    if date is not None:
+        epoch_days = table[date].cast(pa.date32()).cast(pa.int32()).to_numpy(zero_copy_only=False)
+        first = np.full(codes.max(initial=-1) + 1, np.iinfo(np.int32).max)
+        np.minimum.at(first, codes, epoch_days)
+        day = epoch_days - first[codes]
+    else:
+        order = np.argsort(codes, kind="stable")
+        counts = np.bincount(codes)
+        day = np.empty(n_rows, dtype=int)
+        day[order] = np.arange(n_rows) - np.repeat(np.cumsum(counts) - counts, counts)
+    # Weekday of each store's day 0, so weeks start on Monday
+    week = (day + (weekday - day) % 7) // 7
+
+    promotion = _column(table, "Promotion Day", "promotion")
+    columns = {
+        "store": store_names.astype(str),
+        "day": day,
+        "week": week,
+        "weekday": weekday,
+        "promotion": (table[promotion].to_numpy(zero_copy_only=False).astype(float) if promotion is not None
+                      else np.zeros(n_rows)),
+    }
+    columns.update({drink: table[name].cast(pa.float64()) for drink, name in sales.items()})
+    return pa.table(columns)
+
+
+def sales_week(history, week, store=None, drinks=DRINKS):
+    """
+    One Monday-to-Sunday week of a ``load_sales_history`` table as
+    ``{drink: sales array}``, the input of ``calculate_demand_from_sales``.
+    ``store`` may be omitted when the history holds a single store.
+    """
+    import pyarrow.compute as pc
+
+    if store is None:
+        stores = pc.unique(history["store"]).to_pylist()
+        if len(stores) != 1:
+            raise ValueError(f"The sales history holds {len(stores)} stores; pass store=")
+        store = stores[0]
+    rows = history.filter(pc.and_(pc.equal(history["store"], store), pc.equal(history["week"], week)))
+    weekday = rows["weekday"].to_numpy()
+    if len(np.unique(weekday)) != len(DAY_NAMES):
+        raise ValueError(f"Week {week} of store {store} has sales for {len(np.unique(weekday))} of 7 days")
+    sales = {}
+    for drink in drinks:
+        values = np.zeros(len(DAY_NAMES))
+        values[weekday] = rows[drink].to_numpy()
+        sales[drink] = values
+    return sales
+
+
+def last_complete_week(history, store=DEFAULT_STORE):
+    """Latest week of a store in a ``load_sales_history`` table with sales for all 7 days (None if none)."""
+    import pyarrow.compute as pc
+
+    rows = history.filter(pc.equal(history["store"], store))
+    days = rows.group_by("week").aggregate([("weekday", "count_distinct")])
+    weeks = days["week"].to_numpy()[days["weekday_count_distinct"].to_numpy() == len(DAY_NAMES)]
+    return int(weeks.max()) if len(weeks) else None
+
+
+def load_recipes(path):
+    """
+    Recipes as ``{ingredient: {drink: kg per drink}}``, the shape of KG_PER_DRINK
+    (pass it to ``recipe_matrix(recipes=...)``). Accepts a long table (drink,
+    ingredient, kg_per_drink) or a wide one with one row per drink (drink in the
+    first column) and one column per ingredient. Missing entries are 0.
+    """
+    table = read_table(path)
+    if {"drink", "ingredient", "kg_per_drink"} <= set(table.column_names):
+        df = table.select(["drink", "ingredient", "kg_per_drink"]).to_pandas()
+        df = df.pivot_table(index="drink", columns="ingredient", values="kg_per_drink", aggfunc="sum")
+    else:
+        df = read_frame(path)
+    df = df.fillna(0).astype(float)
+    return {str(ing): {str(drink): kg for drink, kg in df[ing].items()} for ing in df.columns}
+
+
+def load_costs(path):
+    """Solver keyword arguments (costs and enhanced options) from a costs table indexed by ingredient."""
+    table = read_frame(path)
+    missing = [ing for ing in INGREDIENTS if ing not in table.index]
+    if missing:
+        raise ValueError(f"{path}: missing costs for {', '.join(missing)}")
+    table = table.loc[INGREDIENTS]
+    options = {
+        "standard_costs": table["standard_cost"].astype(float).to_dict(),
+        "holding_costs": table["holding_cost"].astype(float).to_dict(),
+    }
+    for column, option in ENHANCED_COLUMNS.items():
+        if column in table.columns:
+            values = table[column].fillna(0)
+            cast = int if column == "expiry_days" else float
+            options[option] = {ing: cast(v) for ing, v in values.items() if v}
+    return options
+
+
+def load_store_calendar(path):
+    """
+    Per-store ``{"discount_days": [...], "ordering_days": [...]}`` from a table
+    with store, day (horizon day index) and optional boolean can_order and
+    discount columns (default: ordering allowed, no discount). Merge the entries
+    into ``planning_engine`` store dicts.
+    """
+    table = read_table(path)
+    store = _column(table, "store", "Store")
+    n_rows = table.num_rows
+    stores = (np.asarray(table[store].to_pylist(), dtype=object).astype(str) if store is not None
+              else np.full(n_rows, DEFAULT_STORE))
+    day = table["day"].to_numpy(zero_copy_only=False).astype(int)
+    flags = {name: (table[name].to_numpy(zero_copy_only=False).astype(bool) if name in table.column_names
+                    else np.full(n_rows, default))
+             for name, default in (("can_order", True), ("discount", False))}
+    calendars = {}
+    for name in dict.fromkeys(stores.tolist()):
+        rows = stores == name
+        calendars[name] = {"discount_days": sorted(day[rows & flags["discount"]].tolist()),
+                           "ordering_days": sorted(day[rows & flags["can_order"]].tolist())}
+    return calendars
+
+
+# --- Writers ---
+def plan_table(results, store=DEFAULT_STORE, week=0):
+    """
+    Long-format pyarrow Table (store, week, ingredient, day, order_kg, ...) of a
+    solve result in any output format.
+    """
+    table = results.get("plan_table")
+    if table is None:
+        blocks = {}
+        for name in ("order_plan", "inventory_levels", "stockout_levels", "waste_levels"):
+            if f"{name}_df" in results:
+                blocks[name] = results[f"{name}_df"].to_numpy(dtype=float)
+            elif name in results:
+                blocks[name] = np.asarray(results[name], dtype=float)
+        if not blocks:
+            raise ValueError(f"No plan in a result with status {results.get('status')}")
+        labels = results.get("order_plan_df")
+        ingredients = results.get("ingredients", INGREDIENTS if labels is None else list(labels.index))
+        day_names = results.get("days", DAY_NAMES if labels is None else list(labels.columns))
+        table = package_results({}, blocks, "arrow", ingredients, day_names)["plan_table"]
+    table = table.add_column(0, "week", _constant(week, table.num_rows))
+    return table.add_column(0, "store", _constant(str(store), table.num_rows))
+
+
+def _constant(value, n_rows):
+    import pyarrow as pa
+
+    return pa.array(np.full(n_rows, value))
+
+
+def write_plan_dataset(plans, root, partition_cols=PLAN_PARTITIONS):
+    """
+    Write plan rows (a pyarrow Table or DataFrame with store and week columns,
+    e.g. from ``plan_table`` or ``planning_engine.plan_to_frame``) to a Parquet
+    dataset under ``root``, partitioned by store and week. Partitions present in
+    ``plans`` are replaced and all others are kept.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if isinstance(plans, pd.DataFrame):
+        plans = pa.Table.from_pandas(plans, preserve_index=False)
+    pq.write_to_dataset(plans, root, partition_cols=list(partition_cols),
+                        existing_data_behavior="delete_matching")
+
+
+def read_plan_dataset(root, store=None, week=None, columns=None):
+    """Read plans back from ``write_plan_dataset``; only the selected store/week partitions are opened."""
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+
+    filters = [(name, "=", value) for name, value in (("store", store), ("week", week)) if value is not None]
+    partitioning = ds.partitioning(pa.schema([("store", pa.string()), ("week", pa.int64())]), flavor="hive")
+    return pq.read_table(root, columns=columns, filters=filters or None, partitioning=partitioning, memory_map=True)
+
+
+def parquet_bytes(table):
+    """Serialize a table (e.g. from ``plan_table``) to Parquet bytes, e.g. for a download button."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sink = pa.BufferOutputStream()
+    pq.write_table(table, sink)
+    return sink.getvalue().to_pybytes()
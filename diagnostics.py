@@ -0,0 +1,146 @@
+"""Per-phase timing, model size and solver statistics for ordering-plan solves.
+
+The solvers record into a ``SolveDiagnostics`` and return it under
+``results["diagnostics"]`` as a plain dict:
+
+- ``backend``: ``"numpy"``, ``"cbc"`` or ``"highs"``
+- ``phases``: ``{phase: {"wall_s", "cpu_s"}}`` for build, solve and extract
+- ``model``: variables, constraints and nonzeros (of the equivalent LP for the fast path)
+- ``solver``: iterations, nodes and the solver's own wall time when it reports them
+
+CPU times cover this process only, so CBC (a subprocess) shows up in the wall
+time of the solve phase; the gap between that and ``solver.solver_wall_s`` is
+the MPS write/read and process overhead. ``log_diagnostics`` emits one JSON
+record per solve on the ``coffee.solver`` logger (``enable_json_log`` or the
+``COFFEE_SOLVE_LOG`` environment variable send them to a file).
+"""
+
+import json
+import logging
+import os
+import re
+import tempfile
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger("coffee.solver")
+
+
+class SolveDiagnostics:
+    """Collects phase timings, model size and solver statistics for one solve."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.phases = {}
+        self.model = {}
+        self.solver = {}
+
+    @contextmanager
+    def phase(self, name):
+        """Time the enclosed block; repeated phases accumulate."""
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            t = self.phases.setdefault(name, {"wall_s": 0.0, "cpu_s": 0.0})
+            t["wall_s"] += time.perf_counter() - wall
+            t["cpu_s"] += time.process_time() - cpu
+
+    def as_dict(self):
+        return {
+            "backend": self.backend,
+            "phases": {name: dict(t) for name, t in self.phases.items()},
+            "total_wall_s": sum(t["wall_s"] for t in self.phases.values()),
+            "total_cpu_s": sum(t["cpu_s"] for t in self.phases.values()),
+            "model": dict(self.model),
+            "solver": dict(self.solver),
+        }
+
+
+def pulp_model_size(prob):
+    """Variables, constraints and nonzeros of a PuLP problem."""
+    return {
+        "variables": prob.numVariables(),
+        "constraints": prob.numConstraints(),
+        "nonzeros": sum(len(constraint) for constraint in prob.constraints.values()),
+    }
+
+
+def sparse_model_size(model):
+    """Variables, constraints and nonzeros of a ``sparse_model.build_sparse_model`` model."""
+    n_rows, n_vars = model["A"].shape
+    return {"variables": n_vars, "constraints": n_rows, "nonzeros": int(model["A"].nnz),
+            "integer_variables": int(model["integrality"].sum())}
+
+
+_CBC_PATTERNS = {
+    "iterations": r"Total iterations:\s+(\d+)|objective \S+ - (\d+) iterations",
+    "nodes": r"Enumerated nodes:\s+(\d+)",
+    "solver_cpu_s": r"Total time \(CPU seconds\):\s+([\d.]+)",
+    "solver_wall_s": r"\(Wallclock seconds\):\s+([\d.]+)\s*$",
+}
+
+
+def parse_cbc_log(text):
+    """Iterations, nodes and CBC's own CPU/wall time from a CBC log."""
+    stats = {}
+    for key, pattern in _CBC_PATTERNS.items():
+        matches = re.findall(pattern, text, flags=re.MULTILINE)
+        if matches:
+            last = matches[-1]
+            value = next(v for v in last if v) if isinstance(last, tuple) else last
+            stats[key] = float(value) if key.endswith("_s") else int(value)
+    if "iterations" in stats and "nodes" not in stats:
+        stats["nodes"] = 0  # pure LP: no branch-and-bound
+    return stats
+
+
+@contextmanager
+def cbc_log_file():
+    """Temporary path for CBC's ``logPath``; removed afterwards."""
+    fd, path = tempfile.mkstemp(suffix="-cbc.log")
+    os.close(fd)
+    try:
+        yield path
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def read_cbc_log(path):
+    try:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            return parse_cbc_log(f.read())
+    except OSError:
+        return {}
+
+
+def enable_json_log(path):
+    """Append one JSON line per logged solve to ``path``."""
+    path = os.path.abspath(path)
+    for handler in logger.handlers:
+        if isinstance(handler, logging.FileHandler) and handler.baseFilename == path:
+            return handler
+    handler = logging.FileHandler(path, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    return handler
+
+
+def log_diagnostics(results, level=logging.INFO, **context):
+    """Emit the diagnostics of a results dict (plus ``context`` fields) as one JSON log record."""
+    diagnostics = results.get("diagnostics") if isinstance(results, dict) else None
+    if diagnostics is None:
+        return None
+    record = {"event": "solve", "status": results.get("status"), "total_cost": results.get("total_cost"),
+              **context, **diagnostics}
+    logger.log(level, json.dumps(record, default=str))
+    return record
+
+
+# COFFEE_SOLVE_LOG=<path> writes every logged solve as a JSON line
+if os.environ.get("COFFEE_SOLVE_LOG"):
+    enable_json_log(os.environ["COFFEE_SOLVE_LOG"])
@@ -0,0 +1,410 @@
+"""Pure-NumPy solvers for the decoupled ordering model.
+
+Without minimum order quantities every ingredient is an independent
+uncapacitated lot-sizing problem with linear costs. Each unit of demand on day t
+is then simply bought on the allowed ordering day s <= t that minimises
+``unit_cost[s] + holding_cost * (t - s)`` (or is left unmet if the stockout
+penalty is cheaper). A single forward scan over the days finds that cheapest
+source for every day at once, so no LP model or CBC process is needed. A shelf
+life of e days only narrows the candidates to s > t - e, so perishable items are
+covered by a scan over the last e days instead (nothing is ever bought to be
+wasted, so the FIFO expiry model has the same optimum).
+
+With a minimum order quantity (MOQ) the items are still independent, and
+``solve_moq_lot_sizing`` solves each one exactly with a block dynamic program
+instead of a MIP (see its docstring).
+
+All arrays of ``solve_uncapacitated`` may carry leading batch dimensions
+(scenarios, stores, ...): the last two axes are always ``(ingredient, day)``.
+"""
+
+import numpy as np
+
+
+def solve_uncapacitated(demand, unit_costs, holding_costs, order_mask,
+                        stockout_costs=None, initial_inventory=None, shelf_life=None):
+    """
+    Solve the decoupled ordering problem exactly with a cheapest-source scan.
+
+    Parameters
+    ----------
+    demand : array (..., n_items, n_days)
+        Demand in kg per ingredient and day.
+    unit_costs : array broadcastable to ``demand``
+        Purchase cost per kg for each ingredient and day.
+    holding_costs : array (..., n_items)
+        Holding cost per kg of end-of-day inventory.
+    order_mask : bool array broadcastable to ``demand``
+        True on days when ordering is allowed.
+    stockout_costs : array (..., n_items), optional
+        Penalty per kg of unmet (lost) demand; ``inf`` (or omitting the
+        argument) means demand must be met.
+    initial_inventory : array (..., n_items), optional
+        Stock on hand before the first day.
+    shelf_life : array (..., n_items), optional
+        Days an order can be used for, counting the delivery day; 0 (or at
+        least the horizon length) means the item does not expire. Initial
+        inventory is assumed not to expire within the horizon.
+
+    Returns
+    -------
+    dict with ``feasible`` (bool, batch shape), ``total_cost`` (batch shape),
+    ``orders``, ``inventory`` and ``stockouts`` (same shape as ``demand``).
+    Entries of infeasible batch members are left as NaN.
+    """
+    demand = np.asarray(demand, dtype=float)
+    n_days = demand.shape[-1]
+    unit_costs = np.broadcast_to(np.asarray(unit_costs, dtype=float), demand.shape)
+    order_mask = np.broadcast_to(np.asarray(order_mask, dtype=bool), demand.shape)
+    holding = np.broadcast_to(np.asarray(holding_costs, dtype=float), demand.shape[:-1])
+
+    # Stock on hand is consumed first (it has to be held until used anyway)
+    if initial_inventory is not None:
+        start_inv = np.broadcast_to(np.asarray(initial_inventory, dtype=float), demand.shape[:-1])
+        covered = np.minimum(np.cumsum(demand, axis=-1), start_inv[..., None])
+        from_stock = np.diff(covered, axis=-1, prepend=0.0)
+    else:
+        start_inv = np.zeros(demand.shape[:-1])
+        from_stock = np.zeros_like(demand)
+    net_demand = demand - from_stock
+
+    # Forward scan: cheapest landed cost (purchase + holding) of a kg needed on day t
+    best_cost = np.empty_like(demand)
+    best_src = np.empty(demand.shape, dtype=np.intp)
+    running_cost = np.full(demand.shape[:-1], np.inf)
+    running_src = np.zeros(demand.shape[:-1], dtype=np.intp)
+    for day in range(n_days):
+        running_cost = running_cost + holding
+        # Prefer the later (fresher) order on ties
+        take = order_mask[..., day] & (unit_costs[..., day] <= running_cost)
+        running_cost = np.where(take, unit_costs[..., day], running_cost)
+        running_src = np.where(take, day, running_src)
+        best_cost[..., day] = running_cost
+        best_src[..., day] = running_src
+
+    # Perishable items: only the orders of the last ``shelf_life`` days can serve day t
+    if shelf_life is not None:
+        life = np.broadcast_to(np.asarray(shelf_life, dtype=float), demand.shape[:-1])
+        limited = (life > 0) & (life < n_days)
+        if limited.any():
+            window_cost = np.full(demand.shape, np.inf)
+            window_src = np.zeros(demand.shape, dtype=np.intp)
+            for lag in range(int(life[limited].max())):
+                usable = order_mask[..., :n_days - lag] & (lag < life)[..., None]
+                cost = np.where(usable, unit_costs[..., :n_days - lag] + holding[..., None] * lag, np.inf)
+                # Strictly cheaper only, so ties keep the fresher (shorter lag) order
+                better = cost < window_cost[..., lag:]
+                window_cost[..., lag:] = np.where(better, cost, window_cost[..., lag:])
+                window_src[..., lag:] = np.where(better, np.arange(n_days - lag), window_src[..., lag:])
+            best_cost = np.where(limited[..., None], window_cost, best_cost)
+            best_src = np.where(limited[..., None], window_src, best_src)
+
+    # Lost sales whenever the penalty undercuts every supply option
+    if stockout_costs is not None:
+        penalty = np.broadcast_to(np.asarray(stockout_costs, dtype=float), demand.shape[:-1])
+        short = best_cost > penalty[..., None]
+    else:
+        short = np.zeros(demand.shape, dtype=bool)
+    stockouts = np.where(short, net_demand, 0.0)
+    served = net_demand - stockouts
+
+    unreachable = (served > 0) & ~np.isfinite(best_cost)
+    feasible = ~unreachable.any(axis=(-2, -1))
+
+    # Accumulate each day's served demand onto its source day
+    n_rows = served.size // n_days if n_days else 0
+    flat_src = (best_src.reshape(n_rows, n_days)
+                + (np.arange(n_rows) * n_days)[:, None]).ravel()
+    orders = np.bincount(flat_src, weights=served.ravel(),
+                         minlength=served.size).reshape(demand.shape)
+
+    inventory = start_inv[..., None] + np.cumsum(orders - (demand - stockouts), axis=-1)
+    inventory = np.maximum(inventory, 0.0)  # clip round-off
+
+    total_cost = (np.sum(unit_costs * orders, axis=(-2, -1))
+                  + np.sum(holding * inventory.sum(axis=-1), axis=-1))
+    if stockout_costs is not None:
+        # An infinite penalty marks items (or stores) where stockouts are not allowed
+        finite_penalty = np.where(np.isfinite(penalty), penalty, 0.0)
+        total_cost = total_cost + np.sum(finite_penalty * stockouts.sum(axis=-1), axis=-1)
+
+    if not np.all(feasible):
+        total_cost = np.where(feasible, total_cost, np.nan)
+        bad = ~feasible[..., None, None]
+        orders = np.where(bad, np.nan, orders)
+        inventory = np.where(bad, np.nan, inventory)
+        stockouts = np.where(bad, np.nan, stockouts)
+
+    return {
+        "feasible": feasible,
+        "total_cost": total_cost,
+        "orders": orders,
+        "inventory": inventory,
+        "stockouts": stockouts,
+    }
+
+
+def _moq_prefix_tables(b, allowed, cum, moq, start, n_states):
+    """
+    Cheapest placements of n MOQ-sized orders on days [start, t) that cover the
+    cumulative demand from ``start`` through every day before t.
+    Returns costs (t - start + 1, n_states) in units of ``b`` and the take flags.
+    """
+    n_days = len(b)
+    counts = np.arange(n_states)
+    cur = np.full(n_states, np.inf)
+    cur[0] = 0.0
+    costs, takes = [cur], []
+    for t in range(start, n_days):
+        new = cur.copy()
+        take = np.zeros(n_states, dtype=bool)
+        if allowed[t]:
+            cand = np.full(n_states, np.inf)
+            cand[1:] = cur[:-1] + b[t]
+            take = cand < new
+            new = np.where(take, cand, new)
+        new[counts * moq < cum[t + 1] - cum[start] - 1e-9] = np.inf
+        costs.append(new)
+        takes.append(take)
+        cur = new
+    return np.array(costs), takes
+
+
+def _moq_suffix_tables(b, allowed, cum, moq, end, n_states):
+    """
+    Cheapest placements of n MOQ-sized orders on days (f, end) such that the
+    orders after every day s >= f never exceed the demand after s up to ``end``.
+    Returns ``{f: costs}`` and ``{s: take flags for ordering on day s}``.
+    """
+    counts = np.arange(n_states)
+    cur = np.full(n_states, np.inf)
+    cur[0] = 0.0
+    costs, takes = {end - 1: cur}, {}
+    for s in range(end - 1, 0, -1):
+        new = cur.copy()
+        take = np.zeros(n_states, dtype=bool)
+        if allowed[s]:
+            cand = np.full(n_states, np.inf)
+            cand[1:] = cur[:-1] + b[s]
+            take = cand < new
+            new = np.where(take, cand, new)
+        new[counts * moq > cum[end] - cum[s] + 1e-9] = np.inf
+        costs[s - 1] = new
+        takes[s] = take
+        cur = new
+    return costs, takes
+
+
+def solve_moq_lot_sizing(demand, unit_costs, holding_cost, order_mask, moq, max_states=4096):
+    """
+    Exact single-ingredient ordering plan with a minimum order quantity.
+
+    Every order is either 0 or at least ``moq``; demand must be met, there is no
+    initial stock and costs must be non-negative. The horizon splits into blocks
+    that start and end with empty stock; within a block an optimal plan orders
+    exactly ``moq`` on all order days but at most one (Wagner-Whitin style
+    regeneration argument for lot sizing with lower bounds). A final block may
+    end with stock left over, in which case every order in it is exactly ``moq``.
+    Block costs come from small DPs over (day, number of MOQ orders), so the
+    whole solve is polynomial: O(T^3 * K^2) for T days and K = demand / moq.
+
+    Returns a dict like ``solve_uncapacitated`` for one item (1-D arrays), or
+    None when K exceeds ``max_states`` (use the MIP instead).
+    """
+    d = np.asarray(demand, dtype=float)
+    c = np.asarray(unit_costs, dtype=float)
+    allowed = np.asarray(order_mask, dtype=bool)
+    h, m = float(holding_cost), float(moq)
+    n_days = len(d)
+    cum = np.concatenate([[0.0], np.cumsum(d)])
+    n_states = int(np.ceil(cum[-1] / m - 1e-9)) + 2
+    if n_states > max_states:
+        return None
+
+    # Landed cost of a kg ordered on day t and held to day j - 1 is b[t] + h * j
+    b = c - h * np.arange(n_days)
+    # sum_{s=i}^{j-1} D(i..s): subtracted so block costs are holding on end-of-day stock
+    cum_cum = np.concatenate([[0.0], np.cumsum(cum[1:])])
+
+    def stacked_demand(i, j):
+        return cum_cum[j] - cum_cum[i] - (j - i) * cum[i]
+
+    prefix = [_moq_prefix_tables(b, allowed, cum, m, i, n_states) for i in range(n_days)]
+    counts = np.arange(n_states)
+
+    # Blocks [i, j) with empty stock at both ends
+    block_cost = np.full((n_days + 1, n_days + 1), np.inf)
+    block_plan = {}
+    for j in range(1, n_days + 1):
+        suffix_costs, suffix_takes = _moq_suffix_tables(b, allowed, cum, m, j, n_states)
+        for i in range(j):
+            total = cum[j] - cum[i]
+            if total <= 1e-9:
+                block_cost[i, j] = 0.0
+                block_plan[i, j] = None
+                continue
+            max_n = int(np.floor(total / m - 1 + 1e-9))  # MOQ orders besides the free one
+            if max_n < 0:
+                continue
+            best = (np.inf, None)
+            for f in range(i, j):
+                if not allowed[f]:
+                    continue
+                pre = prefix[i][0][f - i][:max_n + 1]
+                suf = suffix_costs[f][:max_n + 1]
+                if not np.isfinite(pre).any() or not np.isfinite(suf).any():
+                    continue
+                pair = pre[:, None] + suf[None, :]
+                n_pair = counts[:max_n + 1, None] + counts[None, :max_n + 1]
+                pair[n_pair > max_n] = np.inf
+                # Every kg moved from the free order into an MOQ order changes the cost by b[t] - b[f]
+                with np.errstate(invalid="ignore"):
+                    score = pair - n_pair * b[f]
+                n_pre, n_suf = np.unravel_index(np.argmin(score), score.shape)
+                n_total = n_pre + n_suf
+                cost = (b[f] * (total - m * n_total) + h * j * total + m * pair[n_pre, n_suf]
+                        - h * stacked_demand(i, j))
+                if cost < best[0]:
+                    best = (cost, (f, n_pre, n_suf, total - m * n_total, suffix_takes))
+            if best[1] is not None:
+                block_cost[i, j] = best[0]
+                block_plan[i, j] = best[1]
+
+    # Final block [i, n_days) that may end with stock: all orders exactly moq
+    final_cost = np.full(n_days + 1, np.inf)
+    final_count = np.zeros(n_days + 1, dtype=int)
+    final_cost[n_days] = 0.0
+    for i in range(n_days):
+        costs = prefix[i][0][-1]
+        with np.errstate(invalid="ignore"):
+            totals = m * (costs + counts * h * n_days) - h * stacked_demand(i, n_days)
+        if np.isfinite(totals).any():
+            final_count[i] = int(np.argmin(totals))
+            final_cost[i] = totals[final_count[i]]
+
+    # Shortest path over block boundaries
+    best_to = np.full(n_days + 1, np.inf)
+    best_to[0] = 0.0
+    came_from = np.zeros(n_days + 1, dtype=int)
+    for j in range(1, n_days + 1):
+        cand = best_to[:j] + block_cost[:j, j]
+        came_from[j] = int(np.argmin(cand))
+        best_to[j] = cand[came_from[j]]
+    finish = best_to + final_cost
+    last = int(np.argmin(finish))
+    if not np.isfinite(finish[last]):
+        nan = np.full(n_days, np.nan)
+        return {"feasible": False, "total_cost": np.nan, "orders": nan, "inventory": nan.copy(),
+                "stockouts": nan.copy()}
+
+    orders = np.zeros(n_days)
+
+    def place_prefix(i, t_end, n):
+        takes = prefix[i][1]
+        for t in range(t_end - 1, i - 1, -1):
+            if n > 0 and takes[t - i][n]:
+                orders[t] += m
+                n -= 1
+
+    if last < n_days:
+        place_prefix(last, n_days, final_count[last])
+    j = last
+    while j > 0:
+        i = came_from[j]
+        plan = block_plan[i, j]
+        if plan is not None:
+            f, n_pre, n_suf, free_qty, suffix_takes = plan
+            orders[f] += free_qty
+            place_prefix(i, f, n_pre)
+            n = n_suf
+            for s in range(f + 1, j):
+                if n > 0 and suffix_takes[s][n]:
+                    orders[s] += m
+                    n -= 1
+        j = i
+
+    inventory = np.maximum(np.cumsum(orders - d), 0.0)
+    return {
+        "feasible": True,
+        "total_cost": float(c @ orders + h * inventory.sum()),
+        "orders": orders,
+        "inventory": inventory,
+        "stockouts": np.zeros(n_days),
+    }
+
+
+def solve_with_moq(demand, unit_costs, holding_costs, order_mask, min_order_quantities):
+    """
+    ``solve_uncapacitated`` for (n_items, n_days) inputs where items with a positive
+    minimum order quantity are solved by ``solve_moq_lot_sizing``.
+    Returns None when an item is too large for the MOQ dynamic program.
+    """
+    demand = np.asarray(demand, dtype=float)
+    unit_costs = np.broadcast_to(np.asarray(unit_costs, dtype=float), demand.shape)
+    order_mask = np.broadcast_to(np.asarray(order_mask, dtype=bool), demand.shape)
+    holding = np.broadcast_to(np.asarray(holding_costs, dtype=float), demand.shape[:-1])
+    moq = np.broadcast_to(np.asarray(min_order_quantities, dtype=float), demand.shape[:-1])
+
+    # One batch member per item, so an infeasible item does not blank the others
+    solution = solve_uncapacitated(demand[:, None], unit_costs[:, None], holding[:, None], order_mask[:, None])
+    solution = {key: np.array(solution[key][:, 0]) for key in ("orders", "inventory", "stockouts")}
+    item_costs = []
+    for item in range(demand.shape[0]):
+        if moq[item] > 0:
+            item_solution = solve_moq_lot_sizing(demand[item], unit_costs[item], holding[item],
+                                                 order_mask[item], moq[item])
+            if item_solution is None:
+                return None
+            for key in ("orders", "inventory", "stockouts"):
+                solution[key][item] = item_solution[key]
+            item_costs.append(item_solution["total_cost"])
+        else:
+            item_costs.append(unit_costs[item] @ solution["orders"][item]
+                              + holding[item] * solution["inventory"][item].sum())
+    feasible = bool(np.all(np.isfinite(item_costs)))
+    solution["feasible"] = feasible
+    solution["total_cost"] = float(np.sum(item_costs)) if feasible else np.nan
+    return solution
+
+
+def is_fast_path_eligible(unit_costs, holding_costs, stockout_costs=None):
+    """
+    The scan is exact only for non-negative, finite costs (otherwise the LP may be
+    unbounded). A stockout cost may be np.inf, meaning that item's demand must be met.
+    """
+    for arr in (unit_costs, holding_costs):
+        arr = np.asarray(arr, dtype=float)
+        if not np.all(np.isfinite(arr)) or np.any(arr < 0):
+            return False
+    if stockout_costs is not None:
+        arr = np.asarray(stockout_costs, dtype=float)
+        if np.any(np.isnan(arr)) or np.any(arr < 0):
+            return False
+    return True
+
+
+if __name__ == "__main__":
+    # Cross-check the fast path against CBC on random instances
+    import ordering_model as om
+
+    rng = np.random.default_rng(0)
+    worst = 0.0
+    for trial in range(50):
+        sales = {drink: rng.integers(0, 200, len(om.DAYS)) for drink in om.DRINKS}
+        demand = om.calculate_demand_from_sales(sales)
+        costs = {ing: float(rng.uniform(1, 20)) for ing in om.INGREDIENTS}
+        holding = {ing: float(rng.uniform(0, 3)) for ing in om.INGREDIENTS}
+        discount = float(rng.uniform(0, 0.5))
+        stockout = ({ing: float(rng.uniform(0, 30)) for ing in om.INGREDIENTS}
+                    if trial % 2 else None)
+        ordering_days = sorted(rng.choice(om.DAYS, size=rng.integers(1, 7), replace=False).tolist())
+
+        fast = om.enhanced_solve_ordering_plan(demand, costs, discount, holding,
+                                               stockout_costs=stockout, ordering_days=ordering_days)
+        cbc = om.enhanced_solve_ordering_plan(demand, costs, discount, holding,
+                                              stockout_costs=stockout, ordering_days=ordering_days,
+                                              use_fast_path=False)
+        assert fast["status"] == cbc["status"], (trial, fast["status"], cbc["status"])
+        if cbc["status"] == "Optimal":
+            worst = max(worst, abs(fast["total_cost"] - cbc["total_cost"]))
+    print(f"50 instances checked, max |fast - CBC| total_cost difference: {worst:.2e}")
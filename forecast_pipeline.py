@@ -0,0 +1,247 @@
+"""Streaming forecast-to-plan pipeline over daily sales history.
+
+Each run reads only the history rows appended since the previous run (CSV by
+byte offset, Parquet by row group, xlsx by row), folds them into an online
+least-squares forecaster, predicts the coming week's drink sales, and hands the
+forecast to ``calculate_demand_from_sales`` and the solver. Reader position and
+forecaster statistics are saved in a small state file between runs, so the full
+history is never reloaded or refit.
+
+The forecaster uses the same features as the notebook's LinearRegression model:
+an intercept, the promotion flag and one-hot weekdays (Monday as baseline).
+"""
+
+import os
+import pickle
+
+import numpy as np
+
+from ordering_model import (DRINKS, DAYS, DAY_NAMES, DISCOUNT_DAYS, calculate_demand_from_sales,
+                            solve_ordering_plan)
+
+WEEKDAYS = {name.lower(): i for i, name in enumerate(
+    ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'])}
+WEEKDAYS.update({name.lower(): i for i, name in enumerate(DAY_NAMES)})
+
+
+class HistoryReader:
+    """
+    Incremental reader for a sales history file (.csv, .parquet or .xlsx).
+
+    ``read_new()`` returns only complete rows that were not returned before, as
+    dicts keyed by column name. Reading stops at the first row with a missing
+    sales value (e.g. the empty forecast week in demand_history.xlsx) so that row
+    is picked up once it has been filled in.
+    """
+
+    def __init__(self, path, drinks=DRINKS):
+        self.path = path
+        self.drinks = list(drinks)
+        self.rows_read = 0     # rows consumed (Parquet / xlsx)
+        self.byte_offset = 0   # position after the last consumed line (CSV)
+        self.header = None
+
+    def _complete(self, row):
+        return all(row.get(f"{drink} Sales") not in (None, "") and
+                   not (isinstance(row.get(f"{drink} Sales"), float) and np.isnan(row[f"{drink} Sales"]))
+                   for drink in self.drinks)
+
+    def read_new(self):
+        ext = os.path.splitext(self.path)[1].lower()
+        if ext == ".csv":
+            return self._read_csv()
+        if ext in (".parquet", ".pq"):
+            return self._read_parquet()
+        if ext in (".xlsx", ".xlsm"):
+            return self._read_xlsx()
+        raise ValueError(f"Unsupported history format: {ext}")
+
+    def _take(self, rows):
+        """Keep the leading run of complete rows."""
+        taken = []
+        for row in rows:
+            if not self._complete(row):
+                break
+            taken.append(row)
+        return taken
+
+    def _read_csv(self):
+        import csv
+
+        with open(self.path, "rb") as f:
+            if self.header is None:
+                first = f.readline()
+                self.header = next(csv.reader([first.decode("utf-8-sig")]))
+                self.byte_offset = f.tell()
+            f.seek(self.byte_offset)
+            data = f.read()
+        rows, consumed = [], 0
+        for line in data.splitlines(keepends=True):
+            if not line.endswith(b"\n"):
+                break  # partially written line
+            values = next(csv.reader([line.decode("utf-8")]), [])
+            row = dict(zip(self.header, values))
+            if not values or not self._complete(row):
+                break
+            rows.append(row)
+            consumed += len(line)
+        self.byte_offset += consumed
+        self.rows_read += len(rows)
+        return rows
+
+    def _read_parquet(self):
+        import pyarrow.parquet as pq
+
+        parquet = pq.ParquetFile(self.path, memory_map=True)
+        rows, first_row = [], 0
+        for group in range(parquet.num_row_groups):
+            n_rows = parquet.metadata.row_group(group).num_rows
+            if first_row + n_rows > self.rows_read:
+                table = parquet.read_row_group(group)
+                skip = max(self.rows_read - first_row, 0)
+                rows.extend(table.slice(skip).to_pylist())
+            first_row += n_rows
+        rows = self._take(rows)
+        self.rows_read += len(rows)
+        return rows
+
+    def _read_xlsx(self):
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(self.path, read_only=True, data_only=True)
+        try:
+            sheet = workbook.active
+            header = next(sheet.iter_rows(max_row=1, values_only=True))
+            self.header = [name if name is not None else f"Unnamed: {i}" for i, name in enumerate(header)]
+            rows = (dict(zip(self.header, values))
+                    for values in sheet.iter_rows(min_row=2 + self.rows_read, values_only=True))
+            rows = self._take(rows)
+        finally:
+            workbook.close()
+        self.rows_read += len(rows)
+        return rows
+
+
+def _weekday_of(row):
+    for value in row.values():
+        if isinstance(value, str) and value.strip().lower() in WEEKDAYS:
+            return WEEKDAYS[value.strip().lower()]
+    raise ValueError(f"No weekday column found in history row: {row}")
+
+
+def _features(weekdays, promotions):
+    """Design matrix: intercept, promotion flag, weekday one-hot (Monday baseline)."""
+    weekdays = np.asarray(weekdays)
+    X = np.zeros((len(weekdays), 8))
+    X[:, 0] = 1.0
+    X[:, 1] = promotions
+    not_monday = np.flatnonzero(weekdays > 0)
+    X[not_monday, 1 + weekdays[not_monday]] = 1.0
+    return X
+
+
+class OnlineDemandForecaster:
+    """
+    Linear regression of daily drink sales kept as running sufficient statistics.
+
+    ``update`` adds a batch in O(batch) time; nothing from earlier batches is kept
+    except ``X'X`` and ``X'y``. ``decay`` < 1 exponentially down-weights older days.
+    """
+
+    def __init__(self, drinks=DRINKS, decay=1.0):
+        self.drinks = list(drinks)
+        self.decay = decay
+        self.xtx = np.zeros((8, 8))
+        self.xty = np.zeros((8, len(self.drinks)))
+        self.n_obs = 0
+
+    def update(self, weekdays, promotions, sales):
+        """Fold in a batch: weekdays (n,), promotions (n,), sales (n, drinks)."""
+        X = _features(weekdays, promotions)
+        y = np.asarray(sales, dtype=float).reshape(len(X), len(self.drinks))
+        if self.decay < 1.0:
+            weights = self.decay ** np.arange(len(X) - 1, -1, -1)
+            self.xtx *= self.decay ** len(X)
+            self.xty *= self.decay ** len(X)
+            self.xtx += X.T @ (X * weights[:, None])
+            self.xty += X.T @ (y * weights[:, None])
+        else:
+            self.xtx += X.T @ X
+            self.xty += X.T @ y
+        self.n_obs += len(X)
+
+    def coefficients(self):
+        """Intercept row followed by the feature weights, one column per drink."""
+        # Centered minimum-norm least squares, as sklearn's LinearRegression does:
+        # promotions only ever fall on Thursdays, so X'X is singular
+        n = self.xtx[0, 0]
+        mean_x, mean_y = self.xtx[0, 1:] / n, self.xty[0] / n
+        cov_xx = self.xtx[1:, 1:] - n * np.outer(mean_x, mean_x)
+        cov_xy = self.xty[1:] - n * np.outer(mean_x, mean_y)
+        weights = np.linalg.pinv(cov_xx, hermitian=True) @ cov_xy
+        return np.vstack([mean_y - mean_x @ weights, weights])
+
+    def predict(self, weekdays, promotions):
+        """Non-negative integer sales forecast as ``{drink: array}``."""
+        if self.n_obs == 0:
+            raise RuntimeError("The forecaster has not seen any history yet")
+        preds = _features(weekdays, promotions) @ self.coefficients()
+        preds = np.maximum(0, np.round(preds)).astype(int)
+        return {drink: preds[:, i] for i, drink in enumerate(self.drinks)}
+
+
+class ForecastPipeline:
+    """History reader + online forecaster, persisted between runs in ``state_path``."""
+
+    def __init__(self, history_path, state_path=None, drinks=DRINKS, decay=1.0):
+        self.history_path = history_path
+        self.state_path = state_path
+        self.reader = HistoryReader(history_path, drinks)
+        self.forecaster = OnlineDemandForecaster(drinks, decay=decay)
+
+    @classmethod
+    def load(cls, history_path, state_path, **kwargs):
+        """Resume from ``state_path`` when it exists (and belongs to the same history file)."""
+        if state_path and os.path.exists(state_path):
+            with open(state_path, "rb") as f:
+                pipeline = pickle.load(f)
+            if os.path.abspath(pipeline.history_path) == os.path.abspath(history_path):
+                pipeline.state_path = state_path
+                return pipeline
+        return cls(history_path, state_path, **kwargs)
+
+    def save(self):
+        if self.state_path:
+            tmp_path = f"{self.state_path}.tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump(self, f)
+            os.replace(tmp_path, self.state_path)
+
+    def ingest(self):
+        """Read and learn from the rows appended since the last call; returns the row count."""
+        rows = self.reader.read_new()
+        if rows:
+            weekdays = [_weekday_of(row) for row in rows]
+            promotions = [float(row.get("Promotion Day") or 0) for row in rows]
+            sales = [[float(row[f"{drink} Sales"]) for drink in self.forecaster.drinks] for row in rows]
+            self.forecaster.update(weekdays, promotions, sales)
+        return len(rows)
+
+    def forecast_week(self, promotion_days=DISCOUNT_DAYS):
+        """Forecast sales for the next Mon-Sun week, with promotions on ``promotion_days``."""
+        promotions = np.isin(DAYS, promotion_days).astype(float)
+        return self.forecaster.predict(DAYS, promotions)
+
+
+def run_pipeline(history_path, state_path, standard_costs, thursday_discount_rate, holding_costs,
+                 solver=solve_ordering_plan, **solver_options):
+    """
+    One daily step: ingest new history, forecast next week, explode to ingredient
+    demand and solve. Returns ``(sales_forecast, results)``.
+    """
+    pipeline = ForecastPipeline.load(history_path, state_path)
+    pipeline.ingest()
+    pipeline.save()
+    sales = pipeline.forecast_week()
+    demand = calculate_demand_from_sales(sales)
+    return sales, solver(demand, standard_costs, thursday_discount_rate, holding_costs, **solver_options)
@@ -0,0 +1,223 @@
+"""Persistent HiGHS instances: a model updated in place and re-solved from the previous basis, and
+resident per-thread solvers that models are passed to in memory.
+
+The matrix-form model from ``sparse_model`` is loaded into a long-lived HiGHS
+instance once. Later calls only diff the rebuilt cost, bound and right-hand-side
+arrays against what HiGHS already holds and push the changed entries, so HiGHS
+keeps its optimal basis and the dual simplex restarts from it. A change to the
+model structure (ordering days, MOQ or expiry settings, and demand while MOQs
+are on, since the MOQ bounds and cuts are built from it) reloads the model.
+
+``solve_resident`` is the ``backend="highs_persistent"`` of the solvers: each
+thread (so also each pool worker process) keeps one incremental model for its
+whole life and every model is pushed to it as arrays, so a solve pays neither a
+solver start-up nor the model translation of ``scipy.optimize.milp``, and
+consecutive solves that differ only in costs, bounds or demand (a sensitivity
+sweep, a re-planned week) re-solve from the previous basis.
+
+Requires the ``highspy`` package.
+"""
+
+import threading
+from importlib.util import find_spec
+
+import numpy as np
+
+from diagnostics import SolveDiagnostics, sparse_model_size
+from sparse_model import build_sparse_model, model_inputs, model_results
+
+HIGHS_AVAILABLE = find_spec("highspy") is not None
+
+_STATUS = {"Optimal": "Optimal", "Infeasible": "Infeasible", "Unbounded": "Unbounded",
+           "Time limit reached": "TimeLimitReached", "Primal infeasible or unbounded": "Infeasible"}
+
+
+def pass_model(highs, model):
+    """
+    Load a ``build_sparse_model`` model into ``highs`` straight from its arrays
+    (row-wise, no ``HighsLp`` copy or CSC conversion).
+    """
+    import highspy
+
+    A = model["A"].tocsr()
+    highs.passModel(A.shape[1], A.shape[0], A.nnz, int(highspy.MatrixFormat.kRowwise),
+                    int(highspy.ObjSense.kMinimize), 0.0, model["c"], model["lb"], model["ub"],
+                    model["row_lo"], model["row_hi"], A.indptr.astype(np.int32), A.indices.astype(np.int32),
+                    A.data, model["integrality"].astype(np.int32))
+
+
+_resident = threading.local()
+
+
+def solve_resident(model, max_solver_time=20, stats=None):
+    """
+    Solve a ``build_sparse_model`` model on this thread's resident incremental model;
+    returns (status, objective, x) like ``sparse_model.solve_sparse_model``. A model
+    with the same structure as the previous one is pushed as a diff and re-solved
+    from the kept basis (or, for a MIP, the previous plan).
+    Iterations, nodes, the MIP gap and ``warm_start`` are written into ``stats`` when given.
+    """
+    resident = resident_model()
+    status, objective, x = resident.load(model).run(max_solver_time)
+    if stats is not None:
+        stats.update(iterations=resident.iterations, nodes=resident.nodes, persistent=True,
+                     warm_start=resident.warm_start)
+        if model["integrality"].any():
+            stats["mip_gap"] = resident.mip_gap
+    return status, objective, x
+
+
+def _same_structure(old, new):
+    """True when only costs, bounds and row bounds differ between two models."""
+    if old["A"].shape != new["A"].shape or old["offsets"] != new["offsets"]:
+        return False
+    a, b = old["A"], new["A"]
+    return (np.array_equal(a.indptr, b.indptr) and np.array_equal(a.indices, b.indices)
+            and np.array_equal(a.data, b.data)
+            and np.array_equal(old["integrality"], new["integrality"]))
+
+
+class IncrementalOrderingModel:
+    """
+    Keeps one built LP/MIP in a HiGHS instance across re-solves.
+
+    ``update`` takes the same keyword arguments as ``enhanced_solve_ordering_plan``
+    and pushes only what changed; ``solve`` returns the usual results dict plus
+    ``warm_start`` (whether the previous basis was reused, or for a MIP the previous
+    plan offered as the starting incumbent) and ``iterations``.
+    """
+
+    def __init__(self, max_solver_time=20):
+        import highspy
+
+        self._highs = highspy.Highs()
+        self._highs.setOptionValue("output_flag", False)
+        self._highs.setOptionValue("time_limit", float(max_solver_time))
+        self._inf = highspy.kHighsInf
+        self._model = None
+        self._diagnostics = None
+        self._has_basis = False
+        self._start = None
+        self.rebuilds = 0
+        self.updates = 0
+        self.warm_start = False
+        self.iterations = self.nodes = 0
+        self.mip_gap = None
+
+    def update(self, demand, standard_costs, thursday_discount_rate, holding_costs, expiry_days=None,
+               min_order_quantities=None, stockout_costs=None, ordering_days=None):
+        """Load the model on first use, otherwise apply only the changed coefficients."""
+        self._diagnostics = diagnostics = SolveDiagnostics("highs")
+        with diagnostics.phase("build"):
+            new = build_sparse_model(**model_inputs(demand, standard_costs, thursday_discount_rate, holding_costs,
+                                                    expiry_days, min_order_quantities, stockout_costs,
+                                                    ordering_days))
+        with diagnostics.phase("update"):
+            self.load(new)
+        diagnostics.model.update(sparse_model_size(new))
+        return self
+
+    def load(self, model):
+        """Hold an already built ``build_sparse_model`` model, pushing only what differs from the last one."""
+        self._push(model)
+        self._model = model
+        return self
+
+    def _push(self, new):
+        """Load ``new`` into HiGHS, or push only the entries that differ from the loaded model."""
+        old = self._model
+        if old is None or not _same_structure(old, new):
+            self._highs.clearModel()
+            pass_model(self._highs, new)
+            self._has_basis = False
+            self._start = None
+            self.rebuilds += 1
+        else:
+            highs, inf = self._highs, self._inf
+            cols = np.flatnonzero(old["c"] != new["c"])
+            if len(cols):
+                highs.changeColsCost(len(cols), cols, new["c"][cols])
+            cols = np.flatnonzero((old["lb"] != new["lb"]) | (old["ub"] != new["ub"]))
+            if len(cols):
+                highs.changeColsBounds(len(cols), cols, np.clip(new["lb"][cols], -inf, inf),
+                                       np.clip(new["ub"][cols], -inf, inf))
+            rows = np.flatnonzero((old["row_lo"] != new["row_lo"]) | (old["row_hi"] != new["row_hi"]))
+            if len(rows):
+                highs.changeRowsBounds(len(rows), rows, np.clip(new["row_lo"][rows], -inf, inf),
+                                       np.clip(new["row_hi"][rows], -inf, inf))
+            self.updates += 1
+
+    @property
+    def highs(self):
+        """The underlying ``highspy.Highs`` instance (for ranging and basis queries after ``run``)."""
+        return self._highs
+
+    def run(self, max_solver_time=None):
+        """
+        Solve the loaded model as it stands; returns (status, objective, x) like
+        ``sparse_model.solve_sparse_model``. ``warm_start`` and ``iterations`` are set for the run.
+        """
+        if self._model is None:
+            raise RuntimeError("Call update() or load() before solving")
+        highs = self._highs
+        if max_solver_time is not None:
+            highs.setOptionValue("time_limit", float(max_solver_time))
+        integer = self._model["integrality"].any()
+        if integer:
+            # A MIP has no basis to keep: the previous optimum is offered as the first incumbent instead
+            self.warm_start = self._start is not None
+            if self.warm_start:
+                highs.setSolution(len(self._start), np.arange(len(self._start), dtype=np.int32), self._start)
+        else:
+            self.warm_start = self._has_basis
+        highs.run()
+        status = _STATUS.get(highs.modelStatusToString(highs.getModelStatus()), "Undefined")
+        info = highs.getInfo()
+        self.iterations = info.simplex_iteration_count
+        self.nodes = max(info.mip_node_count, 0)
+        self.mip_gap = info.mip_gap
+        self._has_basis = status == "Optimal"
+        has_solution = status == "Optimal" or (status == "TimeLimitReached" and info.primal_solution_status == 2)
+        x = np.asarray(highs.getSolution().col_value) if has_solution else None
+        self._start = x if integer else None
+        return status, info.objective_function_value, x
+
+    def solve(self):
+        """Re-solve (from the previous basis when there is one) and return the results dict."""
+        if self._model is None:
+            raise RuntimeError("Call update() with the model inputs before solve()")
+        diagnostics = self._diagnostics or SolveDiagnostics("highs")
+        with diagnostics.phase("solve"):
+            status, objective, x = self.run()
+        with diagnostics.phase("extract"):
+            results = model_results(self._model, status, objective, x)
+        results["warm_start"] = self.warm_start
+        results["iterations"] = self.iterations
+        diagnostics.solver.update(iterations=self.iterations, nodes=self.nodes, warm_start=self.warm_start)
+        results["diagnostics"] = diagnostics.as_dict()
+        return results
+
+    def sweep(self, updates):
+        """Solve a sequence of input dicts, each one warm-started from the previous optimum."""
+        for inputs in updates:
+            yield self.update(**inputs).solve()
+
+
+def resident_model():
+    """This thread's long-lived incremental model, created on first use."""
+    model = getattr(_resident, "model", None)
+    if model is None:
+        model = IncrementalOrderingModel()
+        _resident.model = model
+    return model
+
+
+def solve_in_session(state, key="incremental_ordering_model", max_solver_time=20, **inputs):
+    """
+    Solve through a model kept in ``state`` (e.g. ``st.session_state``), creating it on first use.
+    """
+    model = state.get(key)
+    if model is None:
+        model = IncrementalOrderingModel(max_solver_time=max_solver_time)
+        state[key] = model
+    return model.update(**inputs).solve()
@@ -0,0 +1,209 @@
+"""Background executor for ordering-plan solves: job ids, progress, partial results and cancellation.
+
+A job is one solve or a batch of independent solves (e.g. the points of a
+sensitivity analysis). ``submit`` returns a job id right away, and ``status``
+returns a snapshot with progress and the results finished so far, in completion
+order. The UI can therefore poll instead of blocking on the solver.
+
+The solves run in a shared process pool, so CBC runs and model building from
+different users proceed in parallel. Tasks are dispatched round-robin across
+jobs, with at most ``max_workers`` in flight, so one user's 40-point sweep does
+not queue everyone else's single solve behind it. Inputs already in the solve
+cache are answered without touching the pool, and definitive results are added
+to it.
+
+Cancelling a job drops its queued tasks. A solve that has already started
+cannot be interrupted in its worker process: it ends within its own
+``max_solver_time``, and its result is discarded.
+"""
+
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from scenario_runner import _solve_scenario
+from solve_cache import cache_key, default_cache
+
+ACTIVE_STATES = ("queued", "running")
+_CACHEABLE = ("Optimal", "Infeasible", "Unbounded")
+
+
+def _warm_worker():
+    """Worker start-up task: import the solver modules (already loaded when forked from a warm parent)."""
+    import ordering_model  # noqa: F401
+    import sparse_model  # noqa: F401
+
+    return os.getpid()
+
+
+class _Job:
+    def __init__(self, job_id, solver, tasks, label):
+        self.id = job_id
+        self.solver = solver
+        self.label = label
+        self.pending = deque(tasks)
+        self.total = len(self.pending)
+        self.running = 0
+        self.results = []
+        self.state = "queued"
+        self.submitted = time.time()
+        self.finished = None
+        self.settled = threading.Event()
+
+
+class JobExecutor:
+    """
+    Runs solver jobs in a shared process pool; safe to use from many threads (Streamlit sessions).
+
+    ``max_jobs`` bounds how many jobs are remembered: the oldest finished ones
+    are forgotten first.
+    """
+
+    def __init__(self, max_workers=None, max_jobs=500, cache=default_cache, mp_context=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_jobs = max_jobs
+        self.cache = cache
+        self._pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=mp_context)
+        self._jobs = OrderedDict()
+        self._ready = deque()  # jobs with queued tasks, in round-robin order
+        self._in_flight = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.RLock()
+
+    def submit(self, solver, label=None, **inputs):
+        """Queue one ``solver(**inputs)`` call; returns the job id."""
+        return self.submit_batch(solver, [(None, inputs)], label)
+
+    def submit_batch(self, solver, tasks, label=None):
+        """
+        Queue independent ``solver(**kwargs)`` calls given as ``(key, kwargs)`` pairs
+        (e.g. from ``scenario_runner.sensitivity_scenarios``); returns the job id.
+        """
+        queued = []
+        cached = []
+        for key, kwargs in tasks:
+            result = self.cache.get(cache_key(solver, **kwargs)) if self.cache is not None else None
+            if result is None:
+                queued.append((key, kwargs))
+            else:
+                if isinstance(result, dict) and "diagnostics" in result:
+                    result["diagnostics"]["cached"] = True
+                cached.append((key, result))
+        with self._lock:
+            job = _Job(f"job-{next(self._ids)}", solver, queued, label)
+            job.total += len(cached)
+            job.results.extend(cached)
+            self._jobs[job.id] = job
+            if job.pending:
+                self._ready.append(job)
+            self._settle(job)
+            self._dispatch()
+            self._prune()
+            return job.id
+
+    def status(self, job_id):
+        """
+        Snapshot of a job as a dict: id, label, state (queued, running, done or
+        cancelled), done, total, results (list of (key, result) in completion
+        order) and elapsed_s. Returns None for unknown (or forgotten) jobs.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            end = job.finished or time.time()
+            return {
+                "id": job.id, "label": job.label, "state": job.state,
+                "done": len(job.results), "total": job.total, "results": list(job.results),
+                "elapsed_s": end - job.submitted,
+            }
+
+    def result(self, job_id):
+        """Result of a finished single-solve job, or None."""
+        status = self.status(job_id)
+        if status is None or status["state"] != "done" or not status["results"]:
+            return None
+        return status["results"][0][1]
+
+    def wait(self, job_id, timeout=None):
+        """Block until a job is done or cancelled (or ``timeout`` seconds pass); returns its status."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            job.settled.wait(timeout)
+        return self.status(job_id)
+
+    def warm_up(self):
+        """
+        Start the worker processes now, so the first solves do not pay for process
+        start-up and imports; returns how many distinct workers answered.
+        """
+        futures = [self._pool.submit(_warm_worker) for _ in range(self.max_workers)]
+        return len({future.result() for future in futures})
+
+    def cancel(self, job_id):
+        """Cancel a job; returns True if it was still active."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.state not in ACTIVE_STATES:
+                return False
+            job.pending.clear()
+            job.state = "cancelled"
+            job.finished = time.time()
+            job.settled.set()
+            return True
+
+    def shutdown(self, wait=False):
+        with self._lock:
+            for job in self._jobs.values():
+                job.pending.clear()
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+
+    def _dispatch(self):
+        """Start queued tasks round-robin across jobs while there are free workers."""
+        while self._in_flight < self.max_workers and self._ready:
+            job = self._ready.popleft()
+            if not job.pending:
+                continue
+            key, kwargs = job.pending.popleft()
+            if job.pending:
+                self._ready.append(job)
+            job.running += 1
+            job.state = "running"
+            self._in_flight += 1
+            future = self._pool.submit(_solve_scenario, job.solver, kwargs)
+            future.add_done_callback(partial(self._finished, job, key, kwargs))
+
+    def _finished(self, job, key, kwargs, future):
+        if future.cancelled():
+            result = {"status": "Cancelled"}
+        elif future.exception() is not None:  # e.g. a worker process died
+            exc = future.exception()
+            result = {"status": "Error", "error": f"{type(exc).__name__}: {exc}"}
+        else:
+            result = future.result()
+        status = result.get("status") if isinstance(result, dict) else None
+        if self.cache is not None and (status is None or status in _CACHEABLE):
+            self.cache.put(cache_key(job.solver, **kwargs), result)
+        with self._lock:
+            self._in_flight -= 1
+            job.running -= 1
+            if job.state != "cancelled":
+                job.results.append((key, result))
+            self._settle(job)
+            self._dispatch()
+
+    def _settle(self, job):
+        if job.state in ACTIVE_STATES and not job.pending and not job.running:
+            job.state = "done"
+            job.finished = time.time()
+            job.settled.set()
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.state not in ACTIVE_STATES]
+        for job_id in finished[:max(len(self._jobs) - self.max_jobs, 0)]:
+            del self._jobs[job_id]
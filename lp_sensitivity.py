@@ -0,0 +1,292 @@
+"""Dual values, reduced costs and ranging of the ordering LP, for instant what-if estimates.
+
+An LP optimum already answers small what-if questions without a re-solve. The
+dual of an inventory-balance row is the cost of one more kg of demand that day.
+Ranging gives the interval over which a cost coefficient or a demand value can
+move while the current plan stays optimal. Inside that interval the total cost
+changes linearly, at the rate given by the plan quantity (for a cost) or the
+dual (for demand).
+
+Reports come from two places:
+
+- Analytic, for the decoupled model the fast path solves (non-negative costs,
+  no expiry). The balance dual of day t is the cheapest landed cost of a kg
+  delivered on t: the minimum over allowed order days s <= t of
+  ``unit_cost[s] + holding * (t - s)``, capped by the stockout penalty. The
+  ranges are where the cheapest source of some day would change. These duals hold
+  for any non-negative demand.
+- HiGHS otherwise (perishable items, negative costs). It solves the matrix-form
+  model of ``sparse_model`` and reads the row duals, column duals and
+  ``getRanging``. This requires highspy.
+
+Models with minimum order quantities are MIPs and have no duals.
+
+``parameter_range`` and ``first_order_estimates`` turn a report into cost
+estimates for the sensitivity parameters of ``run_sensitivity_analysis``. When
+several coefficients move together but only single-coefficient ranges are known,
+the 100% rule gives a conservative combined range.
+"""
+
+import numpy as np
+
+from fast_solver import is_fast_path_eligible
+from ordering_model import INGREDIENTS, DAY_NAMES, DISCOUNT_DAYS, shelf_life_array
+
+SENSITIVITY_PARAMETERS = ("thursday_discount", "holding_cost_factor", "demand_factor")
+
+
+def _candidates(unit_costs, holding, order_mask, stockout=None):
+    """
+    Landed cost of serving day t from source s as ``base + holding * lag``:
+    arrays (item, source, day) over the order days, plus the stockout as a last
+    source when there are stockout costs. Infeasible sources have base +inf.
+    """
+    n_items, n_days = unit_costs.shape
+    lag = np.arange(n_days)[None, :] - np.arange(n_days)[:, None]
+    feasible = (lag >= 0)[None] & order_mask[:, :, None]
+    base = np.where(feasible, unit_costs[:, :, None], np.inf)
+    slope = np.broadcast_to(np.maximum(lag, 0), base.shape).astype(float)
+    if stockout is not None:
+        penalty = np.where(np.isfinite(stockout), stockout, np.inf)
+        base = np.concatenate([base, np.repeat(penalty[:, None, None], n_days, axis=2)], axis=1)
+        slope = np.concatenate([slope, np.zeros((n_items, 1, n_days))], axis=1)
+    return base, slope
+
+
+def analytic_sensitivity(demand, unit_costs, holding_costs, order_mask, stockout_costs=None):
+    """
+    Duals, reduced costs and ranges of the decoupled model in closed form
+    (see the module docstring); None when some demand cannot be served.
+    """
+    demand = np.asarray(demand, dtype=float)
+    unit_costs = np.asarray(unit_costs, dtype=float)
+    holding = np.asarray(holding_costs, dtype=float)
+    order_mask = np.asarray(order_mask, dtype=bool)
+    n_items, n_days = demand.shape
+    days = np.arange(n_days)
+    lag = days[None, :] - days[:, None]  # (source, day)
+    served = demand > 0
+
+    base, slope = _candidates(unit_costs, holding, order_mask,
+                              None if stockout_costs is None else np.asarray(stockout_costs, dtype=float))
+    landed = base + holding[:, None, None] * slope
+    source = np.argmin(landed, axis=1)
+    best = np.take_along_axis(landed, source[:, None, :], axis=1)[:, 0]
+    if np.any(~np.isfinite(best) & served):
+        return None
+    second = np.partition(landed, 1, axis=1)[:, 1] if landed.shape[1] > 1 else np.full_like(best, np.inf)
+
+    # Plan of the cheapest sources
+    from_order = served & (source < n_days)
+    orders = np.zeros_like(demand)
+    item_idx = np.broadcast_to(np.arange(n_items)[:, None], demand.shape)
+    np.add.at(orders, (item_idx[from_order], source[from_order]), demand[from_order])
+    stockouts = np.where(served & (source == n_days), demand, 0.0)
+    inventory = np.cumsum(orders, axis=1) - np.cumsum(demand - stockouts, axis=1)
+
+    duals = best
+    with np.errstate(invalid="ignore"):
+        order_rc = np.where(order_mask, unit_costs - duals, np.nan)
+        next_dual = np.concatenate([duals[:, 1:], np.zeros((n_items, 1))], axis=1)
+        inventory_rc = holding[:, None] + duals - next_dual
+
+        # Unit cost of (item, s): the plan stays optimal up to the point where a day served
+        # by s has a cheaper alternative, and down to where s undercuts another day's source
+        held = holding[:, None, None] * lag[None]
+        serves = (source[:, None, :] == days[None, :, None]) & served[:, None, :]
+        cost_hi = np.where(serves, second[:, None, :] - held, np.inf).min(axis=2)
+        could_serve = (lag >= 0)[None] & served[:, None, :] & ~serves
+        cost_lo = np.where(could_serve, best[:, None, :] - held, -np.inf).max(axis=2)
+        # Below -holding * (days held to the end) buying stock to keep becomes profitable (unbounded)
+        cost_lo = np.maximum(cost_lo, -holding[:, None] * (n_days - days)[None, :])
+        cost_lo = np.where(order_mask, cost_lo, -np.inf)
+        cost_hi = np.where(order_mask, cost_hi, np.inf)
+
+        # Holding cost of an item: every served day keeps its source while
+        # (base_src - base_alt) + h * (slope_src - slope_alt) <= 0 for all alternatives
+        base_src = np.take_along_axis(base, source[:, None, :], axis=1)
+        slope_src = np.take_along_axis(slope, source[:, None, :], axis=1)
+        alternative = np.isfinite(base) & served[:, None, :]
+        np.put_along_axis(alternative, source[:, None, :], False, axis=1)
+        a = np.where(alternative, base_src - base, 0.0)
+        b = np.where(alternative, slope_src - slope, 0.0)
+        bound = -a / np.where(b != 0, b, 1.0)
+        holding_hi = np.where(b > 0, bound, np.inf).min(axis=(1, 2))
+        holding_lo = np.maximum(np.where(b < 0, bound, -np.inf).max(axis=(1, 2)), 0.0)
+
+    total_cost = float((unit_costs * orders).sum() + (holding[:, None] * inventory).sum()
+                       + (np.where(stockouts > 0, duals, 0.0) * stockouts).sum())
+    return {
+        "source": "analytic",
+        "total_cost": total_cost,
+        "balance_duals": duals,
+        "demand_range": (np.zeros_like(demand), np.full_like(demand, np.inf)),
+        "order_reduced_costs": order_rc,
+        "order_cost_range": (cost_lo, cost_hi),
+        "inventory_reduced_costs": inventory_rc,
+        "holding_cost_range": (holding_lo, holding_hi),
+        "orders": orders,
+        "inventory": inventory,
+        "stockouts": stockouts,
+    }
+
+
+def _hundred_percent(allowed):
+    """Largest common step when each of several coefficients may move by ``allowed`` alone (100% rule)."""
+    with np.errstate(divide="ignore"):
+        total = float(np.sum(1.0 / np.asarray(allowed, dtype=float)))
+    return np.inf if total == 0 else 1.0 / total
+
+
+def highs_sensitivity(model):
+    """
+    Duals, reduced costs and ranging of a ``sparse_model.build_sparse_model``
+    LP from HiGHS; None unless HiGHS finds an optimum. The LP goes through this
+    thread's resident incremental model, so a sweep that only moves costs or
+    demand re-solves from the previous basis.
+    """
+    from incremental_model import resident_model
+
+    if model["integrality"].any():
+        raise ValueError("The model has integer variables (minimum order quantities) and no duals")
+    resident = resident_model()
+    if resident.load(model).run()[0] != "Optimal":
+        return None
+    highs = resident.highs
+    solution = highs.getSolution()
+    _, ranging = highs.getRanging()
+
+    n_items, n_days = model["shape"]
+    n_cells = n_items * n_days
+    offsets = model["offsets"]
+
+    def cells(values, start=0):
+        return np.asarray(values[start:start + n_cells], dtype=float).reshape(n_items, n_days)
+
+    x = np.asarray(solution.col_value)
+    row_dual = np.asarray(solution.row_dual)
+    col_dual = np.asarray(solution.col_dual)
+    # The balance rows are inv[t] - inv[t-1] - order[t] ... = -demand[t]
+    duals = -cells(row_dual)
+    demand = -cells(model["row_lo"])
+    demand_lo = np.maximum(-cells(np.asarray(ranging.row_bound_up.value_)), 0.0)
+    demand_hi = -cells(np.asarray(ranging.row_bound_dn.value_))
+
+    cost_up = np.asarray(ranging.col_cost_up.value_, dtype=float)
+    cost_dn = np.asarray(ranging.col_cost_dn.value_, dtype=float)
+    order_mask = cells(model["ub"], offsets["orders"]) > 0
+    cost_lo = np.where(order_mask, cells(cost_dn, offsets["orders"]), -np.inf)
+    cost_hi = np.where(order_mask, cells(cost_up, offsets["orders"]), np.inf)
+
+    # An item's holding cost is on all its inventory columns at once: 100% rule
+    holding = cells(model["c"], offsets["inventory"])[:, 0]
+    inv_up = cells(cost_up, offsets["inventory"]) - holding[:, None]
+    inv_dn = holding[:, None] - cells(cost_dn, offsets["inventory"])
+    holding_hi = holding + np.array([_hundred_percent(row) for row in inv_up])
+    holding_lo = np.maximum(holding - np.array([_hundred_percent(row) for row in inv_dn]), 0.0)
+
+    return {
+        "source": "highs",
+        "total_cost": float(highs.getInfo().objective_function_value),
+        "balance_duals": duals,
+        "demand_range": (np.minimum(demand_lo, demand), np.maximum(demand_hi, demand)),
+        "order_reduced_costs": np.where(order_mask, cells(col_dual, offsets["orders"]), np.nan),
+        "order_cost_range": (cost_lo, cost_hi),
+        "inventory_reduced_costs": cells(col_dual, offsets["inventory"]),
+        "holding_cost_range": (holding_lo, holding_hi),
+        "orders": cells(x, offsets["orders"]),
+        "inventory": cells(x, offsets["inventory"]),
+        "stockouts": cells(x, offsets["stockouts"]) if "stockouts" in offsets else np.zeros((n_items, n_days)),
+    }
+
+
+def sensitivity_report(demand, standard_costs, thursday_discount_rate, holding_costs, expiry_days=None,
+                       min_order_quantities=None, stockout_costs=None, ordering_days=None):
+    """
+    Sensitivity report of the ordering LP (same inputs as ``enhanced_solve_ordering_plan``).
+
+    Returns a dict with "source" ("analytic" or "highs"), "total_cost",
+    (ingredient, day) arrays "balance_duals" (cost of one more kg of demand),
+    "order_reduced_costs", "inventory_reduced_costs", the plan ("orders",
+    "inventory", "stockouts"), and (low, high) array pairs "demand_range",
+    "order_cost_range" and per-ingredient "holding_cost_range". A cost or demand
+    value can move inside its range without changing the plan, with every other
+    input held fixed. "inputs" keeps the arrays the report was computed for.
+    Returns None when the model has no optimum.
+    """
+    from sparse_model import build_sparse_model, model_inputs
+
+    if min_order_quantities and any(q > 0 for q in min_order_quantities.values()):
+        raise ValueError("Minimum order quantities make the model a MIP, which has no duals")
+    inputs = model_inputs(demand, standard_costs, thursday_discount_rate, holding_costs,
+                          expiry_days, None, stockout_costs, ordering_days)
+    stockout = inputs["stockout_costs"]
+    report = None
+    if not shelf_life_array(expiry_days).any() and is_fast_path_eligible(
+            inputs["unit_costs"], inputs["holding_costs"], stockout):
+        report = analytic_sensitivity(inputs["demand"], inputs["unit_costs"], inputs["holding_costs"],
+                                      inputs["order_mask"], stockout)
+    else:
+        report = highs_sensitivity(build_sparse_model(**inputs))
+    if report is not None:
+        report["ingredients"] = list(INGREDIENTS)
+        report["days"] = list(DAY_NAMES)
+        report["inputs"] = {
+            "demand": inputs["demand"], "unit_costs": inputs["unit_costs"], "holding_costs": inputs["holding_costs"],
+            "standard_costs": np.array([standard_costs[ing] for ing in INGREDIENTS], dtype=float),
+            "thursday_discount_rate": thursday_discount_rate, "discount_days": list(DISCOUNT_DAYS),
+        }
+    return report
+
+
+def parameter_range(report, parameter_name):
+    """
+    ``(low, high, base, slope)`` for a sensitivity parameter: the interval over
+    which the report's plan stays optimal, the parameter value the report was
+    computed at, and the rate of change of the total cost inside the interval.
+
+    "thursday_discount" is the discount rate. "holding_cost_factor" and
+    "demand_factor" scale all holding costs and all demand, with base 1.
+    """
+    inputs = report["inputs"]
+    if parameter_name == "thursday_discount":
+        base = inputs["thursday_discount_rate"]
+        days = inputs["discount_days"]
+        standard = inputs["standard_costs"]
+        slope = -float((standard[:, None] * report["orders"][:, days]).sum())
+        cost = inputs["unit_costs"][:, days]
+        lo, hi = (bound[:, days] for bound in report["order_cost_range"])
+        # A higher rate lowers the discount-day costs of every item by standard_cost * step
+        up = [_hundred_percent((c - l) / s) for c, l, s in zip(cost, lo, standard) if s > 0]
+        down = [_hundred_percent((h - c) / s) for c, h, s in zip(cost, hi, standard) if s > 0]
+        return base - min(down, default=np.inf), base + min(up, default=np.inf), base, slope
+    if parameter_name == "holding_cost_factor":
+        holding = inputs["holding_costs"]
+        slope = float((holding * report["inventory"].sum(axis=1)).sum())
+        lo, hi = report["holding_cost_range"]
+        positive = holding > 0
+        return (max(np.max(lo[positive] / holding[positive], initial=0.0), 0.0),
+                np.min(hi[positive] / holding[positive], initial=np.inf), 1.0, slope)
+    if parameter_name == "demand_factor":
+        demand = inputs["demand"]
+        served = demand > 0
+        slope = float((report["balance_duals"][served] * demand[served]).sum())
+        if report["source"] == "analytic":
+            return 0.0, np.inf, 1.0, slope
+        lo, hi = report["demand_range"]
+        return (1.0 - _hundred_percent((demand[served] - lo[served]) / demand[served]),
+                1.0 + _hundred_percent((hi[served] - demand[served]) / demand[served]), 1.0, slope)
+    raise ValueError(f"Unknown sensitivity parameter: {parameter_name}")
+
+
+def first_order_estimates(report, parameter_name, values):
+    """
+    ``(value, estimated_total_cost, in_range)`` per value. Estimates inside the
+    range are exact (the plan does not change). Outside it the value should be
+    re-solved: the estimate is then an upper bound for the cost parameters and a
+    lower bound for the demand factor.
+    """
+    lo, hi, base, slope = parameter_range(report, parameter_name)
+    tol = 1e-9
+    return [(value, report["total_cost"] + slope * (value - base), lo - tol <= value <= hi + tol)
+            for value in values]
@@ -0,0 +1,90 @@
+"""Versioned, copy-on-write registry of the drink menu: drinks, recipes and default sales.
+
+A ``Menu`` is an immutable snapshot. Its drinks are a tuple, its recipes and
+default sales are read-only mappings of read-only arrays, and its recipe matrix
+is computed once, when the version is created. Adding a drink never modifies a
+snapshot: ``MenuRegistry.add_drink`` builds the next version and swaps it in
+under a lock. Readers call ``current()`` once and use that snapshot for the whole
+rerun, solve or scenario. Solves therefore need no locks and never see a
+half-added drink.
+
+Each Streamlit session (or scenario) gets its own registry seeded with
+``DEFAULT_MENU``, so a drink added by one user does not appear in other
+sessions. Version numbers are unique within the process, so they are safe to
+use as cache keys.
+"""
+
+import itertools
+import threading
+from types import MappingProxyType
+
+import numpy as np
+
+from ordering_model import INGREDIENTS, DRINKS, DAYS, KG_PER_DRINK, PREDICTED_SALES, explode_demand, recipe_matrix
+
+_versions = itertools.count(1)
+
+
+def _frozen(values):
+    array = np.array(values, copy=True)
+    array.setflags(write=False)
+    return array
+
+
+class Menu:
+    """Immutable menu snapshot; derive changed menus with ``with_drink``."""
+
+    def __init__(self, drinks, recipes, default_sales, ingredients=INGREDIENTS):
+        self.version = next(_versions)
+        self.ingredients = tuple(ingredients)
+        self.drinks = tuple(drinks)
+        self.recipes = MappingProxyType({
+            ing: MappingProxyType({drink: float(recipes.get(ing, {}).get(drink, 0.0)) for drink in self.drinks})
+            for ing in self.ingredients})
+        self.default_sales = MappingProxyType({drink: _frozen(default_sales[drink]) for drink in self.drinks})
+        # (ingredient x drink) kg per drink, shared by every solve on this version
+        self.recipe = _frozen(recipe_matrix(self.ingredients, self.drinks, self.recipes))
+
+    def __repr__(self):
+        return f"Menu(version={self.version}, drinks={list(self.drinks)})"
+
+    def with_drink(self, name, recipe, default_sales):
+        """New menu version with drink ``name`` added (``recipe``: {ingredient: kg per drink})."""
+        if name in self.drinks:
+            raise ValueError(f"Drink '{name}' already exists.")
+        recipes = {ing: {**self.recipes[ing], name: recipe.get(ing, 0.0)} for ing in self.ingredients}
+        return Menu(self.drinks + (name,), recipes, {**self.default_sales, name: default_sales}, self.ingredients)
+
+    def demand_from_sales(self, daily_sales):
+        """Ingredient demand ({ingredient: {day: kg}}) of daily sales for this menu's drinks."""
+        sales = np.array([daily_sales[drink] for drink in self.drinks], dtype=float).reshape(len(self.drinks), -1)
+        demand_kg = explode_demand(sales, self.recipe)
+        return {ing: {day: demand_kg[i, day] for day in DAYS} for i, ing in enumerate(self.ingredients)}
+
+
+DEFAULT_MENU = Menu(DRINKS, KG_PER_DRINK, PREDICTED_SALES)
+
+
+class MenuRegistry:
+    """Holds the current menu version; ``add_drink`` swaps in a new snapshot atomically."""
+
+    def __init__(self, menu=DEFAULT_MENU):
+        self._menu = menu
+        self._lock = threading.Lock()
+
+    def current(self):
+        """The current snapshot; keep using it for the whole operation."""
+        return self._menu
+
+    def add_drink(self, name, recipe, default_sales):
+        """Add a drink with its recipe and default daily sales; returns (success, message)."""
+        with self._lock:
+            try:
+                self._menu = self._menu.with_drink(name, recipe, default_sales)
+            except ValueError as exc:
+                return False, str(exc)
+        return True, f"Drink '{name}' added successfully."
+
+    def fork(self):
+        """Independent registry starting from the current snapshot (e.g. for a what-if scenario)."""
+        return MenuRegistry(self._menu)
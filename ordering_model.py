@@ -0,0 +1,714 @@
+"""Core ordering model: constants, demand calculation and LP solvers (no UI).
+
+PuLP is imported on first use by the CBC paths, so importing this module (and
+solving on the NumPy fast path) does not load it.
+"""
+
+import numpy as np
+import pandas as pd
+from copy import deepcopy
+
+from fast_solver import solve_uncapacitated, solve_with_moq, is_fast_path_eligible
+from diagnostics import SolveDiagnostics, cbc_log_file, pulp_model_size, read_cbc_log
+
+# --- Constants and Configuration ---
+# Default values, these can be overridden by user input below
+
+# Ingredients
+INGREDIENTS = ['Coffee Beans', 'Milk Foam', 'Steamed Milk', 'Chocolate Powder']
+DRINKS = ['Cappuccino', 'Latte', 'Mocha']
+DAYS = list(range(7))
+DAY_NAMES = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+
+# Default Costs per kg
+DEFAULT_STANDARD_COSTS = {
+    'Coffee Beans': 14.0, 'Milk Foam': 8.0, 'Steamed Milk': 6.0, 'Chocolate Powder': 5.0
+}
+# Default Thursday discount rate (e.g., 0.15 for 15%)
+DEFAULT_THURSDAY_DISCOUNT_RATE = 0.15
+
+# Default Inventory holding costs per kg per day
+DEFAULT_HOLDING_COSTS = {
+    'Coffee Beans': 2.6, 'Milk Foam': 0.6, 'Steamed Milk': 1.0, 'Chocolate Powder': 0.3
+}
+
+# Days when ordering is NOT allowed (0-indexed: Tue, Fri)
+NO_ORDER_DAYS = [1, 4]
+
+# Days when the discount applies (0-indexed: Thu)
+DISCOUNT_DAYS = [3]
+
+# Big-M of the original MOQ formulation (moq_mode="legacy"); also caps orders at 1000 kg
+LEGACY_MOQ_BIG_M = 1000
+
+# Ingredient quantities per drink (kg) - ASSUMPTIONS
+KG_PER_DRINK = {
+    'Coffee Beans':     {'Cappuccino': 0.040, 'Latte': 0.025, 'Mocha': 0.030},
+    'Milk Foam':        {'Cappuccino': 0.010, 'Latte': 0.005, 'Mocha': 0.0},
+    'Steamed Milk':     {'Cappuccino': 0.010, 'Latte': 0.020, 'Mocha': 0.020},
+    'Chocolate Powder': {'Cappuccino': 0.0,   'Latte': 0.0,   'Mocha': 0.015}
+}
+
+# Predicted weekly sales (used if 'Use Predicted Demand' is checked)
+PREDICTED_SALES = {
+    'Cappuccino': np.array([51, 48, 55, 113, 136, 112, 69]),
+    'Latte':      np.array([80, 43, 56, 94, 120, 140, 64]),
+    'Mocha':      np.array([55, 45, 58, 131, 165, 132, 83])
+}
+
+# --- Helper Functions: Calculate Demand ---
+def recipe_matrix(ingredients=None, drinks=None, recipes=None, sparse=False):
+    """
+    Recipe book as an (ingredient x drink) matrix of kg per drink.
+    Missing recipe entries are 0. sparse=True returns a scipy.sparse CSR matrix.
+    """
+    ingredients = INGREDIENTS if ingredients is None else ingredients
+    drinks = DRINKS if drinks is None else drinks
+    recipes = KG_PER_DRINK if recipes is None else recipes
+    matrix = np.array([[recipes.get(ing, {}).get(drink, 0.0) for drink in drinks] for ing in ingredients],
+                      dtype=float).reshape(len(ingredients), len(drinks))
+    if sparse:
+        from scipy import sparse as sp
+        return sp.csr_matrix(matrix)
+    return matrix
+
+def explode_demand(sales, recipe=None):
+    """
+    Ingredient demand for a whole batch of sales in one matrix product.
+
+    sales has shape (..., drinks, days), e.g. (stores, drinks, days); the result
+    has shape (..., ingredients, days). recipe defaults to recipe_matrix() and may
+    also be a scipy.sparse matrix.
+    """
+    recipe = recipe_matrix() if recipe is None else recipe
+    sales = np.asarray(sales, dtype=float)
+    if hasattr(recipe, "tocsr"):  # scipy.sparse: fold the batch axes into the columns
+        n_drinks, n_days = sales.shape[-2:]
+        batch = sales.shape[:-2]
+        flat = np.moveaxis(sales, -2, 0).reshape(n_drinks, -1)
+        exploded = np.asarray(recipe @ flat).reshape((recipe.shape[0],) + batch + (n_days,))
+        return np.moveaxis(exploded, 0, -2)
+    return np.matmul(recipe, sales)
+
+def calculate_demand_from_sales(daily_sales):
+    """Calculates ingredient demand based on drink sales."""
+    sales = np.array([daily_sales[drink] for drink in DRINKS], dtype=float).reshape(len(DRINKS), -1)
+    demand_kg = explode_demand(sales)
+
+    # Format into the dictionary structure needed by the solver
+    demand_dict = {
+        ing: {day: demand_kg[i, day] for day in DAYS} for i, ing in enumerate(INGREDIENTS)
+    }
+    return demand_dict
+
+# --- MOQ Formulation Helpers ---
+MOQ_MODES = ("tight", "legacy")
+
+# LP/MIP backends: PuLP + a CBC subprocess per solve, HiGHS through scipy, or a
+# resident HiGHS instance per thread that models are passed to in memory.
+# Every backend reports a solve stopped by its time limit as "TimeLimitReached",
+# with "total_cost" and the plan of the best solution found when there is one
+# and the status alone when there is none.
+SOLVER_BACKENDS = ("cbc", "highs", "highs_persistent")
+
+def _check_backend(backend):
+    if backend not in SOLVER_BACKENDS:
+        raise ValueError(f"Unknown solver backend: {backend}")
+
+def moq_order_bounds(demand, min_order_quantities, expiry_days=None):
+    """
+    Per (item, day) big-M for ``order <= M * decision`` from the usable demand.
+
+    With non-negative costs an order never needs to exceed max(moq, demand from
+    that day to the end of the horizon, or to its expiry for perishable items):
+    nothing beyond that can be consumed, and it could just as well not be bought.
+    """
+    demand = np.asarray(demand, dtype=float)
+    n_days = demand.shape[1]
+    cum = np.concatenate([np.zeros((demand.shape[0], 1)), np.cumsum(demand, axis=1)], axis=1)
+    last = np.full(demand.shape, n_days)
+    if expiry_days is not None:
+        expiry = np.asarray(expiry_days, dtype=int)
+        perishable = expiry > 0
+        last[perishable] = np.minimum(np.arange(n_days) + expiry[perishable, None], n_days)
+    usable = np.take_along_axis(cum, last, axis=1) - cum[:, :-1]
+    return np.maximum(np.asarray(min_order_quantities, dtype=float)[:, None], usable)
+
+def shelf_life_array(expiry_days, ingredients=INGREDIENTS, n_days=len(DAYS)):
+    """Per-item shelf life in days as an int array; 0 where the item does not expire within the horizon."""
+    lives = np.array([(expiry_days or {}).get(ing) or 0 for ing in ingredients], dtype=int)
+    return np.where((lives > 0) & (lives < n_days), lives, 0)
+
+def stockout_cost_array(stockout_costs, ingredients=INGREDIENTS):
+    """
+    Per-item stockout cost as a float array, or None without stockout costs.
+    Items without a cost get np.inf: their demand must be met.
+    """
+    if not stockout_costs:
+        return None
+    return np.array([np.inf if stockout_costs.get(ing) is None else stockout_costs[ing] for ing in ingredients],
+                    dtype=float)
+
+# --- Result Packaging ---
+OUTPUT_FORMATS = ("dataframe", "arrays", "arrow")
+_ARROW_COLUMNS = {"order_plan": "order_kg", "inventory_levels": "inventory_kg", "stockout_levels": "stockout_kg",
+                  "waste_levels": "waste_kg"}
+
+def _check_output(output):
+    if output not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format: {output} (expected one of {', '.join(OUTPUT_FORMATS)})")
+
+def _variable_values(variables, ingredients=INGREDIENTS, days=DAYS):
+    """PuLP variable values as an (ingredient, day) array in one pass (unset values become 0)."""
+    return np.array([[variables[ing, day].varValue for day in days] for ing in ingredients], dtype=float)
+
+def _waste_values(waste_vars, ingredients=INGREDIENTS, days=DAYS):
+    """Waste variable values as an (ingredient, day) array; 0 for items that do not expire."""
+    return np.array([[waste_vars[ing, day].varValue if (ing, day) in waste_vars else 0.0 for day in days]
+                     for ing in ingredients], dtype=float)
+
+def package_results(results, blocks, output="dataframe", ingredients=INGREDIENTS, day_names=DAY_NAMES):
+    """
+    Add solution blocks ({"order_plan": array, ...}, each (ingredient, day)) to results.
+
+    output="dataframe" adds "<block>_df" DataFrames, "arrays" adds the NumPy arrays
+    plus "ingredients"/"days" labels, and "arrow" adds a long-format pyarrow
+    "plan_table" (ingredient, day, order_kg, inventory_kg[, stockout_kg][, waste_kg]).
+    Values at or below 1e-6 are reported as 0.
+    """
+    _check_output(output)
+    blocks = {name: np.where(values > 1e-6, values, 0.0) for name, values in blocks.items()}
+    if output == "dataframe":
+        for name, values in blocks.items():
+            results[f"{name}_df"] = pd.DataFrame(values, index=list(ingredients), columns=list(day_names))
+    elif output == "arrays":
+        results.update(blocks)
+        results["ingredients"] = list(ingredients)
+        results["days"] = list(day_names)
+    else:
+        import pyarrow as pa
+
+        n_days = len(day_names)
+        columns = {"ingredient": np.repeat(np.asarray(ingredients, dtype=object), n_days),
+                   "day": np.tile(np.asarray(day_names, dtype=object), len(ingredients))}
+        columns.update({_ARROW_COLUMNS[name]: values.ravel() for name, values in blocks.items()})
+        results["plan_table"] = pa.table(columns)
+    return results
+
+# --- Core LP Solver Function ---
+# Modified to accept cost parameters
+def _solve_with_fast_path(demand, effective_cost, holding_costs, no_order_days, stockout_costs=None,
+                          diagnostics=None, output="dataframe", min_order_quantities=None, expiry_days=None):
+    """
+    Solve the decoupled model with the NumPy cheapest-source scan instead of CBC
+    (items with a minimum order quantity use the MOQ dynamic program, perishable
+    items a scan over their shelf life).
+    Returns None when the inputs are outside what these solve exactly.
+    """
+    diagnostics = diagnostics or SolveDiagnostics("numpy")
+    with diagnostics.phase("build"):
+        demand_arr = np.array([[demand[ing][day] for day in DAYS] for ing in INGREDIENTS], dtype=float)
+        cost_arr = np.array([[effective_cost[ing][day] for day in DAYS] for ing in INGREDIENTS], dtype=float)
+        holding_arr = np.array([holding_costs[ing] for ing in INGREDIENTS], dtype=float)
+        stockout_arr = stockout_cost_array(stockout_costs)
+        if not is_fast_path_eligible(cost_arr, holding_arr, stockout_arr):
+            return None
+
+        order_mask = np.ones((len(INGREDIENTS), len(DAYS)), dtype=bool)
+        order_mask[:, list(no_order_days)] = False
+    with diagnostics.phase("solve"):
+        if min_order_quantities:
+            if stockout_costs or expiry_days:
+                return None
+            moq_arr = np.array([min_order_quantities.get(ing) or 0 for ing in INGREDIENTS], dtype=float)
+            solution = solve_with_moq(demand_arr, cost_arr, holding_arr, order_mask, moq_arr)
+            if solution is None:
+                return None
+        else:
+            solution = solve_uncapacitated(demand_arr, cost_arr, holding_arr, order_mask,
+                                           stockout_costs=stockout_arr,
+                                           shelf_life=shelf_life_array(expiry_days))
+    # Size of the LP this replaces: orders, inventory (and stockouts) per cell, one balance row per cell
+    n_cells = demand_arr.size
+    n_blocks = 3 if stockout_costs else 2
+    diagnostics.model.update(variables=n_blocks * n_cells, constraints=n_cells,
+                             nonzeros=(n_blocks + 1) * n_cells - len(INGREDIENTS))
+    if not solution["feasible"]:
+        return {"status": "Infeasible", "diagnostics": diagnostics.as_dict()}
+
+    with diagnostics.phase("extract"):
+        blocks = {"order_plan": solution["orders"], "inventory_levels": solution["inventory"]}
+        if stockout_costs:
+            blocks["stockout_levels"] = solution["stockouts"]
+        if expiry_days:
+            blocks["waste_levels"] = np.zeros_like(solution["orders"])  # nothing is bought to expire
+        results = package_results({"status": "Optimal", "total_cost": float(solution["total_cost"])},
+                                  blocks, output)
+    results["diagnostics"] = diagnostics.as_dict()
+    return results
+
+def _solve_cbc(prob, diagnostics, **options):
+    """Solve a PuLP problem with CBC, recording model size, iterations and nodes."""
+    import pulp
+
+    diagnostics.model.update(pulp_model_size(prob))
+    with cbc_log_file() as log_path:
+        with diagnostics.phase("solve"):
+            prob.solve(pulp.PULP_CBC_CMD(msg=0, logPath=log_path, **options))
+        diagnostics.solver.update(read_cbc_log(log_path))
+
+def _cbc_status(prob):
+    """
+    (status, has_solution) of a PuLP problem solved by CBC. CBC stopped by the
+    time limit is "Optimal" with an integer-feasible incumbent in PuLP's terms
+    and "Not Solved" without one; both are "TimeLimitReached" here.
+    """
+    import pulp
+
+    has_solution = prob.sol_status in (pulp.LpSolutionOptimal, pulp.LpSolutionIntegerFeasible)
+    if prob.status == pulp.LpStatusNotSolved or prob.sol_status == pulp.LpSolutionIntegerFeasible:
+        return "TimeLimitReached", has_solution
+    return pulp.LpStatus[prob.status], has_solution and prob.status == pulp.LpStatusOptimal
+
+def _add_sensitivity(results, demand, standard_costs, thursday_discount_rate, holding_costs, **options):
+    """Attach the duals, reduced costs and ranging of the LP (lp_sensitivity) to an optimal result."""
+    if results["status"] == "Optimal":
+        from lp_sensitivity import sensitivity_report
+        results["sensitivity"] = sensitivity_report(demand, standard_costs, thursday_discount_rate,
+                                                    holding_costs, **options)
+    return results
+
+def solve_ordering_plan(demand, standard_costs, thursday_discount_rate, holding_costs, use_fast_path=True,
+                        output="dataframe", backend="cbc", sensitivity=False):
+    """
+    Solves the LP model for material ordering using provided cost parameters.
+
+    The model decouples per ingredient, so it is solved with the NumPy fast path
+    unless use_fast_path=False (or the costs are negative), in which case the LP
+    goes to the chosen backend (see SOLVER_BACKENDS; CBC by default).
+    output selects how the plan is returned: "dataframe" (default), "arrays" or
+    "arrow" (see package_results). sensitivity=True adds the balance duals,
+    reduced costs and ranging intervals as results["sensitivity"]
+    (see lp_sensitivity.sensitivity_report).
+    """
+    _check_output(output)
+    _check_backend(backend)
+    if sensitivity:
+        results = solve_ordering_plan(demand, standard_costs, thursday_discount_rate, holding_costs,
+                                      use_fast_path, output, backend)
+        return _add_sensitivity(results, demand, standard_costs, thursday_discount_rate, holding_costs)
+
+    # Calculate Thursday costs based on the discount rate
+    thursday_costs = {k: v * (1 - thursday_discount_rate) for k, v in standard_costs.items()}
+
+    # Create effective cost dictionary: cost[ingredient][day]
+    effective_cost = {}
+    for ing in INGREDIENTS:
+        effective_cost[ing] = {}
+        for day in DAYS:
+            effective_cost[ing][day] = thursday_costs[ing] if day in DISCOUNT_DAYS else standard_costs[ing]
+
+    if use_fast_path:
+        results = _solve_with_fast_path(demand, effective_cost, holding_costs, NO_ORDER_DAYS, output=output)
+        if results is not None:
+            return results
+
+    if backend != "cbc":
+        from sparse_model import sparse_solve_ordering_plan
+        return sparse_solve_ordering_plan(demand, standard_costs, thursday_discount_rate, holding_costs,
+                                          max_solver_time=10, output=output,
+                                          persistent=backend == "highs_persistent")
+
+    import pulp
+
+    diagnostics = SolveDiagnostics("cbc")
+
+    with diagnostics.phase("build"):
+        # Create the minimization problem
+        prob = pulp.LpProblem("Material_Ordering_Plan_UI_Dynamic", pulp.LpMinimize) # Renamed for clarity
+
+        # Define Decision Variables
+        order_vars = pulp.LpVariable.dicts("Order",
+                                           ((ing, day) for ing in INGREDIENTS for day in DAYS),
+                                           lowBound=0, cat='Continuous')
+        inventory_vars = pulp.LpVariable.dicts("Inventory",
+                                               ((ing, day) for ing in INGREDIENTS for day in DAYS),
+                                               lowBound=0, cat='Continuous')
+
+        # Define Objective Function - using passed holding_costs and calculated effective_cost
+        prob += pulp.lpSum(effective_cost[ing][day] * order_vars[ing, day] for ing in INGREDIENTS for day in DAYS) + \
+                pulp.lpSum(holding_costs[ing] * inventory_vars[ing, day] for ing in INGREDIENTS for day in DAYS), \
+                "Total Cost"
+
+        # Define Constraints
+        # Inventory Balance
+        for ing in INGREDIENTS:
+            for day in DAYS:
+                if day == 0:
+                    prob += inventory_vars[ing, day] == order_vars[ing, day] - demand[ing][day], \
+                            f"Inv_Balance_{ing}_Day_{day}"
+                else:
+                    prob += inventory_vars[ing, day] == inventory_vars[ing, day-1] + order_vars[ing, day] - demand[ing][day], \
+                            f"Inv_Balance_{ing}_Day_{day}"
+        # Ordering Restriction
+        for ing in INGREDIENTS:
+            for day in NO_ORDER_DAYS:
+                prob += order_vars[ing, day] == 0, f"No_Order_{ing}_Day_{day}"
+
+    # Solve the Problem
+    # Set a short timeout for the solver (e.g., 10 seconds)
+    _solve_cbc(prob, diagnostics, timeLimit=10)
+
+    # --- Extract Results ---
+    status, has_solution = _cbc_status(prob)
+    results = {"status": status}
+    if has_solution:
+        with diagnostics.phase("extract"):
+            results["total_cost"] = pulp.value(prob.objective)
+            package_results(results, {"order_plan": _variable_values(order_vars),
+                                      "inventory_levels": _variable_values(inventory_vars)}, output)
+
+    results["diagnostics"] = diagnostics.as_dict()
+    return results
+
+def _build_enhanced_model(demand, effective_cost, holding_costs, no_order_days, expiry_days=None,
+                          min_order_quantities=None, stockout_costs=None,
+                          ingredients=INGREDIENTS, days=DAYS, moq_mode="tight"):
+    """
+    Build the enhanced PuLP model (no solve).
+    Returns (prob, order_vars, inventory_vars, stockout_vars, waste_vars).
+
+    Expiry is modelled by stock age with FIFO issue: stock ordered on day s can be used
+    through day s + expiry - 1, so end-of-day inventory can only consist of the
+    orders of the last expiry - 1 days. Older stock leaves through the waste
+    variables (it may also be discarded earlier). That is one row per item and
+    day with at most expiry nonzeros, so the model grows linearly with the horizon.
+
+    moq_mode="tight" links orders to their decision binaries with per-day bounds
+    from the remaining demand (moq_order_bounds) and adds the (l,S) inequalities
+    order[t] <= demand[t..l] * decision[t] + inventory[l]; "legacy" keeps the
+    original fixed big-M of 1000.
+    """
+    import pulp
+
+    # Create the minimization problem
+    prob = pulp.LpProblem("Enhanced_Material_Ordering_Plan", pulp.LpMinimize)
+
+    # Define Decision Variables
+    order_vars = pulp.LpVariable.dicts("Order",
+                                     ((ing, day) for ing in ingredients for day in days),
+                                     lowBound=0, cat='Continuous')
+    
+    inventory_vars = pulp.LpVariable.dicts("Inventory",
+                                         ((ing, day) for ing in ingredients for day in days),
+                                         lowBound=0, cat='Continuous')
+    
+    # Define stockout variables if needed
+    stockout_vars = None
+    if stockout_costs:
+        stockout_vars = pulp.LpVariable.dicts("Stockout",
+                                           ((ing, day) for ing in ingredients for day in days),
+                                           lowBound=0, cat='Continuous')
+        for ing in ingredients:
+            if stockout_costs.get(ing) is None:  # no cost given: demand must be met
+                for day in days:
+                    stockout_vars[ing, day].upBound = 0
+    
+    # Define binary variables for minimum order quantities if needed
+    order_decision_vars = None
+    if min_order_quantities:
+        order_decision_vars = pulp.LpVariable.dicts("OrderDecision",
+                                                 ((ing, day) for ing in ingredients for day in days),
+                                                 cat='Binary')
+
+    # Define waste variables for perishable ingredients
+    shelf_lives = shelf_life_array(expiry_days, ingredients, len(days))
+    perishable = [ing for ing, life in zip(ingredients, shelf_lives) if life]
+    waste_vars = None
+    if perishable:
+        waste_vars = pulp.LpVariable.dicts("Waste",
+                                        ((ing, day) for ing in perishable for day in days),
+                                        lowBound=0, cat='Continuous')
+
+    # Define Objective Function
+    obj_function = pulp.lpSum(effective_cost[ing][day] * order_vars[ing, day] 
+                            for ing in ingredients for day in days) + \
+                 pulp.lpSum(holding_costs[ing] * inventory_vars[ing, day] 
+                            for ing in ingredients for day in days)
+    
+    # Add stockout costs to objective function if applicable
+    if stockout_costs:
+        obj_function += pulp.lpSum(stockout_costs[ing] * stockout_vars[ing, day]
+                                for ing in ingredients if stockout_costs.get(ing) is not None for day in days)
+    
+    prob += obj_function, "Total Cost"
+
+    # Define Constraints
+    # Inventory Balance
+    for ing in ingredients:
+        for t, day in enumerate(days):
+            balance = order_vars[ing, day] - demand[ing][day]
+            if t > 0:
+                balance += inventory_vars[ing, days[t - 1]]
+            if waste_vars and ing in perishable:
+                balance -= waste_vars[ing, day]
+            if stockout_costs:  # If we're handling stockouts
+                prob += inventory_vars[ing, day] - stockout_vars[ing, day] == balance, \
+                        f"Inv_Balance_{ing}_Day_{day}"
+            else:  # Standard inventory balance
+                prob += inventory_vars[ing, day] == balance, f"Inv_Balance_{ing}_Day_{day}"
+    
+    # Ordering Restriction
+    for ing in ingredients:
+        for day in no_order_days:
+            prob += order_vars[ing, day] == 0, f"No_Order_{ing}_Day_{day}"
+    
+    # Minimum Order Quantity constraints
+    if min_order_quantities and order_decision_vars:
+        if moq_mode not in MOQ_MODES:
+            raise ValueError(f"Unknown MOQ mode: {moq_mode}")
+        demand_arr = np.array([[demand[ing][day] for day in days] for ing in ingredients], dtype=float)
+        cum_demand = np.cumsum(demand_arr, axis=1)
+        order_bounds = moq_order_bounds(
+            demand_arr, [min_order_quantities.get(ing, 0) for ing in ingredients],
+            shelf_lives)
+        for i, ing in enumerate(ingredients):
+            min_qty = min_order_quantities.get(ing, 0)
+            if min_qty > 0:
+                for t, day in enumerate(days):
+                    if day not in no_order_days:
+                        big_m = LEGACY_MOQ_BIG_M if moq_mode == "legacy" else order_bounds[i, t]
+                        # If ordered, must be at least min_qty
+                        prob += order_vars[ing, day] <= big_m * order_decision_vars[ing, day], \
+                                f"Order_Decision_Upper_{ing}_{day}"
+                        prob += order_vars[ing, day] >= min_qty * order_decision_vars[ing, day], \
+                                f"Min_Order_{ing}_{day}"
+                        if moq_mode == "tight":
+                            # (l,S) inequalities with S = {day}: an order serves at most the
+                            # demand through day l, anything beyond is still in stock at l
+                            # (or, for perishable items, wasted by then, up to its expiry)
+                            last = min(t + shelf_lives[i], len(days)) if shelf_lives[i] else len(days)
+                            for l in range(t, last):
+                                demand_to_l = cum_demand[i, l] - (cum_demand[i, t - 1] if t > 0 else 0.0)
+                                carried = inventory_vars[ing, days[l]]
+                                if shelf_lives[i]:
+                                    carried += pulp.lpSum(waste_vars[ing, days[k]] for k in range(t, l + 1))
+                                prob += order_vars[ing, day] <= demand_to_l * order_decision_vars[ing, day] + \
+                                        carried, f"LS_Cut_{ing}_{day}_{days[l]}"
+    
+    # Expiry: with FIFO issue only the last (expiry - 1) days of orders can still be in stock
+    for ing, shelf_life in zip(ingredients, shelf_lives):
+        if shelf_life:
+            for t, day in enumerate(days):
+                fresh = pulp.lpSum(order_vars[ing, days[k]] for k in range(max(0, t - shelf_life + 2), t + 1))
+                prob += inventory_vars[ing, day] <= fresh, f"Fresh_Stock_{ing}_Day_{day}"
+
+    return prob, order_vars, inventory_vars, stockout_vars, waste_vars
+
+def enhanced_solve_ordering_plan(demand, standard_costs, thursday_discount_rate, holding_costs, 
+                          expiry_days=None, min_order_quantities=None, stockout_costs=None, 
+                          ordering_days=None, max_solver_time=20, use_fast_path=True, backend="cbc",
+                          output="dataframe", moq_mode="tight", sensitivity=False):
+    """
+    Enhanced LP solver that includes additional features:
+    - Ingredient expiry constraints
+    - Minimum order quantities
+    - Stockout costs
+    - Custom ordering days
+
+    The model stays decoupled per ingredient and is solved by the NumPy fast path
+    (minimum order quantities use the MOQ dynamic program, which covers neither
+    stockout costs nor expiry); otherwise, or with use_fast_path=False, the MIP is
+    solved. Expiry is tracked by stock age with FIFO issue, and discarded stock is
+    returned as "waste_levels" (see _build_enhanced_model). moq_mode selects the
+    MOQ formulation of the MIP: "tight" (default) or "legacy".
+
+    backend="highs" builds the model in sparse matrix form and solves it in-process
+    with HiGHS (requires scipy) instead of PuLP + CBC; backend="highs_persistent"
+    passes that model to a resident HiGHS instance of the calling thread
+    (requires highspy), which avoids the per-solve solver set-up.
+
+    output selects how the plan is returned: "dataframe" (default), "arrays" or
+    "arrow" (see package_results). sensitivity=True adds the balance duals,
+    reduced costs and ranging intervals as results["sensitivity"] (LP only, so
+    not with minimum order quantities; see lp_sensitivity.sensitivity_report).
+    """
+    _check_output(output)
+    _check_backend(backend)
+    if sensitivity:
+        if min_order_quantities and any(q > 0 for q in min_order_quantities.values()):
+            raise ValueError("Minimum order quantities make the model a MIP, which has no duals")
+        options = dict(expiry_days=expiry_days, stockout_costs=stockout_costs, ordering_days=ordering_days)
+        results = enhanced_solve_ordering_plan(demand, standard_costs, thursday_discount_rate, holding_costs,
+                                               max_solver_time=max_solver_time, use_fast_path=use_fast_path,
+                                               backend=backend, output=output, **options)
+        return _add_sensitivity(results, demand, standard_costs, thursday_discount_rate, holding_costs, **options)
+    # Calculate Thursday costs based on the discount rate
+    thursday_costs = {k: v * (1 - thursday_discount_rate) for k, v in standard_costs.items()}
+
+    # Create effective cost dictionary: cost[ingredient][day]
+    effective_cost = {}
+    for ing in INGREDIENTS:
+        effective_cost[ing] = {}
+        for day in DAYS:
+            effective_cost[ing][day] = thursday_costs[ing] if day in DISCOUNT_DAYS else standard_costs[ing]
+
+    # Ordering Restriction - use custom ordering days if provided, else use default NO_ORDER_DAYS
+    no_order_days_to_use = NO_ORDER_DAYS
+    if ordering_days is not None:
+        no_order_days_to_use = [day for day in DAYS if day not in ordering_days]
+
+    has_moq = bool(min_order_quantities) and any(q > 0 for q in min_order_quantities.values())
+    has_expiry = bool(shelf_life_array(expiry_days).any())
+    if moq_mode not in MOQ_MODES:
+        raise ValueError(f"Unknown MOQ mode: {moq_mode}")
+    if use_fast_path and not (has_moq and has_expiry):
+        results = _solve_with_fast_path(demand, effective_cost, holding_costs,
+                                        no_order_days_to_use, stockout_costs, output=output,
+                                        min_order_quantities=min_order_quantities if has_moq else None,
+                                        expiry_days=expiry_days if has_expiry else None)
+        if results is not None:
+            return results
+
+    if backend != "cbc":
+        from sparse_model import sparse_solve_ordering_plan
+        return sparse_solve_ordering_plan(demand, standard_costs, thursday_discount_rate, holding_costs,
+                                          expiry_days, min_order_quantities, stockout_costs,
+                                          ordering_days, max_solver_time, output, moq_mode,
+                                          persistent=backend == "highs_persistent")
+
+    import pulp
+
+    diagnostics = SolveDiagnostics("cbc")
+    with diagnostics.phase("build"):
+        prob, order_vars, inventory_vars, stockout_vars, waste_vars = _build_enhanced_model(
+            demand, effective_cost, holding_costs, no_order_days_to_use, expiry_days,
+            min_order_quantities, stockout_costs, moq_mode=moq_mode)
+
+    # Solve the Problem
+    _solve_cbc(prob, diagnostics, timeLimit=max_solver_time)
+
+    # --- Extract Results ---
+    status, has_solution = _cbc_status(prob)
+    results = {"status": status}
+    
+    if has_solution:
+        with diagnostics.phase("extract"):
+            results["total_cost"] = pulp.value(prob.objective)
+            blocks = {"order_plan": _variable_values(order_vars),
+                      "inventory_levels": _variable_values(inventory_vars)}
+            if stockout_vars:
+                blocks["stockout_levels"] = _variable_values(stockout_vars)
+            if waste_vars:
+                blocks["waste_levels"] = _waste_values(waste_vars)
+            package_results(results, blocks, output)
+
+    results["diagnostics"] = diagnostics.as_dict()
+    return results
+
+# --- Helper Functions for Extensions ---
+def apply_seasonal_factors(sales_data, seasonal_factors):
+    """Apply seasonal adjustment factors to sales data."""
+    adjusted_sales = deepcopy(dict(sales_data))
+    
+    for drink in adjusted_sales:
+        for day_idx, day_name in enumerate(DAY_NAMES):
+            factor = seasonal_factors.get(day_name, 1.0)
+            adjusted_sales[drink][day_idx] = int(adjusted_sales[drink][day_idx] * factor)
+            
+    return adjusted_sales
+
+def run_sensitivity_grid(base_demand, base_costs, holding_costs, thursday_discount_rates,
+                         holding_cost_factors=1.0, demand_factors=1.0, ordering_days=None):
+    """
+    Evaluate the ordering model on the full cartesian grid of discount rates,
+    holding-cost factors and demand factors in one vectorized pass.
+
+    Each argument may be a scalar or a sequence of values. Every grid point is
+    solved by the NumPy fast path in a single batched call; points with negative
+    costs (discount above 100%) fall back to CBC one at a time.
+
+    Returns a tidy DataFrame with one row per grid point, ingredient and day:
+    thursday_discount, holding_cost_factor, demand_factor, status, total_cost,
+    ingredient, day, order_kg, inventory_kg.
+    """
+    discounts, holding_factors, demand_factors = (
+        axis.ravel() for axis in np.meshgrid(
+            np.atleast_1d(np.asarray(thursday_discount_rates, dtype=float)),
+            np.atleast_1d(np.asarray(holding_cost_factors, dtype=float)),
+            np.atleast_1d(np.asarray(demand_factors, dtype=float)),
+            indexing='ij'))
+    n_points, n_ing, n_days = len(discounts), len(INGREDIENTS), len(DAYS)
+
+    demand_arr = np.array([[base_demand[ing][day] for day in DAYS] for ing in INGREDIENTS], dtype=float)
+    standard_arr = np.array([base_costs[ing] for ing in INGREDIENTS], dtype=float)
+    holding_arr = np.array([holding_costs[ing] for ing in INGREDIENTS], dtype=float)
+    no_order_days = NO_ORDER_DAYS if ordering_days is None else [d for d in DAYS if d not in ordering_days]
+    order_mask = np.ones((n_ing, n_days), dtype=bool)
+    order_mask[:, list(no_order_days)] = False
+
+    # Batched parameters: (point, ingredient, day)
+    day_factor = np.ones((n_points, 1, n_days))
+    day_factor[:, 0, DISCOUNT_DAYS] = (1 - discounts)[:, None]
+    cost_batch = standard_arr[None, :, None] * day_factor
+    holding_batch = holding_arr[None, :] * holding_factors[:, None]
+    demand_batch = demand_arr[None, :, :] * demand_factors[:, None, None]
+
+    eligible = (cost_batch >= 0).all(axis=(1, 2)) & (holding_batch >= 0).all(axis=1)
+    solution = solve_uncapacitated(demand_batch, cost_batch, holding_batch, order_mask)
+    total_cost = solution["total_cost"]
+    orders, inventory = solution["orders"], solution["inventory"]
+    status = np.where(solution["feasible"], "Optimal", "Infeasible").astype(object)
+
+    # Points outside the fast path's exactness conditions are re-solved with CBC
+    for idx in np.flatnonzero(~eligible):
+        point_demand = {ing: {day: demand_batch[idx, i, day] for day in DAYS} for i, ing in enumerate(INGREDIENTS)}
+        point_holding = {ing: holding_batch[idx, i] for i, ing in enumerate(INGREDIENTS)}
+        result = enhanced_solve_ordering_plan(point_demand, base_costs, discounts[idx], point_holding,
+                                              ordering_days=ordering_days, use_fast_path=False)
+        status[idx] = result["status"]
+        if result["status"] == 'Optimal':
+            total_cost[idx] = result["total_cost"]
+            orders[idx] = result["order_plan_df"].values
+            inventory[idx] = result["inventory_levels_df"].values
+        else:
+            total_cost[idx] = np.nan
+            orders[idx] = np.nan
+            inventory[idx] = np.nan
+
+    cells = n_ing * n_days
+    return pd.DataFrame({
+        "thursday_discount": np.repeat(discounts, cells),
+        "holding_cost_factor": np.repeat(holding_factors, cells),
+        "demand_factor": np.repeat(demand_factors, cells),
+        "status": np.repeat(status, cells),
+        "total_cost": np.repeat(total_cost, cells),
+        "ingredient": np.tile(np.repeat(INGREDIENTS, n_days), n_points),
+        "day": np.tile(DAY_NAMES, n_points * n_ing),
+        "order_kg": np.where(orders > 1e-6, orders, 0.0).ravel(),
+        "inventory_kg": np.where(inventory > 1e-6, inventory, 0.0).ravel(),
+    })
+
+def run_sensitivity_analysis(base_demand, base_costs, parameter_name, values, current_value, 
+                           holding_costs, thursday_discount=None):
+    """Run a sensitivity analysis by varying one parameter over the given values (one batched solve)."""
+    if thursday_discount is None:
+        thursday_discount = current_value if parameter_name == 'thursday_discount' else DEFAULT_THURSDAY_DISCOUNT_RATE
+
+    grid_args = {'thursday_discount_rates': thursday_discount}
+    if parameter_name == 'thursday_discount':
+        grid_args['thursday_discount_rates'] = values
+    elif parameter_name == 'holding_cost_factor':
+        grid_args['holding_cost_factors'] = values
+    elif parameter_name == 'demand_factor':
+        grid_args['demand_factors'] = values
+    else:
+        raise ValueError(f"Unknown sensitivity parameter: {parameter_name}")
+
+    grid = run_sensitivity_grid(base_demand, base_costs, holding_costs, **grid_args)
+    per_point = grid.iloc[::len(INGREDIENTS) * len(DAYS)]  # first row of each grid point
+
+    results = []
+    for val, (_, row) in zip(values, per_point.iterrows()):
+        results.append((val, row["total_cost"] if row["status"] == 'Optimal' else None))
+    return results
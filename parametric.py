@@ -0,0 +1,137 @@
+"""Parametric LP: the exact piecewise-linear optimal cost over one sensitivity parameter.
+
+The optimal cost of the ordering LP is piecewise linear in each parameter of
+``run_sensitivity_analysis``. It is concave in the Thursday discount rate and in
+the holding-cost factor, because those move objective coefficients. It is
+convex in the demand factor, because that moves the right-hand side; without
+minimum order quantities it is even linear there.
+
+``parametric_cost_curve`` traces the curve with the Eisner-Severance method.
+Every solve returns the optimal cost and the slope of the optimal plan's own
+cost line. The lines at the two ends of an interval are intersected and the
+model is solved at the intersection. If the optimal cost reaches the lines
+there, the intersection is a breakpoint and each line is the curve on its side.
+Otherwise the interval is split at that point. The whole curve, with the
+optimal plan on every segment, takes about two solves per breakpoint instead
+of one per sampled value. The solves come from ``lp_sensitivity`` (closed form
+on the fast path, HiGHS otherwise), so minimum order quantities, which make
+the model a MIP, are not supported.
+"""
+
+import numpy as np
+
+from lp_sensitivity import SENSITIVITY_PARAMETERS, sensitivity_report
+from ordering_model import INGREDIENTS, DAYS, DEFAULT_THURSDAY_DISCOUNT_RATE
+
+
+def _solve_at(parameter_name, value, base_demand, base_costs, holding_costs, thursday_discount, options):
+    """Optimal cost, slope d(cost)/d(parameter) of the optimal plan, and the report at ``value``."""
+    demand, discount, holding = base_demand, thursday_discount, holding_costs
+    if parameter_name == "thursday_discount":
+        discount = value
+    elif parameter_name == "holding_cost_factor":
+        holding = {ing: cost * value for ing, cost in holding_costs.items()}
+    elif parameter_name == "demand_factor":
+        demand = {ing: {day: base_demand[ing][day] * value for day in DAYS} for ing in INGREDIENTS}
+    else:
+        raise ValueError(f"Unknown sensitivity parameter: {parameter_name} "
+                         f"(expected one of {', '.join(SENSITIVITY_PARAMETERS)})")
+    report = sensitivity_report(demand, base_costs, discount, holding, **options)
+    if report is None:
+        raise ValueError(f"The model has no optimal plan at {parameter_name}={value}")
+
+    inputs = report["inputs"]
+    if parameter_name == "thursday_discount":
+        days = inputs["discount_days"]
+        slope = -float((inputs["standard_costs"][:, None] * report["orders"][:, days]).sum())
+    elif parameter_name == "holding_cost_factor":
+        base_holding = np.array([holding_costs[ing] for ing in INGREDIENTS], dtype=float)
+        slope = float((base_holding * report["inventory"].sum(axis=1)).sum())
+    else:
+        base = np.array([[base_demand[ing][day] for day in DAYS] for ing in INGREDIENTS], dtype=float)
+        served = base > 0
+        slope = float((report["balance_duals"][served] * base[served]).sum())
+    return report["total_cost"], slope, report
+
+
+def parametric_cost_curve(base_demand, base_costs, holding_costs, parameter_name, low, high,
+                          thursday_discount=DEFAULT_THURSDAY_DISCOUNT_RATE, expiry_days=None, stockout_costs=None,
+                          ordering_days=None, tol=1e-7, max_solves=200):
+    """
+    Exact optimal cost of ``parameter_name`` (see SENSITIVITY_PARAMETERS) over [low, high].
+
+    The other inputs are as in ``run_sensitivity_analysis`` and ``enhanced_solve_ordering_plan``.
+    Returns a dict with "parameter", "breakpoints" (interior kinks, ascending),
+    "solves", and "segments": a list of dicts with "start", "end",
+    "cost_start", "cost_end", "slope" and the plan that is optimal on the whole
+    segment ("orders", "inventory", "stockouts" as (ingredient, day) arrays; for
+    the demand factor it is the plan at the segment's solve point and scales
+    with the factor).
+    """
+    if not low < high:
+        raise ValueError("low must be below high")
+    options = dict(expiry_days=expiry_days, stockout_costs=stockout_costs, ordering_days=ordering_days)
+    points = {}
+
+    def solve(value):
+        if len(points) >= max_solves:
+            raise RuntimeError(f"Parametric analysis needed more than {max_solves} solves")
+        points[value] = _solve_at(parameter_name, value, base_demand, base_costs, holding_costs,
+                                  thursday_discount, options)
+        return points[value]
+
+    solve(low)
+    solve(high)
+    scale = max(1.0, abs(points[low][0]), abs(points[high][0]))
+    pieces = []  # (start, end, value whose plan and line cover the piece)
+    intervals = [(low, high)]
+    while intervals:
+        left, right = intervals.pop()
+        cost_l, slope_l, _ = points[left]
+        cost_r, slope_r, _ = points[right]
+        if abs(slope_l - slope_r) * (right - left) <= tol * scale:
+            pieces.append((left, right, left))
+            continue
+        # Intersection of the two plans' cost lines
+        meet = (cost_r - cost_l + slope_l * left - slope_r * right) / (slope_l - slope_r)
+        margin = tol * (right - left)
+        if meet <= left + margin:  # the right line already passes through the left end
+            pieces.append((left, right, right))
+            continue
+        if meet >= right - margin:
+            pieces.append((left, right, left))
+            continue
+        line_cost = cost_l + slope_l * (meet - left)
+        cost_m = solve(meet)[0]
+        if abs(cost_m - line_cost) <= tol * scale:
+            pieces += [(left, meet, left), (meet, right, right)]
+        else:
+            intervals += [(meet, right), (left, meet)]
+
+    segments = []
+    for start, end, at in sorted(pieces):
+        cost_at, slope, report = points[at]
+        if segments and abs(segments[-1]["slope"] - slope) * (end - start) <= tol * scale:
+            segments[-1]["end"] = end
+            segments[-1]["cost_end"] = cost_at + slope * (end - at)
+            continue
+        segments.append({
+            "start": start, "end": end, "slope": slope,
+            "cost_start": cost_at + slope * (start - at), "cost_end": cost_at + slope * (end - at),
+            "orders": report["orders"], "inventory": report["inventory"], "stockouts": report["stockouts"],
+        })
+    return {
+        "parameter": parameter_name,
+        "breakpoints": [segment["start"] for segment in segments[1:]],
+        "segments": segments,
+        "solves": len(points),
+    }
+
+
+def curve_cost(curve, values):
+    """Optimal total cost at ``values`` (inside the curve's range) from a ``parametric_cost_curve`` result."""
+    segments = curve["segments"]
+    starts = np.array([segment["start"] for segment in segments])
+    index = np.clip(np.searchsorted(starts, values, side="right") - 1, 0, len(segments) - 1)
+    return np.array([segments[i]["cost_start"] + segments[i]["slope"] * (v - segments[i]["start"])
+                     for i, v in zip(np.atleast_1d(index), np.atleast_1d(values))])
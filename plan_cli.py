@@ -0,0 +1,167 @@
+"""Headless batch entry point for the ordering solvers (no Streamlit).
+
+Usage:
+    python plan_cli.py [DEMAND_FILE ...] [--costs COSTS_FILE] [--discount 0.15]
+                       [--history SALES_FILE [--store NAME ...] [--week N]]
+                       [--solver basic|enhanced] [--format csv|parquet|dataset] [--output-dir DIR] [--plot]
+
+Each demand file (.csv, .parquet or .xlsx) is a table indexed by ingredient
+(ingredient demand in kg) or by drink (drink sales, exploded through the recipe
+matrix), with one column per day (Mon..Sun). Without a demand file the predicted
+sales are used. ``--history`` instead plans one week (default: the last complete
+one) of every store in a daily sales history, loaded through ``data_io``
+(Parquet/Arrow memory-mapped, CSV and xlsx as fallbacks). The costs file is indexed by ingredient with ``standard_cost`` and
+``holding_cost`` columns and, for the enhanced solver, optional
+``min_order_quantity``, ``expiry_days`` and ``stockout_cost`` columns.
+
+Order plan and inventory tables are written in the same layout as the app's
+export (ingredients x days), or with ``--format dataset`` as one Parquet dataset
+under ``--output-dir`` partitioned by store and week (see ``data_io``). matplotlib is only imported when ``--plot`` is given.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+from data_io import (DEFAULT_STORE, last_complete_week, load_costs as load_cost_table, load_sales_history,
+                     plan_table, read_frame, sales_week, write_plan_dataset)
+from diagnostics import enable_json_log, log_diagnostics
+from ordering_model import (INGREDIENTS, DRINKS, DAYS, DAY_NAMES, DEFAULT_STANDARD_COSTS,
+                            DEFAULT_THURSDAY_DISCOUNT_RATE, DEFAULT_HOLDING_COSTS, PREDICTED_SALES, SOLVER_BACKENDS,
+                            calculate_demand_from_sales, solve_ordering_plan, enhanced_solve_ordering_plan)
+
+def _day_columns(table, path):
+    if all(name in table.columns for name in DAY_NAMES):
+        return table[DAY_NAMES]
+    if table.shape[1] == len(DAYS):
+        return table
+    raise ValueError(f"{path}: expected one column per day ({', '.join(DAY_NAMES)})")
+
+
+def load_demand(path):
+    """Ingredient demand dict from an ingredient-demand or drink-sales table."""
+    table = read_frame(path)
+    values = _day_columns(table, path).astype(float)
+    if set(values.index) >= set(INGREDIENTS):
+        return {ing: dict(zip(DAYS, values.loc[ing].to_numpy())) for ing in INGREDIENTS}
+    if set(values.index) >= set(DRINKS):
+        return calculate_demand_from_sales({drink: values.loc[drink].to_numpy() for drink in DRINKS})
+    raise ValueError(f"{path}: rows must be the ingredients ({', '.join(INGREDIENTS)}) "
+                     f"or the drinks ({', '.join(DRINKS)})")
+
+
+def load_costs(path):
+    """Solver keyword arguments (costs and enhanced options) from a costs table, or the app defaults."""
+    if path is None:
+        return {"standard_costs": dict(DEFAULT_STANDARD_COSTS), "holding_costs": dict(DEFAULT_HOLDING_COSTS)}
+    return load_cost_table(path)
+
+
+def history_instances(path, stores=None, week=None):
+    """``(name, store, week, demand)`` per store of a sales history, for ``week`` or each store's last complete week."""
+    history = load_sales_history(path, stores=stores)
+    instances = []
+    for store in dict.fromkeys(history["store"].to_pylist()):
+        store_week = last_complete_week(history, store) if week is None else week
+        if store_week is None:
+            raise ValueError(f"{path}: store {store} has no complete week of sales")
+        demand = calculate_demand_from_sales(sales_week(history, store_week, store))
+        instances.append((f"{store}_week{store_week}", store, store_week, demand))
+    return instances
+
+
+def write_table(df, path, fmt):
+    if fmt == "parquet":
+        df.to_parquet(path)
+    else:
+        df.to_csv(path, encoding="utf-8-sig")
+
+
+def plot_plan(results, path):
+    """Bar charts of the order plan and inventory levels, saved to ``path``."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(12, 5))
+    results["order_plan_df"].T.plot(kind="bar", ax=ax1)
+    ax1.set_title("Order Plan")
+    ax1.set_ylabel("Order Quantity (kg)")
+    results["inventory_levels_df"].T.plot(kind="bar", ax=ax2)
+    ax2.set_title("Inventory Levels")
+    ax2.set_ylabel("Inventory (kg)")
+    plt.tight_layout()
+    fig.savefig(path)
+    plt.close(fig)
+
+
+def run(demand, costs, discount, solver="basic", max_solver_time=20, backend="cbc"):
+    """Solve one demand instance with the chosen solver; returns the results dict."""
+    if solver == "basic":
+        return solve_ordering_plan(demand, costs["standard_costs"], discount, costs["holding_costs"], backend=backend)
+    options = {k: v for k, v in costs.items() if k not in ("standard_costs", "holding_costs")}
+    return enhanced_solve_ordering_plan(demand, costs["standard_costs"], discount, costs["holding_costs"],
+                                        max_solver_time=max_solver_time, backend=backend, **options)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compute ingredient ordering plans without the UI.")
+    parser.add_argument("demand", nargs="*", help="demand or drink-sales files (default: predicted sales)")
+    parser.add_argument("--costs", help="costs file indexed by ingredient (default: the app defaults)")
+    parser.add_argument("--discount", type=float, default=DEFAULT_THURSDAY_DISCOUNT_RATE,
+                        help="Thursday discount rate (default: %(default)s)")
+    parser.add_argument("--solver", choices=["basic", "enhanced"], default="basic")
+    parser.add_argument("--backend", choices=SOLVER_BACKENDS, default="cbc",
+                        help="LP/MILP backend when the fast path does not apply")
+    parser.add_argument("--max-solver-time", type=float, default=20)
+    parser.add_argument("--history", help="daily sales history to plan from instead of demand files")
+    parser.add_argument("--store", action="append", help="history store to plan (repeatable; default: all)")
+    parser.add_argument("--week", type=int, help="history week to plan (default: each store's last complete week)")
+    parser.add_argument("--format", choices=["csv", "parquet", "dataset"], default="csv")
+    parser.add_argument("--output-dir", default=".")
+    parser.add_argument("--plot", action="store_true", help="also save a PNG chart per plan")
+    parser.add_argument("--log", help="append per-solve diagnostics (timings, model size) as JSON lines")
+    args = parser.parse_args(argv)
+    if args.log:
+        enable_json_log(args.log)
+
+    costs = load_costs(args.costs)
+    week = args.week or 0
+    if args.history:
+        instances = history_instances(args.history, args.store, args.week)
+    elif args.demand:
+        names = [os.path.splitext(os.path.basename(p))[0] for p in args.demand]
+        instances = [(name, name, week, load_demand(p)) for name, p in zip(names, args.demand)]
+    else:
+        instances = [("predicted", DEFAULT_STORE, week, calculate_demand_from_sales(PREDICTED_SALES))]
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    exit_code = 0
+    for name, store, week, demand in instances:
+        results = run(demand, costs, args.discount, args.solver, args.max_solver_time, args.backend)
+        log_diagnostics(results, source="cli", instance=name)
+        summary = {"instance": name, "status": results["status"], "total_cost": results.get("total_cost")}
+        if "order_plan_df" in results:
+            prefix = os.path.join(args.output_dir, name)
+            if args.format == "dataset":
+                write_plan_dataset(plan_table(results, store, week), args.output_dir)
+            else:
+                write_table(results["order_plan_df"], f"{prefix}_order_plan.{args.format}", args.format)
+                write_table(results["inventory_levels_df"], f"{prefix}_inventory.{args.format}", args.format)
+                if "stockout_levels_df" in results:
+                    write_table(results["stockout_levels_df"], f"{prefix}_stockouts.{args.format}", args.format)
+                if "waste_levels_df" in results:
+                    write_table(results["waste_levels_df"], f"{prefix}_waste.{args.format}", args.format)
+            if args.plot:
+                plot_plan(results, f"{prefix}_plan.png")
+        else:
+            exit_code = 1
+        print(json.dumps(summary, default=lambda v: float(v) if isinstance(v, np.floating) else str(v)))
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
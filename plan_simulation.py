@@ -0,0 +1,128 @@
+"""Monte Carlo evaluation of a fixed order plan against sampled demand paths.
+
+A plan is replayed against all paths at once: the state is a ``(path, ingredient)``
+inventory array (or a ``(path, ingredient, order day)`` cohort array for
+perishable items), and the only Python loop is over the days. Unmet demand is
+lost (no backorders), perishable stock is issued first-in, first-out and is
+discarded when it expires, and holding cost is charged on end-of-day inventory
+as in the solvers. 100,000 paths over a week take well under a second.
+
+Demand paths are ``(n_paths, ingredients, days)`` arrays, e.g. from
+``stochastic_model.sample_demand_scenarios``.
+"""
+
+import numpy as np
+import pandas as pd
+
+from ordering_model import INGREDIENTS, DAYS, DISCOUNT_DAYS, shelf_life_array
+
+PATH_METRICS = ("total_cost", "holding_cost", "stockout_cost", "stockout_kg", "waste_kg", "end_inventory_kg",
+                "fill_rate")
+
+
+def simulate_plan(order_plan, demand_paths, unit_costs, holding_costs, stockout_costs=None, shelf_life=None,
+                  initial_inventory=None):
+    """
+    Replay ``order_plan`` (ingredients, days) against ``demand_paths`` (paths, ingredients, days).
+
+    ``unit_costs`` is broadcastable to the plan, ``holding_costs``,
+    ``stockout_costs`` (default 0: lost sales are counted but not charged),
+    ``shelf_life`` (0 = does not expire) and ``initial_inventory`` are per
+    ingredient. Returns per-path arrays: ``total_cost``, ``holding_cost``,
+    ``stockout_cost`` and ``fill_rate`` (paths,), and ``stockout_kg``,
+    ``waste_kg`` and ``end_inventory_kg`` (paths, ingredients), plus the
+    path-independent ``purchase_cost``.
+    """
+    orders = np.asarray(order_plan, dtype=float)
+    demand = np.asarray(demand_paths, dtype=float)
+    n_paths, n_items, n_days = demand.shape
+    holding = np.asarray(holding_costs, dtype=float)
+    penalty = np.zeros(n_items) if stockout_costs is None else np.asarray(stockout_costs, dtype=float)
+    life = np.zeros(n_items, dtype=int) if shelf_life is None else np.asarray(shelf_life, dtype=int)
+    life = np.where((life > 0) & (life < n_days), life, 0)
+    start = np.zeros(n_items) if initial_inventory is None else np.asarray(initial_inventory, dtype=float)
+
+    lost = np.zeros((n_paths, n_items))
+    wasted = np.zeros((n_paths, n_items))
+    held = np.zeros((n_paths, n_items))  # sum of end-of-day inventory over the days
+    end_inventory = np.zeros((n_paths, n_items))
+
+    # Non-perishable items: one aggregate stock level per path
+    keep = np.flatnonzero(life == 0)
+    if len(keep):
+        stock = np.broadcast_to(start[keep], (n_paths, len(keep))).copy()
+        for day in range(n_days):
+            stock += orders[keep, day]
+            short = np.maximum(demand[:, keep, day] - stock, 0.0)
+            stock = np.maximum(stock - demand[:, keep, day], 0.0)
+            lost[:, keep] += short
+            held[:, keep] += stock
+        end_inventory[:, keep] = stock
+
+    # Perishable items: stock by order day (column 0 is the initial stock, which does not expire)
+    perishable = np.flatnonzero(life)
+    if len(perishable):
+        cohorts = np.zeros((n_paths, len(perishable), n_days + 1))
+        cohorts[:, :, 0] = start[perishable]
+        for day in range(n_days):
+            cohorts[:, :, day + 1] = orders[perishable, day]
+            # FIFO: the oldest cohorts are used first
+            available = np.cumsum(cohorts[:, :, :day + 2], axis=2)
+            need = demand[:, perishable, day]
+            remaining = np.maximum(available - need[..., None], 0.0)
+            cohorts[:, :, :day + 2] = np.diff(remaining, axis=2, prepend=0.0)
+            lost[:, perishable] += np.maximum(need - available[:, :, -1], 0.0)
+            # The orders of day - life + 1 expire at the end of this day
+            expiring = day - life[perishable] + 1
+            expired = np.flatnonzero(expiring >= 0)
+            if len(expired):
+                col = expiring[expired] + 1
+                wasted[:, perishable[expired]] += cohorts[:, expired, col]
+                cohorts[:, expired, col] = 0.0
+            held[:, perishable] += cohorts.sum(axis=2)
+        end_inventory[:, perishable] = cohorts.sum(axis=2)
+
+    purchase_cost = float(np.sum(np.broadcast_to(np.asarray(unit_costs, dtype=float), orders.shape) * orders))
+    holding_cost = held @ holding
+    stockout_cost = lost @ penalty
+    total_demand = demand.sum(axis=(1, 2))
+    fill_rate = 1.0 - lost.sum(axis=1) / np.where(total_demand > 0, total_demand, 1.0)
+    return {
+        "purchase_cost": purchase_cost,
+        "total_cost": purchase_cost + holding_cost + stockout_cost,
+        "holding_cost": holding_cost,
+        "stockout_cost": stockout_cost,
+        "stockout_kg": lost,
+        "waste_kg": wasted,
+        "end_inventory_kg": end_inventory,
+        "fill_rate": fill_rate,
+    }
+
+
+def simulate_results(results, demand_paths, standard_costs, thursday_discount_rate, holding_costs,
+                     stockout_costs=None, expiry_days=None, ingredients=INGREDIENTS):
+    """``simulate_plan`` for the order plan of a solver results dict, with the solvers' cost inputs."""
+    if "order_plan" in results:
+        order_plan = np.asarray(results["order_plan"], dtype=float)
+    else:
+        order_plan = results["order_plan_df"].loc[list(ingredients)].to_numpy(dtype=float)
+    day_factor = np.ones(len(DAYS))
+    day_factor[DISCOUNT_DAYS] = 1 - thursday_discount_rate
+    unit_costs = np.array([standard_costs[ing] for ing in ingredients])[:, None] * day_factor
+    return simulate_plan(
+        order_plan, demand_paths, unit_costs,
+        [holding_costs[ing] for ing in ingredients],
+        None if not stockout_costs else [stockout_costs.get(ing) or 0.0 for ing in ingredients],
+        shelf_life_array(expiry_days, ingredients))
+
+
+def summarize_simulation(simulation, percentiles=(5, 50, 95)):
+    """Mean, standard deviation and percentiles across paths of each per-path metric (totals over ingredients)."""
+    rows = {}
+    for metric in PATH_METRICS:
+        values = simulation[metric]
+        if values.ndim == 2:
+            values = values.sum(axis=1)
+        rows[metric] = [values.mean(), values.std(), *np.percentile(values, percentiles)]
+    columns = ["mean", "std"] + [f"p{p:g}" for p in percentiles]
+    return pd.DataFrame.from_dict(rows, orient="index", columns=columns)
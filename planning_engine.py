@@ -0,0 +1,152 @@
+"""Multi-store, multi-week ordering plans solved in rolling-horizon windows.
+
+Stores are plain dicts. Their data is stacked into ``(store, ingredient, day)``
+NumPy arrays and every window is solved for all stores at once by the fast
+path in ``fast_solver``, so no per-variable PuLP model is ever built.
+
+A store dict holds:
+
+- ``name``: store identifier
+- ``demand``: ``{ingredient: daily kg array}`` or an ``(ingredient, day)`` array
+  covering the whole horizon
+- ``standard_costs`` / ``holding_costs``: ``{ingredient: cost}``
+- ``discount_rate``: discount applied on discount days (default 0)
+- ``discount_days`` / ``ordering_days``: horizon day indices, or build them from a
+  weekly pattern with ``store_calendar``
+- ``stockout_costs`` (optional): ``{ingredient: penalty}`` to allow lost sales
+- ``initial_inventory`` (optional): ``{ingredient: kg}`` on hand before day 0
+"""
+
+import numpy as np
+import pandas as pd
+
+from fast_solver import solve_uncapacitated
+from ordering_model import INGREDIENTS, DISCOUNT_DAYS, NO_ORDER_DAYS, DAY_NAMES
+
+
+def store_calendar(horizon, start_weekday=0, discount_weekdays=DISCOUNT_DAYS,
+                   no_order_weekdays=NO_ORDER_DAYS, closed_days=()):
+    """
+    Expand weekly patterns into horizon day indices.
+
+    Weekdays are 0=Mon .. 6=Sun and ``start_weekday`` is the weekday of day 0.
+    ``closed_days`` lists horizon days (holidays) on which no order can be placed.
+    Returns ``(discount_days, ordering_days)`` as lists of horizon day indices.
+    """
+    weekday = (np.arange(horizon) + start_weekday) % 7
+    discount_days = np.flatnonzero(np.isin(weekday, discount_weekdays))
+    can_order = ~np.isin(weekday, no_order_weekdays)
+    can_order[list(closed_days)] = False
+    return discount_days.tolist(), np.flatnonzero(can_order).tolist()
+
+
+def _stack_stores(stores, horizon, ingredients):
+    """Stack store dicts into (store, ingredient, day) arrays."""
+    n_stores, n_ing = len(stores), len(ingredients)
+    demand = np.zeros((n_stores, n_ing, horizon))
+    unit_costs = np.zeros((n_stores, n_ing, horizon))
+    holding = np.zeros((n_stores, n_ing))
+    order_mask = np.zeros((n_stores, 1, horizon), dtype=bool)
+    initial = np.zeros((n_stores, n_ing))
+    stockout = np.full((n_stores, n_ing), np.inf)
+    any_stockout = False
+
+    for s, store in enumerate(stores):
+        store_demand = store["demand"]
+        if isinstance(store_demand, dict):
+            store_demand = [store_demand[ing] for ing in ingredients]
+        store_demand = np.asarray(store_demand, dtype=float)
+        if store_demand.shape[1] < horizon:
+            raise ValueError(f"Store '{store.get('name', s)}' has demand for "
+                             f"{store_demand.shape[1]} days, horizon is {horizon}")
+        demand[s] = store_demand[:, :horizon]
+
+        day_factor = np.ones(horizon)
+        discount_days = [d for d in store.get("discount_days", []) if d < horizon]
+        day_factor[discount_days] = 1 - store.get("discount_rate", 0.0)
+        unit_costs[s] = np.array([store["standard_costs"][ing] for ing in ingredients])[:, None] * day_factor
+        holding[s] = [store["holding_costs"][ing] for ing in ingredients]
+
+        ordering_days = store.get("ordering_days")
+        if ordering_days is None:
+            _, ordering_days = store_calendar(horizon)
+        order_mask[s, 0, [d for d in ordering_days if d < horizon]] = True
+
+        if store.get("initial_inventory"):
+            initial[s] = [store["initial_inventory"].get(ing, 0.0) for ing in ingredients]
+        if store.get("stockout_costs"):
+            any_stockout = True
+            stockout[s] = [store["stockout_costs"].get(ing, 0.0) for ing in ingredients]
+
+    return demand, unit_costs, holding, order_mask, initial, (stockout if any_stockout else None)
+
+
+def plan_stores(stores, horizon, window=7, step=None, ingredients=INGREDIENTS):
+    """
+    Plan every store over ``horizon`` days with a rolling horizon.
+
+    Each window of ``window`` days is solved exactly for all stores together,
+    starting from the inventory carried over from the previous window; the first
+    ``step`` days (default: the whole window) are committed before rolling on.
+    Use ``window=horizon`` to solve the full horizon in one pass.
+
+    Returns a dict of arrays shaped ``(store, ingredient, day)`` (``orders``,
+    ``inventory``, ``stockouts``) plus per-store ``total_cost`` and ``feasible``.
+    """
+    step = step or window
+    if not 0 < step <= window:
+        raise ValueError("step must be between 1 and window")
+    demand, unit_costs, holding, order_mask, inventory_on_hand, stockout = \
+        _stack_stores(stores, horizon, ingredients)
+
+    orders = np.zeros_like(demand)
+    inventory = np.zeros_like(demand)
+    stockouts = np.zeros_like(demand)
+    feasible = np.ones(len(stores), dtype=bool)
+
+    for start in range(0, horizon, step):
+        end = min(start + window, horizon)
+        commit = min(start + step, horizon) - start
+        solution = solve_uncapacitated(
+            demand[..., start:end], unit_costs[..., start:end], holding,
+            order_mask[..., start:end], stockout_costs=stockout,
+            initial_inventory=inventory_on_hand)
+        feasible &= solution["feasible"]
+        window_slice = slice(start, start + commit)
+        orders[..., window_slice] = solution["orders"][..., :commit]
+        inventory[..., window_slice] = solution["inventory"][..., :commit]
+        stockouts[..., window_slice] = solution["stockouts"][..., :commit]
+        inventory_on_hand = np.nan_to_num(solution["inventory"][..., commit - 1])
+
+    total_cost = ((unit_costs * orders).sum(axis=(1, 2))
+                  + (holding * inventory.sum(axis=2)).sum(axis=1))
+    if stockout is not None:
+        # Stores without stockout costs carry an infinite penalty (and zero stockouts)
+        total_cost += (np.where(np.isfinite(stockout), stockout, 0.0) * stockouts.sum(axis=2)).sum(axis=1)
+    total_cost = np.where(feasible, total_cost, np.nan)
+
+    return {
+        "stores": [store.get("name", s) for s, store in enumerate(stores)],
+        "ingredients": list(ingredients),
+        "feasible": feasible,
+        "total_cost": total_cost,
+        "orders": orders,
+        "inventory": inventory,
+        "stockouts": stockouts,
+    }
+
+
+def plan_to_frame(plan, start_weekday=0):
+    """Flatten a ``plan_stores`` result into a long DataFrame (store, day, ingredient)."""
+    n_stores, n_ing, horizon = plan["orders"].shape
+    days = np.arange(horizon)
+    return pd.DataFrame({
+        "store": np.repeat(plan["stores"], n_ing * horizon),
+        "ingredient": np.tile(np.repeat(plan["ingredients"], horizon), n_stores),
+        "day": np.tile(days, n_stores * n_ing),
+        "week": np.tile(days // 7, n_stores * n_ing),
+        "weekday": np.tile(np.array(DAY_NAMES)[(days + start_weekday) % 7], n_stores * n_ing),
+        "order_kg": np.where(plan["orders"] > 1e-6, plan["orders"], 0.0).ravel(),
+        "inventory_kg": np.where(plan["inventory"] > 1e-6, plan["inventory"], 0.0).ravel(),
+        "stockout_kg": np.where(plan["stockouts"] > 1e-6, plan["stockouts"], 0.0).ravel(),
+    })
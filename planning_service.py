@@ -0,0 +1,481 @@
+"""Local HTTP/JSON planning service (standard library ``http.server``, no Streamlit).
+
+Usage:
+    python planning_service.py [--host 127.0.0.1] [--port 8765] [--workers N]
+                               [--batch-window-ms 2] [--request-timeout 120] [--log FILE]
+
+Endpoints (POST a JSON object, get a JSON object back; ``GET /health`` reports
+the pool and batching counters):
+
+- ``/solve``: basic plan (``solve_ordering_plan``, optional ``backend``)
+- ``/enhanced_solve``: plan with ``expiry_days``, ``min_order_quantities``,
+  ``stockout_costs``, ``ordering_days``, ``max_solver_time``, ``backend`` and
+  ``moq_mode`` (``enhanced_solve_ordering_plan``)
+- ``/sensitivity``: total cost over ``values`` of ``parameter_name``
+  (thursday_discount, holding_cost_factor or demand_factor), optionally with the
+  enhanced options
+- ``/demand_from_sales``: ingredient demand for ``sales`` (one week or a list of weeks)
+
+The solve endpoints take ``demand`` (``{ingredient: [kg per day]}``) or ``sales``
+(``{drink: [sales per day]}``, exploded through the recipe matrix); without
+either the predicted sales are used. ``standard_costs`` and ``holding_costs``
+override the app defaults per ingredient, and ``thursday_discount_rate`` defaults
+to 0.15. Days may be given as lists (Mon..Sun) or as objects keyed by day name
+or index. Plans come back in the solvers' "arrays" layout: ``order_plan``,
+``inventory_levels`` (and ``stockout_levels`` / ``waste_levels``) as
+ingredient x day lists, with ``ingredients``, ``days`` and ``diagnostics``.
+
+Requests the NumPy fast path solves exactly (no minimum order quantities,
+non-negative costs) are micro-batched: whatever arrives within the batch window
+is stacked into one ``solve_uncapacitated`` call. Everything else (MOQ models,
+CBC/HiGHS fallbacks, enhanced sensitivity sweeps) runs in a ``JobExecutor``
+process pool that is started and warmed up before the first request, with the
+solver modules preloaded, and goes through the solve cache.
+
+Bad input gets a 400 with an ``error`` message, a solve that does not finish
+within the request timeout a 504. ``make_server(port=0)`` binds a free port,
+so the service can be exercised entirely against localhost.
+"""
+
+import argparse
+import json
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing import get_all_start_methods, get_context
+
+import numpy as np
+
+from diagnostics import SolveDiagnostics, enable_json_log, log_diagnostics
+from fast_solver import is_fast_path_eligible, solve_uncapacitated
+from job_executor import JobExecutor
+from ordering_model import (INGREDIENTS, DRINKS, DAYS, DAY_NAMES, DISCOUNT_DAYS, NO_ORDER_DAYS, MOQ_MODES,
+                            DEFAULT_STANDARD_COSTS, DEFAULT_THURSDAY_DISCOUNT_RATE, DEFAULT_HOLDING_COSTS,
+                            PREDICTED_SALES, calculate_demand_from_sales, enhanced_solve_ordering_plan,
+                            explode_demand, package_results, run_sensitivity_analysis, shelf_life_array,
+                            solve_ordering_plan, stockout_cost_array, SOLVER_BACKENDS)
+from scenario_runner import sensitivity_scenarios
+
+logger = logging.getLogger("coffee.service")
+
+BASE_FIELDS = ("demand", "sales", "standard_costs", "holding_costs", "thursday_discount_rate")
+ENHANCED_FIELDS = ("expiry_days", "min_order_quantities", "stockout_costs", "ordering_days",
+                   "max_solver_time", "backend", "moq_mode")
+SENSITIVITY_FIELDS = ("parameter_name", "values")
+
+# Modules the pool's fork server imports once, so every worker starts warm
+PRELOAD_MODULES = ["ordering_model", "sparse_model", "scenario_runner"]
+
+
+class RequestError(ValueError):
+    """Invalid request body (answered with HTTP 400)."""
+
+
+# --- Request parsing ---
+def _day_values(values, what):
+    """Seven floats from a Mon..Sun list or an object keyed by day name or index."""
+    if isinstance(values, dict):
+        by_day = {}
+        for key, value in values.items():
+            day = DAY_NAMES.index(key) if key in DAY_NAMES else int(key)
+            by_day[day] = value
+        values = [by_day.get(day, 0.0) for day in DAYS]
+    if not isinstance(values, list) or len(values) != len(DAYS):
+        raise RequestError(f"{what}: expected {len(DAYS)} daily values ({', '.join(DAY_NAMES)})")
+    return [float(v) for v in values]
+
+
+def _per_item(values, names, what, cast=float):
+    if not isinstance(values, dict):
+        raise RequestError(f"{what}: expected an object keyed by name")
+    unknown = [name for name in values if name not in names]
+    if unknown:
+        raise RequestError(f"{what}: unknown names {', '.join(map(str, unknown))}")
+    return {name: cast(value) for name, value in values.items()}
+
+
+def _sales_week(sales):
+    if not isinstance(sales, dict) or set(sales) != set(DRINKS):
+        raise RequestError(f"sales: expected daily sales for {', '.join(DRINKS)}")
+    return {drink: np.array(_day_values(sales[drink], f"sales[{drink}]")) for drink in DRINKS}
+
+
+def _choice(body, field, choices):
+    if body[field] not in choices:
+        raise RequestError(f"{field}: expected one of {', '.join(choices)}")
+    return body[field]
+
+
+def _check_fields(body, allowed):
+    if not isinstance(body, dict):
+        raise RequestError("Request body must be a JSON object")
+    unknown = sorted(set(body) - set(allowed))
+    if unknown:
+        raise RequestError(f"Unknown fields: {', '.join(unknown)}")
+
+
+def parse_solver_inputs(body, enhanced=False):
+    """Solver keyword arguments from a request body (costs default to the app defaults)."""
+    if "demand" in body:
+        demand = body["demand"]
+        if not isinstance(demand, dict) or set(demand) != set(INGREDIENTS):
+            raise RequestError(f"demand: expected daily kg for {', '.join(INGREDIENTS)}")
+        demand = {ing: dict(zip(DAYS, _day_values(demand[ing], f"demand[{ing}]"))) for ing in INGREDIENTS}
+    elif "sales" in body:
+        demand = calculate_demand_from_sales(_sales_week(body["sales"]))
+    else:
+        demand = calculate_demand_from_sales(PREDICTED_SALES)
+    kwargs = {
+        "demand": demand,
+        "standard_costs": {**DEFAULT_STANDARD_COSTS,
+                           **_per_item(body.get("standard_costs", {}), INGREDIENTS, "standard_costs")},
+        "thursday_discount_rate": float(body.get("thursday_discount_rate", DEFAULT_THURSDAY_DISCOUNT_RATE)),
+        "holding_costs": {**DEFAULT_HOLDING_COSTS,
+                          **_per_item(body.get("holding_costs", {}), INGREDIENTS, "holding_costs")},
+    }
+    if enhanced:
+        for field, cast in (("expiry_days", int), ("min_order_quantities", float), ("stockout_costs", float)):
+            if body.get(field):
+                kwargs[field] = _per_item(body[field], INGREDIENTS, field, cast)
+        if body.get("ordering_days") is not None:
+            kwargs["ordering_days"] = [DAY_NAMES.index(d) if d in DAY_NAMES else int(d)
+                                       for d in body["ordering_days"]]
+        if "max_solver_time" in body:
+            kwargs["max_solver_time"] = float(body["max_solver_time"])
+        for field, choices in (("backend", SOLVER_BACKENDS), ("moq_mode", MOQ_MODES)):
+            if field in body:
+                kwargs[field] = _choice(body, field, choices)
+    return kwargs
+
+
+# --- Micro-batched fast path ---
+def fast_path_problem(kwargs):
+    """
+    The arrays of one solve for ``solve_problem_batch``, or None when the fast path
+    does not cover it (minimum order quantities, negative costs).
+    """
+    if any(q > 0 for q in (kwargs.get("min_order_quantities") or {}).values()):
+        return None
+    day_factor = np.ones(len(DAYS))
+    day_factor[DISCOUNT_DAYS] = 1 - kwargs["thursday_discount_rate"]
+    unit_costs = np.array([kwargs["standard_costs"][ing] for ing in INGREDIENTS])[:, None] * day_factor
+    holding = np.array([kwargs["holding_costs"][ing] for ing in INGREDIENTS], dtype=float)
+    stockout = stockout_cost_array(kwargs.get("stockout_costs"))
+    if not is_fast_path_eligible(unit_costs, holding, stockout):
+        return None
+    ordering_days = kwargs.get("ordering_days")
+    no_order_days = NO_ORDER_DAYS if ordering_days is None else [d for d in DAYS if d not in ordering_days]
+    order_mask = np.ones((len(INGREDIENTS), len(DAYS)), dtype=bool)
+    order_mask[:, list(no_order_days)] = False
+    shelf_life = shelf_life_array(kwargs.get("expiry_days"))
+    return {
+        "demand": np.array([[kwargs["demand"][ing][day] for day in DAYS] for ing in INGREDIENTS], dtype=float),
+        "unit_costs": unit_costs, "holding_costs": holding, "order_mask": order_mask,
+        "stockout_costs": stockout, "shelf_life": shelf_life if shelf_life.any() else None,
+    }
+
+
+def solve_problem_batch(problems):
+    """
+    Solve ``fast_path_problem`` inputs in one batched ``solve_uncapacitated`` call.
+
+    Returns one results dict per problem, in the solvers' "arrays" layout, as
+    ``enhanced_solve_ordering_plan`` would for the same inputs. The diagnostics
+    are those of the whole batch, with its size under ``solver.batch_size``.
+    """
+    diagnostics = SolveDiagnostics("numpy")
+    with diagnostics.phase("build"):
+        stack = {name: np.stack([p[name] for p in problems])
+                 for name in ("demand", "unit_costs", "holding_costs", "order_mask")}
+        stockout = shelf_life = None
+        if any(p["stockout_costs"] is not None for p in problems):
+            # An infinite penalty means demand must be met
+            stockout = np.stack([np.full(len(INGREDIENTS), np.inf) if p["stockout_costs"] is None
+                                 else p["stockout_costs"] for p in problems])
+        if any(p["shelf_life"] is not None for p in problems):
+            shelf_life = np.stack([np.zeros(len(INGREDIENTS), dtype=int) if p["shelf_life"] is None
+                                   else p["shelf_life"] for p in problems])
+    with diagnostics.phase("solve"):
+        solution = solve_uncapacitated(stack["demand"], stack["unit_costs"], stack["holding_costs"],
+                                       stack["order_mask"], stockout_costs=stockout, shelf_life=shelf_life)
+    diagnostics.solver.update(batch_size=len(problems))
+
+    results = []
+    with diagnostics.phase("extract"):
+        for k, problem in enumerate(problems):
+            if not solution["feasible"][k]:
+                results.append({"status": "Infeasible"})
+                continue
+            blocks = {"order_plan": solution["orders"][k], "inventory_levels": solution["inventory"][k]}
+            if problem["stockout_costs"] is not None:
+                blocks["stockout_levels"] = solution["stockouts"][k]
+            if problem["shelf_life"] is not None:
+                blocks["waste_levels"] = np.zeros_like(solution["orders"][k])  # nothing is bought to expire
+            results.append(package_results({"status": "Optimal", "total_cost": float(solution["total_cost"][k])},
+                                           blocks, "arrays"))
+    batch_diagnostics = diagnostics.as_dict()
+    for result in results:
+        result["diagnostics"] = batch_diagnostics
+    return results
+
+
+class RequestBatcher:
+    """
+    Collects fast-path problems from concurrent requests and solves them together.
+
+    A background thread takes the first queued problem, waits up to ``window``
+    seconds (or until ``max_batch`` problems) for more, and solves them all in
+    one ``solve_problem_batch`` call. ``submit`` returns a Future per problem.
+    """
+
+    def __init__(self, window=0.002, max_batch=256):
+        self.window = window
+        self.max_batch = max_batch
+        self.batches = 0
+        self.requests = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="fast-path-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, problem):
+        future = Future()
+        self._queue.put((problem, future))
+        return future
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.perf_counter() + self.window
+            stop = False
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.perf_counter(), 0.0))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            try:
+                results = solve_problem_batch([problem for problem, _ in batch])
+            except Exception as exc:
+                for _, future in batch:
+                    future.set_exception(exc)
+            else:
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
+            self.batches += 1
+            self.requests += len(batch)
+            if stop:
+                return
+
+
+# --- Service ---
+class PlanningService:
+    """
+    Endpoint implementations on top of a warm ``JobExecutor`` and a ``RequestBatcher``.
+
+    Each endpoint method takes the parsed JSON body and returns ``(http_status, payload)``.
+    """
+
+    def __init__(self, executor=None, batcher=None, request_timeout=120.0):
+        self.executor = executor or JobExecutor()
+        self.batcher = batcher or RequestBatcher()
+        self.request_timeout = request_timeout
+
+    def close(self):
+        self.batcher.close()
+        self.executor.shutdown()
+
+    def _in_pool(self, solver, kwargs, label):
+        job_id = self.executor.submit(solver, label=label, output="arrays", **kwargs)
+        status = self.executor.wait(job_id, self.request_timeout)
+        if status["state"] != "done":
+            self.executor.cancel(job_id)
+            raise TimeoutError(f"{label} did not finish within {self.request_timeout:g} seconds")
+        return status["results"][0][1]
+
+    def _plan(self, solver, kwargs, endpoint):
+        problem = fast_path_problem(kwargs)
+        if problem is not None:
+            results = self.batcher.submit(problem).result(self.request_timeout)
+        else:
+            results = self._in_pool(solver, kwargs, endpoint)
+        log_diagnostics(results, source="service", endpoint=endpoint)
+        return (500 if results.get("status") == "Error" else 200), results
+
+    def solve(self, body):
+        _check_fields(body, BASE_FIELDS + ("backend",))
+        kwargs = parse_solver_inputs(body)
+        if "backend" in body:
+            kwargs["backend"] = _choice(body, "backend", SOLVER_BACKENDS)
+        return self._plan(solve_ordering_plan, kwargs, "solve")
+
+    def enhanced_solve(self, body):
+        _check_fields(body, BASE_FIELDS + ENHANCED_FIELDS)
+        return self._plan(enhanced_solve_ordering_plan, parse_solver_inputs(body, enhanced=True), "enhanced_solve")
+
+    def sensitivity(self, body):
+        """
+        Total cost per value of the parameter. Without enhanced options the whole
+        sweep is one batched fast-path solve in this process; with them every
+        value is a separate solve in the pool.
+        """
+        _check_fields(body, BASE_FIELDS + ENHANCED_FIELDS + SENSITIVITY_FIELDS)
+        for field in SENSITIVITY_FIELDS:
+            if field not in body:
+                raise RequestError(f"Missing field: {field}")
+        parameter_name = body["parameter_name"]
+        values = [float(v) for v in body["values"]]
+        kwargs = parse_solver_inputs(body, enhanced=True)
+        base = [kwargs.pop(name) for name in ("demand", "standard_costs", "holding_costs",
+                                              "thursday_discount_rate")]
+        demand, standard_costs, holding_costs, discount = base
+        if not kwargs:
+            points = [{"value": value, "status": "Optimal" if cost is not None else "Infeasible",
+                       "total_cost": cost}
+                      for value, cost in run_sensitivity_analysis(demand, standard_costs, parameter_name, values,
+                                                                  discount, holding_costs, discount)]
+            return 200, {"parameter_name": parameter_name, "points": points}
+
+        tasks = sensitivity_scenarios(demand, standard_costs, holding_costs, parameter_name, values, discount,
+                                      output="arrays", **kwargs)
+        job_id = self.executor.submit_batch(enhanced_solve_ordering_plan, tasks, label="sensitivity")
+        status = self.executor.wait(job_id, self.request_timeout)
+        if status["state"] != "done":
+            self.executor.cancel(job_id)
+            raise TimeoutError(f"sensitivity did not finish within {self.request_timeout:g} seconds")
+        by_value = dict(status["results"])
+        points = [{"value": value, "status": by_value[value]["status"],
+                   "total_cost": by_value[value].get("total_cost")} for value in values]
+        return 200, {"parameter_name": parameter_name, "points": points}
+
+    def demand_from_sales(self, body):
+        _check_fields(body, ("sales",))
+        if "sales" not in body:
+            raise RequestError("Missing field: sales")
+        weeks = body["sales"] if isinstance(body["sales"], list) else [body["sales"]]
+        sales = np.array([[week[drink] for drink in DRINKS] for week in map(_sales_week, weeks)])
+        demand = explode_demand(sales)
+        demand = [{ing: week[i] for i, ing in enumerate(INGREDIENTS)} for week in demand]
+        return 200, {"demand": demand if isinstance(body["sales"], list) else demand[0], "days": DAY_NAMES}
+
+    def health(self):
+        return 200, {"status": "ok", "workers": self.executor.max_workers,
+                     "batches": self.batcher.batches, "batched_requests": self.batcher.requests}
+
+
+# --- HTTP layer ---
+def _json_default(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+class PlanningRequestHandler(BaseHTTPRequestHandler):
+    """Routes JSON requests to the server's ``PlanningService``."""
+
+    routes = {"/solve": "solve", "/enhanced_solve": "enhanced_solve", "/sensitivity": "sensitivity",
+              "/demand_from_sales": "demand_from_sales"}
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/health":
+            self._reply(*self.server.service.health())
+        else:
+            self._reply(404, {"error": f"Unknown endpoint: {self.path}"})
+
+    def do_POST(self):
+        endpoint = self.routes.get(self.path.rstrip("/"))
+        if endpoint is None:
+            self._reply(404, {"error": f"Unknown endpoint: {self.path}"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}")
+            code, payload = getattr(self.server.service, endpoint)(body)
+        except (ValueError, KeyError, TypeError) as exc:  # includes RequestError and bad JSON
+            code, payload = 400, {"error": f"{type(exc).__name__}: {exc}"}
+        except TimeoutError as exc:
+            code, payload = 504, {"error": str(exc)}
+        self._reply(code, payload)
+
+    def _reply(self, code, payload):
+        data = json.dumps(payload, default=_json_default).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+class PlanningHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # the default backlog of 5 resets connections under bursts
+
+
+def make_server(host="127.0.0.1", port=8765, service=None):
+    """An HTTP server for ``service`` (port 0 picks a free port: see ``server_address``)."""
+    server = PlanningHTTPServer((host, port), PlanningRequestHandler)
+    server.service = service or PlanningService()
+    return server
+
+
+def warm_executor(max_workers=None):
+    """A ``JobExecutor`` whose workers are already running with the solver modules imported."""
+    context = None
+    if "forkserver" in get_all_start_methods():
+        # Workers fork from a server that imported the solvers once, not from this threaded process
+        context = get_context("forkserver")
+        context.set_forkserver_preload(PRELOAD_MODULES)
+    executor = JobExecutor(max_workers=max_workers, mp_context=context)
+    executor.warm_up()
+    return executor
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve ordering plans as a local HTTP/JSON API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, help="solver processes (default: number of CPUs)")
+    parser.add_argument("--batch-window-ms", type=float, default=2.0,
+                        help="how long to gather fast-path requests into one batch (default: %(default)s)")
+    parser.add_argument("--max-batch", type=int, default=256)
+    parser.add_argument("--request-timeout", type=float, default=120.0)
+    parser.add_argument("--log", help="append per-solve diagnostics (timings, model size) as JSON lines")
+    args = parser.parse_args(argv)
+    if args.log:
+        enable_json_log(args.log)
+
+    service = PlanningService(warm_executor(args.workers),
+                              RequestBatcher(args.batch_window_ms / 1000, args.max_batch),
+                              args.request_timeout)
+    server = make_server(args.host, args.port, service)
+    host, port = server.server_address[:2]
+    print(f"Serving ordering plans on http://{host}:{port} ({service.executor.max_workers} solver processes)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,178 @@
+"""Content-addressed cache for ordering-plan solves.
+
+Solver calls are keyed by a SHA-256 hash of their canonicalized inputs (demand,
+costs, discount, holding costs and policy options), so an identical what-if
+query is answered from memory, or from disk when a cache directory is given,
+without re-solving. The key also covers ``CACHE_SCHEMA`` and the source code of
+the solver modules, so results cached on disk by an older version of the solvers
+are never returned.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from copy import deepcopy
+from functools import lru_cache
+from importlib.util import find_spec
+
+import numpy as np
+
+
+def _canonical(value):
+    """Convert solver inputs into a JSON-serializable form with a stable ordering."""
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in sorted(value.items(), key=lambda kv: str(kv[0]))}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if isinstance(value, np.ndarray):
+        return [_canonical(v) for v in value.tolist()]
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        # repr of the float keeps full precision and makes 1 and 1.0 hash alike
+        return repr(float(value))
+    if callable(value):
+        return f"{value.__module__}.{value.__qualname__}"
+    raise TypeError(f"Cannot build a cache key from {type(value).__name__}")
+
+
+# Bump when the layout of cached results changes without a change to the solver modules
+CACHE_SCHEMA = 1
+# Modules whose code determines solver results; a change to any of them invalidates the cache
+SOLVER_MODULES = ("ordering_model", "fast_solver", "sparse_model", "incremental_model", "stochastic_model",
+                  "lp_sensitivity")
+
+
+@lru_cache(maxsize=None)
+def solver_code_hash(modules):
+    """SHA-256 of the source files of ``modules`` (module names; missing ones are skipped)."""
+    digest = hashlib.sha256()
+    for name in modules:
+        spec = find_spec(name)
+        if spec is not None and spec.origin and os.path.isfile(spec.origin):
+            digest.update(name.encode("utf-8"))
+            with open(spec.origin, "rb") as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+
+def cache_key(solver, **inputs):
+    """Hash of the solver identity, the solver code version and the keyword inputs."""
+    modules = SOLVER_MODULES
+    if callable(solver) and solver.__module__ not in modules:
+        modules += (solver.__module__,)
+    payload = json.dumps({"schema": CACHE_SCHEMA, "code": solver_code_hash(modules), "solver": _canonical(solver),
+                          "inputs": _canonical(inputs)},
+                         sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SolveCache:
+    """
+    Two-tier cache of solver results: an in-memory LRU bounded by ``max_entries``
+    and an optional on-disk tier (one pickle per key in ``disk_dir``).
+
+    Returned results are copies, so callers may modify them freely.
+    """
+
+    def __init__(self, max_entries=256, disk_dir=None):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.pkl")
+
+    def get(self, key):
+        """Return a copy of the cached result, or None."""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return deepcopy(self._memory[key])
+        if self.disk_dir and os.path.exists(self._disk_path(key)):
+            try:
+                with open(self._disk_path(key), "rb") as f:
+                    result = pickle.load(f)
+            except (OSError, pickle.UnpicklingError, EOFError):
+                result = None
+            if result is not None:
+                self._remember(key, result)
+                with self._lock:
+                    self.disk_hits += 1
+                return deepcopy(result)
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, result):
+        self._remember(key, deepcopy(result))
+        if self.disk_dir:
+            tmp_path = self._disk_path(key) + f".{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._disk_path(key))
+
+    def _remember(self, key, result):
+        with self._lock:
+            self._memory[key] = result
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def clear(self, disk=False):
+        with self._lock:
+            self._memory.clear()
+            self.hits = self.disk_hits = self.misses = 0
+        if disk and self.disk_dir:
+            for name in os.listdir(self.disk_dir):
+                if name.endswith(".pkl"):
+                    os.remove(os.path.join(self.disk_dir, name))
+
+    def stats(self):
+        """Hit/miss counters and current size."""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "entries": len(self._memory),
+                "max_entries": self.max_entries,
+            }
+
+    def solve(self, solver, **inputs):
+        """Return ``solver(**inputs)``, solving only on a cache miss."""
+        key = cache_key(solver, **inputs)
+        result = self.get(key)
+        if isinstance(result, dict) and "diagnostics" in result:
+            result["diagnostics"]["cached"] = True  # timings are from the original solve
+        if result is None:
+            result = solver(**inputs)
+            # Time-limited runs are not reproducible, so only definitive outcomes are kept
+            status = result.get("status") if isinstance(result, dict) else None
+            if status is None or status in ("Optimal", "Infeasible", "Unbounded"):
+                self.put(key, result)
+        return result
+
+
+# Process-wide default cache; COFFEE_SOLVE_CACHE_DIR enables the disk tier
+default_cache = SolveCache(max_entries=int(os.environ.get("COFFEE_SOLVE_CACHE_SIZE", 256)),
+                           disk_dir=os.environ.get("COFFEE_SOLVE_CACHE_DIR") or None)
+
+
+def cached_solve(solver, **inputs):
+    """Solve through the process-wide ``default_cache``."""
+    return default_cache.solve(solver, **inputs)
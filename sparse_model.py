@@ -0,0 +1,267 @@
+"""Matrix-form construction of the enhanced ordering model, solved in-process by HiGHS.
+
+Instead of one PuLP expression per constraint, the inventory-balance, minimum
+order quantity and expiry constraints are assembled as a single sparse
+constraint matrix from NumPy index arrays, and no-order days become zero upper
+bounds on the order variables. The model is handed to HiGHS through
+``scipy.optimize.milp`` directly from memory: no LP/MPS file and no subprocess.
+
+Variable layout (each block is ingredient-major, ``n_items * n_days`` long):
+orders, inventory, then stockouts, waste and order decisions when those features
+are on (waste is bounded to 0 for items that do not expire).
+"""
+
+import numpy as np
+from scipy import sparse
+from scipy.optimize import Bounds, LinearConstraint, milp
+
+from diagnostics import SolveDiagnostics, sparse_model_size
+from ordering_model import (INGREDIENTS, DAYS, DISCOUNT_DAYS, NO_ORDER_DAYS, LEGACY_MOQ_BIG_M, MOQ_MODES,
+                            moq_order_bounds, package_results, stockout_cost_array)
+
+# Fixed big-M of moq_mode="legacy", as in the PuLP model
+MOQ_BIG_M = LEGACY_MOQ_BIG_M
+
+# scipy.optimize.milp status codes -> the status strings used by the PuLP solvers
+_STATUS = {0: "Optimal", 1: "TimeLimitReached", 2: "Infeasible", 3: "Unbounded", 4: "Undefined"}
+
+
+def build_sparse_model(demand, unit_costs, holding_costs, order_mask, stockout_costs=None,
+                       min_order_quantities=None, expiry_days=None, moq_mode="tight"):
+    """
+    Assemble the model as ``min c @ v  s.t.  row_lo <= A @ v <= row_hi, lb <= v <= ub``.
+
+    ``demand``, ``unit_costs`` and ``order_mask`` are ``(n_items, n_days)`` arrays;
+    ``holding_costs``, ``stockout_costs``, ``min_order_quantities`` and
+    ``expiry_days`` are per-item arrays (0 disables MOQ/expiry for that item,
+    an infinite stockout cost disallows stockouts of that item).
+    ``moq_mode`` is the MOQ formulation, as in ``ordering_model._build_enhanced_model``.
+    """
+    if moq_mode not in MOQ_MODES:
+        raise ValueError(f"Unknown MOQ mode: {moq_mode}")
+    demand = np.asarray(demand, dtype=float)
+    n_items, n_days = demand.shape
+    n_cells = n_items * n_days
+    cell = np.arange(n_cells).reshape(n_items, n_days)
+    has_stockout = stockout_costs is not None
+    moq = np.zeros(n_items) if min_order_quantities is None else np.asarray(min_order_quantities, dtype=float)
+    has_moq = bool(np.any(moq > 0))
+    shelf_life = np.zeros(n_items, dtype=int) if expiry_days is None else np.asarray(expiry_days, dtype=int)
+    shelf_life = np.where((shelf_life > 0) & (shelf_life < n_days), shelf_life, 0)
+    has_expiry = bool(np.any(shelf_life))
+
+    # Variable blocks
+    offsets = {"orders": 0, "inventory": n_cells}
+    n_vars = 2 * n_cells
+    if has_stockout:
+        offsets["stockouts"] = n_vars
+        n_vars += n_cells
+    if has_expiry:
+        offsets["waste"] = n_vars
+        n_vars += n_cells
+    if has_moq:
+        offsets["decisions"] = n_vars
+        n_vars += n_cells
+    order_col = offsets["orders"] + cell
+    inv_col = offsets["inventory"] + cell
+
+    c = np.zeros(n_vars)
+    c[order_col.ravel()] = np.asarray(unit_costs, dtype=float).ravel()
+    c[inv_col.ravel()] = np.repeat(np.asarray(holding_costs, dtype=float), n_days)
+    lb = np.zeros(n_vars)
+    ub = np.full(n_vars, np.inf)
+    ub[order_col[~np.asarray(order_mask, dtype=bool)]] = 0.0  # no-order days
+    integrality = np.zeros(n_vars, dtype=np.uint8)
+    if has_stockout:
+        # An infinite stockout cost means the item's demand must be met
+        stockout_costs = np.asarray(stockout_costs, dtype=float)
+        allowed = np.isfinite(stockout_costs)
+        c[offsets["stockouts"] + cell.ravel()] = np.repeat(np.where(allowed, stockout_costs, 0.0), n_days)
+        ub[offsets["stockouts"] + cell[~allowed]] = 0.0
+    if has_expiry:
+        waste_col = offsets["waste"] + cell
+        ub[waste_col[shelf_life == 0]] = 0.0
+
+    rows, cols, vals, row_lo, row_hi = [], [], [], [], []
+    n_rows = 0
+
+    def add_rows(row_idx, col_idx, coef):
+        rows.append(np.ravel(row_idx) + n_rows)
+        cols.append(np.ravel(col_idx))
+        vals.append(np.broadcast_to(coef, np.shape(col_idx)).ravel())
+
+    # Inventory balance: inv[t] - inv[t-1] - order[t] (- stockout[t]) (+ waste[t]) = -demand[t]
+    add_rows(cell, inv_col, 1.0)
+    add_rows(cell[:, 1:], inv_col[:, :-1], -1.0)
+    add_rows(cell, order_col, -1.0)
+    if has_stockout:
+        add_rows(cell, offsets["stockouts"] + cell, -1.0)
+    if has_expiry:
+        add_rows(cell, waste_col, 1.0)
+    row_lo.append(-demand.ravel())
+    row_hi.append(-demand.ravel())
+    n_rows += n_cells
+
+    # Minimum order quantities: order <= M * decision and order >= moq * decision
+    if has_moq:
+        decision_col = offsets["decisions"] + cell
+        integrality[decision_col.ravel()] = 1
+        ub[decision_col.ravel()] = 1.0
+        active = (moq[:, None] > 0) & np.asarray(order_mask, dtype=bool)
+        ub[decision_col[~active]] = 0.0
+        active_orders, active_decisions = order_col[active], decision_col[active]
+        n_active = len(active_orders)
+        local = np.arange(n_active)
+        if moq_mode == "legacy":
+            big_m = float(MOQ_BIG_M)
+        else:
+            big_m = moq_order_bounds(demand, moq, shelf_life)[active]
+        add_rows(local, active_orders, 1.0)
+        add_rows(local, active_decisions, -big_m)
+        add_rows(local + n_active, active_orders, 1.0)
+        add_rows(local + n_active, active_decisions, -np.broadcast_to(moq[:, None], active.shape)[active])
+        row_lo += [np.full(n_active, -np.inf), np.zeros(n_active)]
+        row_hi += [np.zeros(n_active), np.full(n_active, np.inf)]
+        n_rows += 2 * n_active
+
+        # (l,S) inequalities with S = {t}: order[t] - demand[t..l] * decision[t] - inv[l] <= 0,
+        # for perishable items up to the expiry of the order and with - waste[t..l] added
+        if moq_mode == "tight":
+            item, day = np.nonzero(active)
+            span = np.where(shelf_life[item] > 0, np.minimum(n_days - day, shelf_life[item]), n_days - day)
+            n_cuts = int(span.sum())
+            first = np.repeat(np.cumsum(span) - span, span)
+            cut_item, cut_day = np.repeat(item, span), np.repeat(day, span)
+            cut_last = cut_day + np.arange(n_cuts) - first
+            cum = np.concatenate([np.zeros((n_items, 1)), np.cumsum(demand, axis=1)], axis=1)
+            local = np.arange(n_cuts)
+            add_rows(local, order_col[cut_item, cut_day], 1.0)
+            add_rows(local, decision_col[cut_item, cut_day],
+                     -(cum[cut_item, cut_last + 1] - cum[cut_item, cut_day]))
+            add_rows(local, inv_col[cut_item, cut_last], -1.0)
+            perishable_cut = np.flatnonzero(shelf_life[cut_item] > 0)
+            if len(perishable_cut):
+                n_terms = cut_last[perishable_cut] - cut_day[perishable_cut] + 1
+                term_first = np.repeat(np.cumsum(n_terms) - n_terms, n_terms)
+                term_day = np.repeat(cut_day[perishable_cut], n_terms) + np.arange(n_terms.sum()) - term_first
+                add_rows(np.repeat(perishable_cut, n_terms),
+                         waste_col[np.repeat(cut_item[perishable_cut], n_terms), term_day], -1.0)
+            row_lo.append(np.full(n_cuts, -np.inf))
+            row_hi.append(np.zeros(n_cuts))
+            n_rows += n_cuts
+
+    # Expiry with FIFO issue: only the last (e - 1) days of orders can still be in stock,
+    # inv[t] - sum(order[t-e+2..t]) <= 0
+    if has_expiry:
+        perishable = np.flatnonzero(shelf_life)
+        local = np.arange(len(perishable) * n_days).reshape(len(perishable), n_days)
+        add_rows(local, inv_col[perishable], 1.0)
+        for lag in range(int(shelf_life.max()) - 1):
+            in_window = (lag < shelf_life[perishable] - 1)[:, None] & (np.arange(n_days) >= lag)
+            rows_in, days_in = np.nonzero(in_window)
+            add_rows(local[rows_in, days_in], order_col[perishable[rows_in], days_in - lag], -1.0)
+        row_lo.append(np.full(local.size, -np.inf))
+        row_hi.append(np.zeros(local.size))
+        n_rows += local.size
+
+    A = sparse.csr_matrix((np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))),
+                          shape=(n_rows, n_vars))
+    return {
+        "c": c, "A": A, "row_lo": np.concatenate(row_lo), "row_hi": np.concatenate(row_hi),
+        "lb": lb, "ub": ub, "integrality": integrality,
+        "offsets": offsets, "shape": (n_items, n_days),
+    }
+
+
+def solve_sparse_model(model, max_solver_time=20, stats=None):
+    """
+    Solve a ``build_sparse_model`` model with HiGHS; returns (status, objective, x).
+    Branch-and-bound node count and MIP gap are written into ``stats`` when given.
+    """
+    res = milp(model["c"], integrality=model["integrality"],
+               bounds=Bounds(model["lb"], model["ub"]),
+               constraints=LinearConstraint(model["A"], model["row_lo"], model["row_hi"]),
+               options={"time_limit": max_solver_time})
+    if stats is not None:
+        for key, name in (("mip_node_count", "nodes"), ("mip_gap", "mip_gap")):
+            if res.get(key) is not None:
+                stats[name] = res[key]
+    return _STATUS.get(res.status, "Undefined"), res.fun, res.x
+
+
+def model_inputs(demand, standard_costs, thursday_discount_rate, holding_costs, expiry_days=None,
+                 min_order_quantities=None, stockout_costs=None, ordering_days=None):
+    """Convert the dict-based solver inputs into ``build_sparse_model`` keyword arrays."""
+    demand_arr = np.array([[demand[ing][day] for day in DAYS] for ing in INGREDIENTS], dtype=float)
+    day_factor = np.ones(len(DAYS))
+    day_factor[DISCOUNT_DAYS] = 1 - thursday_discount_rate
+    unit_costs = np.array([standard_costs[ing] for ing in INGREDIENTS])[:, None] * day_factor
+    holding = np.array([holding_costs[ing] for ing in INGREDIENTS], dtype=float)
+    no_order_days = NO_ORDER_DAYS if ordering_days is None else [d for d in DAYS if d not in ordering_days]
+    order_mask = np.ones(demand_arr.shape, dtype=bool)
+    order_mask[:, list(no_order_days)] = False
+
+    def per_item(values):
+        return None if not values else np.array([values.get(ing) or 0 for ing in INGREDIENTS], dtype=float)
+
+    return {
+        "demand": demand_arr, "unit_costs": unit_costs, "holding_costs": holding, "order_mask": order_mask,
+        "stockout_costs": stockout_cost_array(stockout_costs),
+        "min_order_quantities": per_item(min_order_quantities),
+        "expiry_days": per_item(expiry_days),
+    }
+
+
+def model_results(model, status, objective, x, output="dataframe"):
+    """
+    Turn a solution vector into the results dict used by the PuLP solvers: the plan
+    is packaged for "Optimal", and for "TimeLimitReached" when the solver has a
+    feasible ``x`` (see ``ordering_model.SOLVER_BACKENDS``).
+    """
+    results = {"status": status}
+    if x is not None and status in ("Optimal", "TimeLimitReached"):
+        n_items, n_days = model["shape"]
+        n_cells = n_items * n_days
+
+        def block(name):
+            start = model["offsets"][name]
+            return np.asarray(x[start:start + n_cells]).reshape(n_items, n_days)
+
+        results["total_cost"] = objective
+        blocks = {"order_plan": block("orders"), "inventory_levels": block("inventory")}
+        if "stockouts" in model["offsets"]:
+            blocks["stockout_levels"] = block("stockouts")
+        if "waste" in model["offsets"]:
+            blocks["waste_levels"] = block("waste")
+        package_results(results, blocks, output)
+    return results
+
+
+def sparse_solve_ordering_plan(demand, standard_costs, thursday_discount_rate, holding_costs,
+                               expiry_days=None, min_order_quantities=None, stockout_costs=None,
+                               ordering_days=None, max_solver_time=20, output="dataframe", moq_mode="tight",
+                               persistent=False):
+    """
+    Same inputs and results dict as ``enhanced_solve_ordering_plan``, built in matrix form and solved by HiGHS.
+
+    persistent=True solves on this thread's resident HiGHS instance
+    (``incremental_model.solve_resident``, requires highspy) instead of through
+    ``scipy.optimize.milp``.
+    """
+    diagnostics = SolveDiagnostics("highs")
+    with diagnostics.phase("build"):
+        model = build_sparse_model(**model_inputs(demand, standard_costs, thursday_discount_rate, holding_costs,
+                                                  expiry_days, min_order_quantities, stockout_costs, ordering_days),
+                                   moq_mode=moq_mode)
+    diagnostics.model.update(sparse_model_size(model))
+    if persistent:
+        from incremental_model import solve_resident
+        solve = solve_resident
+    else:
+        solve = solve_sparse_model
+    with diagnostics.phase("solve"):
+        status, objective, x = solve(model, max_solver_time, stats=diagnostics.solver)
+    with diagnostics.phase("extract"):
+        results = model_results(model, status, objective, x, output)
+    results["diagnostics"] = diagnostics.as_dict()
+    return results
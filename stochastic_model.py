@@ -0,0 +1,249 @@
+"""Two-stage stochastic ordering plans by sample-average approximation (SAA).
+
+Instead of planning against the single point forecast, drink-sales scenarios
+are bootstrapped from the forecaster's residuals on the sales history
+(``demand_history.xlsx``) and exploded to ingredient demand in one batched
+product. The orders are the first-stage decision and are shared by all
+scenarios. Inventory and stockouts (and, for perishable items, waste) are
+second-stage variables per scenario, and the objective is purchase cost plus
+the scenario average of holding and stockout cost.
+
+Ingredients do not interact, so the extensive form is built per ingredient in
+matrix form (``n_days + 2 * n_scenarios * n_days`` variables) from NumPy index
+arrays and solved by HiGHS, as in ``sparse_model``. With 1,000 scenarios over a
+week each ingredient is a 14,000-column LP.
+"""
+
+import numpy as np
+from scipy import sparse
+
+from diagnostics import SolveDiagnostics, sparse_model_size
+from forecast_pipeline import HistoryReader, OnlineDemandForecaster, _features, _weekday_of
+from ordering_model import (INGREDIENTS, DRINKS, DAYS, DISCOUNT_DAYS, NO_ORDER_DAYS, _check_output,
+                            explode_demand, package_results, shelf_life_array)
+from sparse_model import solve_sparse_model
+
+# Statuses in order of precedence when combining the per-ingredient solves
+_STATUS_ORDER = ["Optimal", "TimeLimitReached", "Undefined", "Unbounded", "Infeasible"]
+
+
+def forecast_residuals(history_path="demand_history.xlsx", drinks=DRINKS, dof_correction=True):
+    """
+    In-sample forecast errors (actual - fitted sales) on the history, shape (n_days, drinks).
+
+    The forecaster is the one used by ``forecast_pipeline``. In-sample residuals
+    understate the forecast error, so by default they are scaled by
+    sqrt(n / (n - rank)), the usual degrees-of-freedom correction.
+    """
+    rows = HistoryReader(history_path, drinks).read_new()
+    if not rows:
+        raise ValueError(f"{history_path}: no complete sales history rows")
+    weekdays = np.array([_weekday_of(row) for row in rows])
+    promotions = np.array([float(row.get("Promotion Day") or 0) for row in rows])
+    sales = np.array([[float(row[f"{drink} Sales"]) for drink in drinks] for row in rows])
+    forecaster = OnlineDemandForecaster(drinks)
+    forecaster.update(weekdays, promotions, sales)
+    X = _features(weekdays, promotions)
+    residuals = sales - X @ forecaster.coefficients()
+    if dof_correction:
+        n_obs, rank = len(X), np.linalg.matrix_rank(X)
+        if n_obs > rank:
+            residuals *= np.sqrt(n_obs / (n_obs - rank))
+    return residuals
+
+
+def sample_demand_scenarios(base_sales, residuals, n_scenarios, seed=None, recipe=None, drinks=DRINKS):
+    """
+    Bootstrap drink-sales scenarios around ``base_sales`` and explode them to ingredient demand.
+
+    Each scenario day adds the residuals of one randomly drawn history day, so the
+    correlation between drinks on a day is kept. Sales are rounded and floored at 0.
+    Returns ``(sales, demand)`` with shapes (n_scenarios, drinks, days) and
+    (n_scenarios, ingredients, days).
+    """
+    base = np.array([np.asarray(base_sales[drink], dtype=float) for drink in drinks])
+    residuals = np.asarray(residuals, dtype=float)
+    rng = np.random.default_rng(seed)
+    draws = rng.integers(len(residuals), size=(n_scenarios, base.shape[1]))
+    sales = np.maximum(np.round(base + residuals[draws].transpose(0, 2, 1)), 0.0)
+    return sales, explode_demand(sales, recipe)
+
+
+def build_saa_model(demand, unit_costs, holding_cost, order_mask, stockout_cost=None, min_order_quantity=0.0,
+                    shelf_life=0):
+    """
+    Extensive form of one ingredient as a ``sparse_model``-style model dict.
+
+    ``demand`` is (n_scenarios, n_days); ``unit_costs`` and ``order_mask`` are
+    per day. Variables: orders (n_days), then inventory, stockouts and waste per
+    (scenario, day), then order decisions when ``min_order_quantity`` > 0.
+    Without a stockout cost every scenario's demand must be met. With a
+    ``shelf_life`` (days, 0 for none) stock is issued FIFO and what is older
+    than that is wasted, as in ``sparse_model``.
+    """
+    demand = np.asarray(demand, dtype=float)
+    n_scen, n_days = demand.shape
+    n_cells = n_scen * n_days
+    cell = np.arange(n_cells).reshape(n_scen, n_days)
+    has_stockout = stockout_cost is not None
+    has_moq = min_order_quantity > 0
+    shelf_life = int(shelf_life) if 0 < shelf_life < n_days else 0
+
+    offsets = {"orders": 0, "inventory": n_days}
+    n_vars = n_days + n_cells
+    if has_stockout:
+        offsets["stockouts"] = n_vars
+        n_vars += n_cells
+    if shelf_life:
+        offsets["waste"] = n_vars
+        n_vars += n_cells
+    if has_moq:
+        offsets["decisions"] = n_vars
+        n_vars += n_days
+    inv_col = offsets["inventory"] + cell
+
+    c = np.zeros(n_vars)
+    c[:n_days] = unit_costs
+    c[inv_col.ravel()] = holding_cost / n_scen
+    lb = np.zeros(n_vars)
+    ub = np.full(n_vars, np.inf)
+    ub[:n_days][~np.asarray(order_mask, dtype=bool)] = 0.0
+    integrality = np.zeros(n_vars, dtype=np.uint8)
+    if has_stockout:
+        c[offsets["stockouts"]:offsets["stockouts"] + n_cells] = stockout_cost / n_scen
+
+    # Inventory balance per scenario: inv[s,t] - inv[s,t-1] - order[t] (- stockout[s,t]) (+ waste[s,t])
+    # = -demand[s,t]
+    rows = [cell, cell[:, 1:], cell]
+    cols = [inv_col, inv_col[:, :-1], np.broadcast_to(np.arange(n_days), cell.shape)]
+    vals = [np.ones(n_cells), -np.ones(n_cells - n_scen), -np.ones(n_cells)]
+    if has_stockout:
+        rows.append(cell)
+        cols.append(offsets["stockouts"] + cell)
+        vals.append(-np.ones(n_cells))
+    if shelf_life:
+        rows.append(cell)
+        cols.append(offsets["waste"] + cell)
+        vals.append(np.ones(n_cells))
+    row_lo, row_hi = [-demand.ravel()], [-demand.ravel()]
+    n_rows = n_cells
+
+    # Expiry with FIFO issue: only the last (e - 1) days of orders can still be in stock,
+    # inv[s,t] - sum(order[t-e+2..t]) <= 0 in every scenario
+    if shelf_life:
+        lag = np.arange(shelf_life - 1)
+        day, back = np.nonzero(np.arange(n_days)[:, None] >= lag)
+        rows += [n_rows + cell, n_rows + cell[:, day]]
+        cols += [inv_col, np.broadcast_to(day - lag[back], (n_scen, len(day)))]
+        vals += [np.ones(n_cells), -np.ones(n_scen * len(day))]
+        row_lo.append(np.full(n_cells, -np.inf))
+        row_hi.append(np.zeros(n_cells))
+        n_rows += n_cells
+
+    # Minimum order quantity: moq * decision <= order <= M * decision, with M from the
+    # largest remaining demand (up to the order's expiry) over the scenarios: nothing beyond it is ever used
+    if has_moq:
+        days = np.flatnonzero(order_mask)
+        decision_col = offsets["decisions"] + np.arange(n_days)
+        integrality[decision_col] = 1
+        ub[decision_col] = np.where(np.asarray(order_mask, dtype=bool), 1.0, 0.0)
+        remaining = np.cumsum(demand[:, ::-1], axis=1)[:, ::-1]
+        if shelf_life:
+            remaining = remaining - np.pad(remaining[:, shelf_life:], ((0, 0), (0, shelf_life)))
+        remaining = remaining.max(axis=0)
+        big_m = np.maximum(min_order_quantity, remaining[days])
+        local = n_rows + np.arange(len(days))
+        rows += [local, local, local + len(days), local + len(days)]
+        cols += [days, decision_col[days], days, decision_col[days]]
+        vals += [np.ones(len(days)), -big_m, np.ones(len(days)), np.full(len(days), -float(min_order_quantity))]
+        row_lo += [np.full(len(days), -np.inf), np.zeros(len(days))]
+        row_hi += [np.zeros(len(days)), np.full(len(days), np.inf)]
+        n_rows += 2 * len(days)
+
+    A = sparse.csr_matrix((np.concatenate([np.ravel(v) for v in vals]),
+                           (np.concatenate([np.ravel(r) for r in rows]), np.concatenate([np.ravel(k) for k in cols]))),
+                          shape=(n_rows, n_vars))
+    return {
+        "c": c, "A": A, "row_lo": np.concatenate(row_lo), "row_hi": np.concatenate(row_hi),
+        "lb": lb, "ub": ub, "integrality": integrality,
+        "offsets": offsets, "shape": (n_scen, n_days),
+    }
+
+
+def stochastic_solve_ordering_plan(demand_scenarios, standard_costs, thursday_discount_rate, holding_costs,
+                                   stockout_costs=None, min_order_quantities=None, ordering_days=None,
+                                   expiry_days=None, max_solver_time=20, output="dataframe"):
+    """
+    One order plan that minimises the expected cost over the demand scenarios.
+
+    ``demand_scenarios`` is an (n_scenarios, ingredients, days) array, e.g. from
+    ``sample_demand_scenarios``. The results dict has the usual keys, with the
+    expected (scenario-average) cost, inventory, stockouts and waste, plus:
+
+    - ``scenario_costs``: total cost of the plan in each scenario
+    - ``fill_rate``: share of the demand over all scenarios that is served
+    - ``n_scenarios``
+    """
+    _check_output(output)
+    demand_scenarios = np.asarray(demand_scenarios, dtype=float)
+    n_scen, n_items, n_days = demand_scenarios.shape
+    day_factor = np.ones(n_days)
+    day_factor[DISCOUNT_DAYS] = 1 - thursday_discount_rate
+    no_order_days = NO_ORDER_DAYS if ordering_days is None else [d for d in DAYS if d not in ordering_days]
+    order_mask = np.ones(n_days, dtype=bool)
+    order_mask[list(no_order_days)] = False
+
+    diagnostics = SolveDiagnostics("highs")
+    size = {"variables": 0, "constraints": 0, "nonzeros": 0, "integer_variables": 0}
+    statuses, total_cost = [], 0.0
+    orders = np.zeros((n_items, n_days))
+    inventory = np.zeros((n_scen, n_items, n_days))
+    stockouts = np.zeros((n_scen, n_items, n_days))
+    waste = np.zeros((n_scen, n_items, n_days))
+    shelf_life = shelf_life_array(expiry_days, n_days=n_days)
+    for i, ing in enumerate(INGREDIENTS):
+        unit_costs = standard_costs[ing] * day_factor
+        stockout_cost = stockout_costs.get(ing) if stockout_costs else None
+        min_qty = (min_order_quantities or {}).get(ing) or 0.0
+        with diagnostics.phase("build"):
+            model = build_saa_model(demand_scenarios[:, i], unit_costs, holding_costs[ing], order_mask,
+                                    stockout_cost, min_qty, shelf_life[i])
+        for key, value in sparse_model_size(model).items():
+            size[key] += value
+        with diagnostics.phase("solve"):
+            status, objective, x = solve_sparse_model(model, max_solver_time, stats={})
+        statuses.append(status)
+        if x is None or status not in ("Optimal", "TimeLimitReached"):
+            continue
+        with diagnostics.phase("extract"):
+            offsets = model["offsets"]
+            total_cost += objective
+            orders[i] = x[:n_days]
+            inventory[:, i] = x[offsets["inventory"]:offsets["inventory"] + n_scen * n_days].reshape(n_scen, n_days)
+            if "stockouts" in offsets:
+                start = offsets["stockouts"]
+                stockouts[:, i] = x[start:start + n_scen * n_days].reshape(n_scen, n_days)
+            if "waste" in offsets:
+                start = offsets["waste"]
+                waste[:, i] = x[start:start + n_scen * n_days].reshape(n_scen, n_days)
+    diagnostics.model.update(size, scenarios=n_scen)
+
+    status = max(statuses, key=_STATUS_ORDER.index)
+    results = {"status": status, "n_scenarios": n_scen}
+    if status in ("Optimal", "TimeLimitReached"):
+        with diagnostics.phase("extract"):
+            unit_cost_arr = np.array([standard_costs[ing] for ing in INGREDIENTS])[:, None] * day_factor
+            holding = np.array([holding_costs[ing] for ing in INGREDIENTS])
+            penalty = np.array([(stockout_costs or {}).get(ing) or 0.0 for ing in INGREDIENTS])
+            results["total_cost"] = total_cost
+            results["scenario_costs"] = (np.sum(unit_cost_arr * orders)
+                                         + inventory.sum(axis=2) @ holding + stockouts.sum(axis=2) @ penalty)
+            results["fill_rate"] = 1.0 - stockouts.sum() / max(demand_scenarios.sum(), 1e-12)
+            blocks = {"order_plan": orders, "inventory_levels": inventory.mean(axis=0)}
+            if stockout_costs:
+                blocks["stockout_levels"] = stockouts.mean(axis=0)
+            if expiry_days:
+                blocks["waste_levels"] = waste.mean(axis=0)
+            package_results(results, blocks, output)
+    results["diagnostics"] = diagnostics.as_dict()
+    return results
@@ -0,0 +1,31 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ordering_model as om  # noqa: E402
+
+
+@pytest.fixture
+def default_inputs():
+    """The app's default week: predicted-sales demand and default costs."""
+    return dict(demand=om.calculate_demand_from_sales(om.PREDICTED_SALES),
+                standard_costs=dict(om.DEFAULT_STANDARD_COSTS),
+                thursday_discount_rate=om.DEFAULT_THURSDAY_DISCOUNT_RATE,
+                holding_costs=dict(om.DEFAULT_HOLDING_COSTS))
+
+
+@pytest.fixture
+def random_inputs():
+    """Factory for random solver inputs: ``random_inputs(seed)`` -> keyword dict."""
+    def make(seed):
+        rng = np.random.default_rng(seed)
+        sales = {drink: rng.integers(0, 200, len(om.DAYS)) for drink in om.DRINKS}
+        return dict(demand=om.calculate_demand_from_sales(sales),
+                    standard_costs={ing: float(rng.uniform(1, 20)) for ing in om.INGREDIENTS},
+                    thursday_discount_rate=float(rng.uniform(0, 0.5)),
+                    holding_costs={ing: float(rng.uniform(0.05, 3)) for ing in om.INGREDIENTS})
+    return make
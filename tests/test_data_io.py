@@ -0,0 +1,100 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+import pyarrow.feather as feather  # noqa: E402
+import pyarrow.parquet as pq  # noqa: E402
+
+import ordering_model as om  # noqa: E402
+from data_io import (load_costs, parquet_bytes, plan_table, read_plan_dataset, read_table,  # noqa: E402
+                     write_plan_dataset)
+
+FRAME = pd.DataFrame({"store": ["north", "south", "north", "east"], "week": [0, 0, 1, 1],
+                      "kg": [1.5, 2.0, 3.25, 4.0]})
+
+
+def _write(path, frame):
+    ext = path.suffix
+    if ext == ".parquet":
+        frame.to_parquet(path, index=False)
+    elif ext == ".feather":
+        feather.write_feather(pa.Table.from_pandas(frame, preserve_index=False), str(path))
+    elif ext == ".csv":
+        frame.to_csv(path, index=False)
+    else:
+        frame.to_excel(path, index=False)
+
+
+@pytest.mark.parametrize("ext", [".parquet", ".feather", ".csv", ".xlsx"])
+def test_read_table_round_trip(tmp_path, ext):
+    path = tmp_path / f"table{ext}"
+    _write(path, FRAME)
+    assert read_table(str(path)).to_pandas().equals(FRAME)
+    selected = read_table(str(path), columns=["kg", "store"], filters=[("store", "=", "north")]).to_pandas()
+    assert list(selected.columns) == ["kg", "store"]
+    assert selected["kg"].tolist() == [1.5, 3.25]
+
+
+def test_read_table_rejects_unknown_formats(tmp_path):
+    path = tmp_path / "table.txt"
+    path.write_text("store,kg\n")
+    with pytest.raises(ValueError):
+        read_table(str(path))
+
+
+def test_load_costs(tmp_path):
+    path = tmp_path / "costs.csv"
+    pd.DataFrame({"ingredient": om.INGREDIENTS[::-1], "standard_cost": [1.0, 2.0, 3.0, 4.0],
+                  "holding_cost": [0.1, 0.2, 0.3, 0.4], "expiry_days": [0, 2, 0, 5]}).to_csv(path, index=False)
+    options = load_costs(str(path))
+    assert options["standard_costs"] == dict(zip(om.INGREDIENTS[::-1], [1.0, 2.0, 3.0, 4.0]))
+    assert options["expiry_days"] == {om.INGREDIENTS[2]: 2, om.INGREDIENTS[0]: 5}
+    assert "stockout_costs" not in options
+
+
+def _plans(default_inputs):
+    results = {output: om.enhanced_solve_ordering_plan(**default_inputs, output=output)
+               for output in om.OUTPUT_FORMATS}
+    return results, [plan_table(results["dataframe"], "north", 0), plan_table(results["arrays"], "north", 1),
+                     plan_table(results["arrow"], "south", 0)]
+
+
+def test_plan_table_is_the_same_for_every_output(default_inputs):
+    _, tables = _plans(default_inputs)
+    frames = [table.drop_columns(["store", "week"]).to_pandas() for table in tables]
+    assert frames[0].equals(frames[1]) and frames[0].equals(frames[2])
+    assert tables[0].column_names[:4] == ["store", "week", "ingredient", "day"]
+
+
+def test_plan_dataset_round_trip(tmp_path, default_inputs):
+    results, tables = _plans(default_inputs)
+    root = str(tmp_path / "plans")
+    write_plan_dataset(pa.concat_tables(tables), root)
+
+    everything = read_plan_dataset(root)
+    assert everything.num_rows == sum(table.num_rows for table in tables)
+    north_1 = read_plan_dataset(root, store="north", week=1).to_pandas()
+    assert set(north_1["store"]) == {"north"} and set(north_1["week"]) == {1}
+    orders = north_1.pivot(index="ingredient", columns="day", values="order_kg").loc[om.INGREDIENTS, om.DAY_NAMES]
+    assert np.allclose(orders.to_numpy(), results["arrays"]["order_plan"])
+    assert read_plan_dataset(root, week=0, columns=["store", "order_kg"]).column_names == ["store", "order_kg"]
+
+    # Rewriting one partition replaces it and keeps the others
+    replacement = plan_table({"order_plan": np.ones((len(om.INGREDIENTS), len(om.DAYS)))}, "north", 1)
+    write_plan_dataset(replacement.to_pandas(), root)
+    assert read_plan_dataset(root, store="north", week=1)["order_kg"].to_pylist() == [1.0] * replacement.num_rows
+    assert read_plan_dataset(root, store="south").num_rows == tables[2].num_rows
+    assert read_plan_dataset(root).num_rows == everything.num_rows
+
+
+def test_parquet_bytes(default_inputs):
+    _, tables = _plans(default_inputs)
+    assert pq.read_table(io.BytesIO(parquet_bytes(tables[0]))).equals(tables[0])
+
+
+def test_plan_table_needs_a_plan():
+    with pytest.raises(ValueError):
+        plan_table({"status": "Infeasible"})
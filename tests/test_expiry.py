@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+import ordering_model as om
+from plan_simulation import simulate_plan
+
+EXPIRY = {"Milk Foam": 2, "Steamed Milk": 3}
+MOQ = {"Milk Foam": 40.0, "Steamed Milk": 60.0}  # more than is used before expiry, so stock is wasted
+
+
+def _arrays(inputs):
+    demand = np.array([[inputs["demand"][ing][day] for day in om.DAYS] for ing in om.INGREDIENTS])
+    day_factor = np.ones(len(om.DAYS))
+    day_factor[om.DISCOUNT_DAYS] = 1 - inputs["thursday_discount_rate"]
+    unit_costs = np.array([inputs["standard_costs"][ing] for ing in om.INGREDIENTS])[:, None] * day_factor
+    holding = np.array([inputs["holding_costs"][ing] for ing in om.INGREDIENTS])
+    return demand, unit_costs, holding
+
+
+@pytest.fixture(params=om.SOLVER_BACKENDS[:2])
+def wasteful_plan(request, default_inputs):
+    result = om.enhanced_solve_ordering_plan(**default_inputs, expiry_days=EXPIRY, min_order_quantities=MOQ,
+                                             backend=request.param, output="arrays")
+    assert result["status"] == "Optimal"
+    return default_inputs, result
+
+
+def test_waste_only_for_perishable_items(wasteful_plan):
+    _, result = wasteful_plan
+    waste = result["waste_levels"].sum(axis=1)
+    for ing, total in zip(om.INGREDIENTS, waste):
+        if ing in EXPIRY:
+            assert total > 1.0
+        else:
+            assert total == pytest.approx(0.0, abs=1e-9)
+
+
+def test_inventory_balance_with_waste(wasteful_plan):
+    inputs, result = wasteful_plan
+    demand, _, _ = _arrays(inputs)
+    flow = result["order_plan"] - demand - result["waste_levels"]
+    assert np.allclose(result["inventory_levels"], np.cumsum(flow, axis=1), atol=1e-6)
+
+
+def test_stock_is_never_older_than_its_shelf_life(wasteful_plan):
+    _, result = wasteful_plan
+    orders, inventory = result["order_plan"], result["inventory_levels"]
+    for i, life in enumerate(om.shelf_life_array(EXPIRY)):
+        if not life:
+            continue
+        for t in om.DAYS:
+            fresh = orders[i, max(0, t - life + 2):t + 1].sum()
+            assert inventory[i, t] <= fresh + 1e-6
+
+
+def test_fifo_replay_matches_the_plan(wasteful_plan):
+    # Replaying the plan with FIFO issue and expiry serves all demand; what the model
+    # discards early the simulation discards at expiry or keeps at the end
+    inputs, result = wasteful_plan
+    demand, unit_costs, holding = _arrays(inputs)
+    simulation = simulate_plan(result["order_plan"], demand[None], unit_costs, holding,
+                               shelf_life=om.shelf_life_array(EXPIRY))
+    assert np.allclose(simulation["stockout_kg"], 0.0, atol=1e-6)
+    left_over = simulation["waste_kg"][0] + simulation["end_inventory_kg"][0]
+    assert np.allclose(left_over, result["waste_levels"].sum(axis=1) + result["inventory_levels"][:, -1],
+                       atol=1e-6)
+    model_purchase = float((unit_costs * result["order_plan"]).sum())
+    assert simulation["purchase_cost"] == pytest.approx(model_purchase, rel=1e-9)
+    assert result["total_cost"] <= simulation["total_cost"][0] + 1e-6
+
+
+def test_backends_agree_with_expiry_and_moq(default_inputs):
+    costs = [om.enhanced_solve_ordering_plan(**default_inputs, expiry_days=EXPIRY, min_order_quantities=MOQ,
+                                             backend=backend)["total_cost"]
+             for backend in om.SOLVER_BACKENDS]
+    assert costs == pytest.approx([costs[0]] * len(costs), rel=1e-7)
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_nothing_is_wasted_without_moq(random_inputs, seed):
+    result = om.enhanced_solve_ordering_plan(**random_inputs(seed), expiry_days=EXPIRY, output="arrays",
+                                             use_fast_path=False)
+    assert result["status"] == "Optimal"
+    assert np.allclose(result["waste_levels"], 0.0, atol=1e-6)
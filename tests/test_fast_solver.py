@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+import ordering_model as om
+from fast_solver import is_fast_path_eligible
+
+
+def _cost_pair(inputs, **options):
+    fast = om.enhanced_solve_ordering_plan(**inputs, **options, output="arrays")
+    cbc = om.enhanced_solve_ordering_plan(**inputs, **options, output="arrays", use_fast_path=False)
+    return fast, cbc
+
+
+@pytest.mark.parametrize("seed", range(12))
+def test_fast_path_matches_cbc(random_inputs, seed):
+    inputs = random_inputs(seed)
+    rng = np.random.default_rng(100 + seed)
+    ordering_days = sorted({0, *rng.choice(om.DAYS, size=rng.integers(1, 6), replace=False).tolist()})
+    options = dict(ordering_days=ordering_days)
+    if seed % 2:
+        options["stockout_costs"] = {ing: float(rng.uniform(0, 30)) for ing in om.INGREDIENTS}
+    if seed % 3:
+        options["expiry_days"] = {ing: int(rng.integers(1, 5)) for ing in om.INGREDIENTS[:2]}
+
+    fast, cbc = _cost_pair(inputs, **options)
+    assert fast["diagnostics"]["backend"] == "numpy"
+    assert fast["status"] == cbc["status"]
+    if cbc["status"] == "Optimal":
+        assert fast["total_cost"] == pytest.approx(cbc["total_cost"], rel=1e-7, abs=1e-6)
+
+
+def test_basic_fast_path_matches_cbc(default_inputs):
+    fast = om.solve_ordering_plan(**default_inputs)
+    cbc = om.solve_ordering_plan(**default_inputs, use_fast_path=False)
+    assert fast["diagnostics"]["backend"] == "numpy"
+    assert fast["total_cost"] == pytest.approx(cbc["total_cost"], rel=1e-9)
+
+
+def test_partial_stockout_costs_require_the_rest_to_be_met(default_inputs):
+    # Ingredients without a stockout cost must be served on every backend
+    stockout = {om.INGREDIENTS[0]: 100.0}
+    baseline = om.enhanced_solve_ordering_plan(**default_inputs)["total_cost"]
+    results = [om.enhanced_solve_ordering_plan(**default_inputs, stockout_costs=stockout, output="arrays", **kw)
+               for kw in ({}, {"use_fast_path": False}, {"use_fast_path": False, "backend": "highs"})]
+    for result in results:
+        assert result["status"] == "Optimal"
+        assert result["total_cost"] == pytest.approx(baseline, rel=1e-9)
+        assert np.allclose(result["stockout_levels"][1:], 0.0)
+
+
+def test_partial_stockout_costs_with_moq_agree(default_inputs):
+    options = dict(stockout_costs={om.INGREDIENTS[0]: 100.0}, min_order_quantities={om.INGREDIENTS[1]: 5.0})
+    cbc = om.enhanced_solve_ordering_plan(**default_inputs, **options)
+    highs = om.enhanced_solve_ordering_plan(**default_inputs, **options, backend="highs")
+    assert cbc["status"] == highs["status"] == "Optimal"
+    assert cbc["total_cost"] == pytest.approx(highs["total_cost"], rel=1e-7)
+
+
+def test_eligibility():
+    costs, holding = np.ones((2, 7)), np.ones(2)
+    assert is_fast_path_eligible(costs, holding, np.array([1.0, np.inf]))
+    assert not is_fast_path_eligible(costs, holding, np.array([1.0, np.nan]))
+    assert not is_fast_path_eligible(-costs, holding)
+    assert not is_fast_path_eligible(costs, np.array([1.0, np.inf]))
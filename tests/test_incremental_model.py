@@ -0,0 +1,92 @@
+import pytest
+
+import ordering_model as om
+from incremental_model import IncrementalOrderingModel, solve_in_session, solve_resident
+from sparse_model import build_sparse_model, model_inputs, solve_sparse_model
+
+EXPIRY = {"Milk Foam": 2, "Steamed Milk": 3}
+MOQ = {"Milk Foam": 40.0, "Steamed Milk": 60.0}
+
+
+def _cold(inputs):
+    return om.enhanced_solve_ordering_plan(**inputs, use_fast_path=False, backend="highs")
+
+
+def _model(presolve=True):
+    model = IncrementalOrderingModel()
+    if not presolve:
+        # Presolve alone solves these small LPs, which would hide the simplex iterations
+        model.highs.setOptionValue("presolve", "off")
+    return model
+
+
+def test_cost_only_edit_reuses_the_basis(default_inputs):
+    inputs = dict(default_inputs, expiry_days=EXPIRY, stockout_costs={ing: 20.0 for ing in om.INGREDIENTS})
+    model = _model(presolve=False)
+    first = model.update(**inputs).solve()
+    assert first["status"] == "Optimal" and not first["warm_start"]
+    for rate in (0.3, 0.45):
+        edited = dict(inputs, thursday_discount_rate=rate)
+        model.update(**edited)
+        assert model.highs.getBasis().valid  # only costs were pushed: HiGHS kept its basis
+        warm = model.solve()
+        cold = _model(presolve=False).update(**edited).solve()
+        assert warm["warm_start"] and not cold["warm_start"]
+        assert warm["iterations"] < cold["iterations"] / 5
+        assert warm["total_cost"] == pytest.approx(_cold(edited)["total_cost"], rel=1e-9)
+    assert (model.rebuilds, model.updates) == (1, 2)
+
+
+def test_demand_edit_pushes_row_bounds(default_inputs):
+    inputs = dict(default_inputs, expiry_days=EXPIRY)
+    model = _model()
+    model.update(**inputs).solve()
+    demand = {ing: dict(days) for ing, days in inputs["demand"].items()}
+    demand["Coffee Beans"][2] += 3.0
+    edited = dict(inputs, demand=demand)
+    result = model.update(**edited).solve()
+    assert result["warm_start"] and model.rebuilds == 1
+    assert result["total_cost"] == pytest.approx(_cold(edited)["total_cost"], rel=1e-9)
+
+
+def test_structural_change_reloads(default_inputs):
+    model = _model()
+    model.update(**default_inputs, expiry_days=EXPIRY).solve()
+    result = model.update(**default_inputs, expiry_days={"Milk Foam": 3}).solve()
+    assert not result["warm_start"] and model.rebuilds == 2
+    assert result["total_cost"] == pytest.approx(
+        _cold(dict(default_inputs, expiry_days={"Milk Foam": 3}))["total_cost"], rel=1e-9)
+
+
+def test_mip_starts_from_the_previous_plan(default_inputs):
+    state = {}
+    inputs = dict(default_inputs, expiry_days=EXPIRY, min_order_quantities=MOQ)
+    first = solve_in_session(state, **inputs)
+    assert first["status"] == "Optimal" and not first["warm_start"]
+    for rate in (0.2, 0.25):
+        edited = dict(inputs, thursday_discount_rate=rate)
+        result = solve_in_session(state, **edited)
+        assert result["warm_start"]
+        assert result["total_cost"] == pytest.approx(_cold(edited)["total_cost"], rel=1e-7)
+    assert state["incremental_ordering_model"].rebuilds == 1
+
+
+def test_solve_resident_matches_a_fresh_solver(random_inputs):
+    options = [{}, {"expiry_days": EXPIRY}, {"expiry_days": EXPIRY, "min_order_quantities": MOQ}]
+    for seed in range(3):
+        for rate in (0.1, 0.3):
+            for extra in options:
+                inputs = dict(random_inputs(seed), thursday_discount_rate=rate, **extra)
+                model = build_sparse_model(**model_inputs(**inputs))
+                stats = {}
+                status, objective, _ = solve_resident(model, stats=stats)
+                expected = solve_sparse_model(model)
+                assert status == expected[0] == "Optimal"
+                assert objective == pytest.approx(expected[1], rel=1e-7)
+                assert stats["persistent"]
+    model = build_sparse_model(**model_inputs(**random_inputs(0)))
+    solve_resident(model)
+    stats = {}
+    solve_resident(build_sparse_model(**model_inputs(**dict(random_inputs(0), thursday_discount_rate=0.05))),
+                   stats=stats)
+    assert stats["warm_start"]
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+import ordering_model as om
+from lp_sensitivity import SENSITIVITY_PARAMETERS, first_order_estimates, sensitivity_report
+
+VALUES = {"thursday_discount": np.linspace(0.0, 0.6, 13), "holding_cost_factor": np.linspace(0.2, 3.0, 15),
+          "demand_factor": np.linspace(0.5, 1.5, 11)}
+
+
+def resolve(inputs, options, parameter_name, value):
+    """Total cost re-solved from scratch (HiGHS, no fast path) with the parameter set to ``value``."""
+    inputs = dict(inputs)
+    if parameter_name == "thursday_discount":
+        inputs["thursday_discount_rate"] = value
+    elif parameter_name == "holding_cost_factor":
+        inputs["holding_costs"] = {ing: cost * value for ing, cost in inputs["holding_costs"].items()}
+    else:
+        inputs["demand"] = {ing: {day: kg * value for day, kg in days.items()}
+                            for ing, days in inputs["demand"].items()}
+    result = om.enhanced_solve_ordering_plan(**inputs, **options, use_fast_path=False, backend="highs")
+    assert result["status"] == "Optimal"
+    return result["total_cost"]
+
+
+def _options(seed):
+    rng = np.random.default_rng(300 + seed)
+    options = {}
+    if seed % 2:
+        options["stockout_costs"] = {ing: float(rng.uniform(5, 40)) for ing in om.INGREDIENTS}
+    if seed % 3 == 2:
+        options["expiry_days"] = {om.INGREDIENTS[1]: 2, om.INGREDIENTS[2]: 3}  # HiGHS ranging path
+    return options
+
+
+@pytest.mark.parametrize("seed", range(6))
+@pytest.mark.parametrize("parameter_name", SENSITIVITY_PARAMETERS)
+def test_estimates_in_range_match_resolves(random_inputs, seed, parameter_name):
+    inputs, options = random_inputs(seed), _options(seed)
+    report = sensitivity_report(**inputs, **options)
+    assert report["source"] == ("highs" if "expiry_days" in options else "analytic")
+    estimates = first_order_estimates(report, parameter_name, VALUES[parameter_name])
+    assert any(in_range for _, _, in_range in estimates)
+    for value, estimate, in_range in estimates:
+        cost = resolve(inputs, options, parameter_name, value)
+        if in_range:
+            assert estimate == pytest.approx(cost, rel=1e-7, abs=1e-6)
+        elif parameter_name == "demand_factor":
+            assert estimate <= cost + 1e-6  # the cost is convex in demand
+        else:
+            assert estimate >= cost - 1e-6  # and concave in the costs
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_report_matches_the_solver(random_inputs, seed):
+    inputs, options = random_inputs(seed), _options(seed)
+    report = sensitivity_report(**inputs, **options)
+    result = om.enhanced_solve_ordering_plan(**inputs, **options, output="arrays")
+    assert report["total_cost"] == pytest.approx(result["total_cost"], rel=1e-7)
+    assert report["orders"].shape == (len(om.INGREDIENTS), len(om.DAYS))
+
+
+def test_balance_duals_price_extra_demand(random_inputs):
+    inputs = random_inputs(0)
+    report = sensitivity_report(**inputs)
+    base = report["total_cost"]
+    for ing_index, day in [(0, 0), (1, 3), (2, 6), (3, 5)]:
+        ing = om.INGREDIENTS[ing_index]
+        bumped = {i: dict(days) for i, days in inputs["demand"].items()}
+        bumped[ing][day] += 1.0
+        cost = om.enhanced_solve_ordering_plan(**{**inputs, "demand": bumped}, use_fast_path=False,
+                                               backend="highs")["total_cost"]
+        assert cost - base == pytest.approx(report["balance_duals"][ing_index, day], rel=1e-7, abs=1e-7)
+
+
+def test_moq_has_no_duals(default_inputs):
+    with pytest.raises(ValueError):
+        sensitivity_report(**default_inputs, min_order_quantities={om.INGREDIENTS[0]: 5.0})
+    with pytest.raises(ValueError):
+        om.enhanced_solve_ordering_plan(**default_inputs, min_order_quantities={om.INGREDIENTS[0]: 5.0},
+                                        sensitivity=True)
@@ -0,0 +1,91 @@
+import threading
+
+import numpy as np
+import pytest
+
+import ordering_model as om
+from menu_registry import DEFAULT_MENU, Menu, MenuRegistry
+
+RECIPE = {"Coffee Beans": 0.02, "Steamed Milk": 0.15}
+SALES = [10, 12, 14, 16, 18, 20, 22]
+
+
+def test_snapshots_are_read_only():
+    menu = DEFAULT_MENU
+    with pytest.raises(TypeError):
+        menu.recipes["Coffee Beans"]["Latte"] = 1.0
+    with pytest.raises(TypeError):
+        menu.recipes["Sugar"] = {}
+    with pytest.raises(TypeError):
+        menu.default_sales["Latte"] = SALES
+    with pytest.raises(ValueError):
+        menu.recipe[0, 0] = 1.0
+    with pytest.raises(ValueError):
+        menu.default_sales[om.DRINKS[0]][0] = 1.0
+    assert isinstance(menu.drinks, tuple)
+
+
+def test_snapshot_is_a_copy_of_its_inputs():
+    recipes = {ing: dict(drinks) for ing, drinks in om.KG_PER_DRINK.items()}
+    sales = {drink: np.array(days, dtype=float) for drink, days in om.PREDICTED_SALES.items()}
+    menu = Menu(om.DRINKS, recipes, sales)
+    before = menu.recipe.copy()
+    recipes["Coffee Beans"][om.DRINKS[0]] = 99.0
+    sales[om.DRINKS[0]][0] = -1.0
+    assert np.array_equal(menu.recipe, before) and menu.default_sales[om.DRINKS[0]][0] != -1.0
+
+
+def test_add_drink_makes_a_new_version():
+    registry = MenuRegistry()
+    old = registry.current()
+    assert registry.add_drink("Flat White", RECIPE, SALES)[0]
+    new = registry.current()
+    assert new is not old and new.version > old.version
+    assert old.drinks == DEFAULT_MENU.drinks and "Flat White" not in old.recipes["Coffee Beans"]
+    assert new.drinks == old.drinks + ("Flat White",)
+    assert new.recipes["Steamed Milk"]["Flat White"] == 0.15 and new.recipes["Milk Foam"]["Flat White"] == 0.0
+    assert new.recipe.shape == (len(om.INGREDIENTS), len(old.drinks) + 1)
+    # The old drinks' demand is unchanged; the new drink adds its own
+    sales = {drink: new.default_sales[drink] for drink in new.drinks}
+    demand, base = new.demand_from_sales(sales), old.demand_from_sales(sales)
+    for ing in om.INGREDIENTS:
+        for day in om.DAYS:
+            assert demand[ing][day] == pytest.approx(base[ing][day] + RECIPE.get(ing, 0.0) * SALES[day])
+
+
+def test_duplicate_drink_is_rejected_without_a_new_version():
+    registry = MenuRegistry()
+    menu = registry.current()
+    success, message = registry.add_drink(om.DRINKS[0], RECIPE, SALES)
+    assert not success and om.DRINKS[0] in message
+    assert registry.current() is menu
+
+
+def test_registries_and_forks_are_independent():
+    session_a, session_b = MenuRegistry(), MenuRegistry()
+    session_a.add_drink("Flat White", RECIPE, SALES)
+    scenario = session_a.fork()
+    scenario.add_drink("Cortado", RECIPE, SALES)
+    assert "Flat White" not in session_b.current().drinks
+    assert "Cortado" not in session_a.current().drinks
+    assert scenario.current().drinks[-2:] == ("Flat White", "Cortado")
+    assert DEFAULT_MENU.drinks == tuple(om.DRINKS)
+
+
+def test_concurrent_adds_all_land():
+    registry = MenuRegistry()
+    seen = []
+
+    def add(i):
+        registry.add_drink(f"Drink {i}", RECIPE, SALES)
+        seen.append(registry.current().version)
+
+    threads = [threading.Thread(target=add, args=(i,)) for i in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    menu = registry.current()
+    assert len(menu.drinks) == len(om.DRINKS) + 16
+    assert menu.recipe.shape[1] == len(menu.drinks)
+    assert menu.version == max(seen)
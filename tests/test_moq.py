@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+import ordering_model as om
+from fast_solver import solve_moq_lot_sizing
+
+
+def _moq_options(seed):
+    rng = np.random.default_rng(200 + seed)
+    ordering_days = sorted({0, *rng.choice(om.DAYS, size=rng.integers(1, 6), replace=False).tolist()})
+    moq = {ing: float(rng.choice([0.0, rng.uniform(0.5, 20)])) for ing in om.INGREDIENTS}
+    moq[om.INGREDIENTS[seed % len(om.INGREDIENTS)]] = float(rng.uniform(0.5, 20))  # at least one MOQ
+    return dict(min_order_quantities=moq, ordering_days=ordering_days)
+
+
+@pytest.mark.parametrize("seed", range(12))
+def test_moq_dynamic_program_matches_mip(random_inputs, seed):
+    inputs, options = random_inputs(seed), _moq_options(seed)
+    dp = om.enhanced_solve_ordering_plan(**inputs, **options, output="arrays")
+    assert dp["diagnostics"]["backend"] == "numpy"
+    for moq_mode in om.MOQ_MODES:
+        mip = om.enhanced_solve_ordering_plan(**inputs, **options, output="arrays", use_fast_path=False,
+                                              moq_mode=moq_mode)
+        assert dp["status"] == mip["status"]
+        if mip["status"] == "Optimal":
+            assert dp["total_cost"] == pytest.approx(mip["total_cost"], rel=1e-7, abs=1e-6)
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_moq_plan_is_feasible(random_inputs, seed):
+    inputs, options = random_inputs(seed), _moq_options(seed)
+    result = om.enhanced_solve_ordering_plan(**inputs, **options, output="arrays")
+    if result["status"] != "Optimal":
+        pytest.skip("infeasible instance")
+    orders, inventory = result["order_plan"], result["inventory_levels"]
+    demand = np.array([[inputs["demand"][ing][day] for day in om.DAYS] for ing in om.INGREDIENTS])
+    moq = np.array([options["min_order_quantities"][ing] for ing in om.INGREDIENTS])
+    assert np.all((orders == 0) | (orders >= moq[:, None] - 1e-6))
+    assert np.allclose(inventory, np.cumsum(orders - demand, axis=1), atol=1e-6)
+    closed = [day for day in om.DAYS if day not in options["ordering_days"]]
+    assert np.allclose(orders[:, closed], 0.0)
+
+
+def test_moq_lot_sizing_small_case():
+    # Demand 3/day, MOQ 10: one order of 10 on day 0 covers three days, a second order covers the rest
+    solution = solve_moq_lot_sizing(np.full(5, 3.0), np.ones(5), 0.1, np.ones(5, dtype=bool), 10.0)
+    assert np.all((solution["orders"] == 0) | (solution["orders"] >= 10 - 1e-9))
+    assert solution["orders"].sum() >= 15 - 1e-9
+    assert np.all(solution["inventory"] >= -1e-9)
+
+
+def test_moq_lot_sizing_state_limit():
+    assert solve_moq_lot_sizing(np.full(7, 1000.0), np.ones(7), 0.1, np.ones(7, dtype=bool), 0.1,
+                                max_states=100) is None
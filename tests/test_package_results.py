@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+import ordering_model as om
+
+OPTIONS = dict(expiry_days={"Milk Foam": 2}, stockout_costs={ing: 25.0 for ing in om.INGREDIENTS})
+
+
+def _blocks():
+    rng = np.random.default_rng(0)
+    shape = (len(om.INGREDIENTS), len(om.DAYS))
+    return {"order_plan": rng.uniform(0, 10, shape), "inventory_levels": rng.uniform(-1e-9, 1e-6, shape)}
+
+
+def test_arrays():
+    blocks = _blocks()
+    results = om.package_results({"status": "Optimal"}, blocks, "arrays")
+    assert results["ingredients"] == om.INGREDIENTS and results["days"] == om.DAY_NAMES
+    assert np.array_equal(results["order_plan"], blocks["order_plan"])
+    assert np.array_equal(results["inventory_levels"], np.zeros_like(blocks["inventory_levels"]))  # noise is 0
+    assert not any(key.endswith("_df") for key in results)
+
+
+def test_arrow_is_long_format():
+    pytest.importorskip("pyarrow")
+    blocks = _blocks()
+    results = om.package_results({}, blocks, "arrow", ingredients=["a", "b", "c", "d"], day_names=range(7))
+    table = results["plan_table"]
+    assert table.column_names == ["ingredient", "day", "order_kg", "inventory_kg"]
+    assert table.num_rows == blocks["order_plan"].size
+    frame = table.to_pandas()
+    assert list(frame["ingredient"][:8]) == ["a"] * 7 + ["b"] and list(frame["day"][:8]) == [*range(7), 0]
+    assert np.array_equal(frame["order_kg"].to_numpy().reshape(4, 7), blocks["order_plan"])
+
+
+@pytest.mark.parametrize("backend", om.SOLVER_BACKENDS)
+@pytest.mark.parametrize("use_fast_path", [True, False])
+def test_formats_agree_on_a_solve(default_inputs, backend, use_fast_path):
+    solve = dict(default_inputs, **OPTIONS, backend=backend, use_fast_path=use_fast_path)
+    frames = om.enhanced_solve_ordering_plan(**solve)
+    arrays = om.enhanced_solve_ordering_plan(**solve, output="arrays")
+    for name in ("order_plan", "inventory_levels", "stockout_levels", "waste_levels"):
+        assert np.allclose(arrays[name], frames[f"{name}_df"].to_numpy(), atol=1e-9)
+    assert arrays["total_cost"] == pytest.approx(frames["total_cost"], rel=1e-9)
+    pytest.importorskip("pyarrow")
+    table = om.enhanced_solve_ordering_plan(**solve, output="arrow")["plan_table"].to_pandas()
+    assert list(table.columns) == ["ingredient", "day", "order_kg", "inventory_kg", "stockout_kg", "waste_kg"]
+    pivot = table.pivot(index="ingredient", columns="day", values="order_kg").loc[om.INGREDIENTS, om.DAY_NAMES]
+    assert np.allclose(pivot.to_numpy(), arrays["order_plan"], atol=1e-9)
+
+
+def test_unknown_output(default_inputs):
+    with pytest.raises(ValueError):
+        om.package_results({}, _blocks(), "csv")
+    with pytest.raises(ValueError):
+        om.enhanced_solve_ordering_plan(**default_inputs, output="csv")
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+import ordering_model as om
+from parametric import curve_cost, parametric_cost_curve
+from test_lp_sensitivity import resolve
+
+RANGES = {"thursday_discount": (0.0, 0.5), "holding_cost_factor": (0.1, 5.0), "demand_factor": (0.5, 2.0)}
+
+
+def _curve(inputs, options, parameter_name):
+    low, high = RANGES[parameter_name]
+    return parametric_cost_curve(inputs["demand"], inputs["standard_costs"], inputs["holding_costs"],
+                                 parameter_name, low, high, thursday_discount=inputs["thursday_discount_rate"],
+                                 **options)
+
+
+@pytest.mark.parametrize("options", [{}, {"expiry_days": {"Milk Foam": 2, "Steamed Milk": 3}},
+                                     {"stockout_costs": {ing: 12.0 for ing in om.INGREDIENTS}}],
+                         ids=["plain", "expiry", "stockouts"])
+@pytest.mark.parametrize("parameter_name", list(RANGES))
+def test_curve_matches_direct_solves(default_inputs, options, parameter_name):
+    curve = _curve(default_inputs, options, parameter_name)
+    low, high = RANGES[parameter_name]
+    values = np.linspace(low, high, 25)
+    expected = [resolve(default_inputs, options, parameter_name, value) for value in values]
+    assert curve_cost(curve, values) == pytest.approx(expected, rel=1e-7, abs=1e-6)
+    # Breakpoints are exact: the curve matches a re-solve there as well
+    for value, cost in zip(curve["breakpoints"], curve_cost(curve, curve["breakpoints"])):
+        assert cost == pytest.approx(resolve(default_inputs, options, parameter_name, value), rel=1e-7)
+
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("parameter_name", ["thursday_discount", "holding_cost_factor"])
+def test_segments(random_inputs, seed, parameter_name):
+    inputs = random_inputs(seed)
+    curve = _curve(inputs, {}, parameter_name)
+    segments = curve["segments"]
+    low, high = RANGES[parameter_name]
+    assert segments[0]["start"] == low and segments[-1]["end"] == high
+    for left, right in zip(segments, segments[1:]):
+        assert left["end"] == right["start"]
+        assert left["cost_end"] == pytest.approx(right["cost_start"], rel=1e-9)  # continuous
+        assert right["slope"] != pytest.approx(left["slope"], rel=1e-9)  # a real kink
+    # Concave in a cost parameter: slopes decrease
+    slopes = [segment["slope"] for segment in segments]
+    assert all(b <= a + 1e-9 for a, b in zip(slopes, slopes[1:]))
+    # About two solves per breakpoint, not one per sample
+    assert curve["solves"] <= 2 * len(curve["breakpoints"]) + 3
+
+
+def test_segment_plan_is_optimal_on_the_segment(default_inputs):
+    curve = _curve(default_inputs, {}, "thursday_discount")
+    standard = np.array([default_inputs["standard_costs"][ing] for ing in om.INGREDIENTS])
+    holding = np.array([default_inputs["holding_costs"][ing] for ing in om.INGREDIENTS])
+    for segment in curve["segments"]:
+        middle = (segment["start"] + segment["end"]) / 2
+        day_factor = np.ones(len(om.DAYS))
+        day_factor[om.DISCOUNT_DAYS] = 1 - middle
+        plan_cost = ((standard[:, None] * day_factor * segment["orders"]).sum()
+                     + (holding * segment["inventory"].sum(axis=1)).sum())
+        assert plan_cost == pytest.approx(resolve(default_inputs, {}, "thursday_discount", middle), rel=1e-7)
+
+
+def test_demand_factor_is_linear_without_moq(default_inputs):
+    curve = _curve(default_inputs, {}, "demand_factor")
+    assert curve["breakpoints"] == [] and curve["solves"] == 2
+
+
+def test_bad_input(default_inputs):
+    with pytest.raises(ValueError):
+        parametric_cost_curve(default_inputs["demand"], default_inputs["standard_costs"],
+                              default_inputs["holding_costs"], "thursday_discount", 0.3, 0.1)
+    with pytest.raises(ValueError):
+        parametric_cost_curve(default_inputs["demand"], default_inputs["standard_costs"],
+                              default_inputs["holding_costs"], "unknown", 0.0, 1.0)
+
+
+def test_solve_budget(default_inputs):
+    with pytest.raises(RuntimeError, match="more than 3 solves"):
+        parametric_cost_curve(default_inputs["demand"], default_inputs["standard_costs"],
+                              default_inputs["holding_costs"], "thursday_discount", 0.0, 0.5, max_solves=3)
@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+import ordering_model as om
+from plan_simulation import PATH_METRICS, simulate_plan, simulate_results, summarize_simulation
+
+
+def _replay(orders, demand, life, start=0.0):
+    """One item and one path with explicit FIFO cohorts: (lost, wasted, held, end)."""
+    cohorts = [[None, start]]  # [order day, kg]; the initial stock does not expire
+    lost = wasted = held = 0.0
+    for day, (order, need) in enumerate(zip(orders, demand)):
+        cohorts.append([day, order])
+        for cohort in cohorts:  # oldest first
+            used = min(cohort[1], need)
+            cohort[1] -= used
+            need -= used
+        lost += need
+        for cohort in cohorts:
+            if life and cohort[0] is not None and cohort[0] + life - 1 == day:
+                wasted += cohort[1]
+                cohort[1] = 0.0
+        held += sum(kg for _, kg in cohorts)
+    return lost, wasted, held, sum(kg for _, kg in cohorts)
+
+
+def test_cohorts_age_and_expire():
+    # Perishable item (2 days) and the same plan for a non-perishable one
+    orders = np.array([[10.0, 0.0, 5.0, 0.0], [10.0, 0.0, 5.0, 0.0]])
+    demand = np.full((1, 2, 4), 3.0)
+    simulation = simulate_plan(orders, demand, 1.0, [1.0, 1.0], stockout_costs=[10.0, 10.0], shelf_life=[2, 0])
+    # Day 0 leaves 7, 4 of which expire at the end of day 1; day 3 is 1 kg short
+    assert simulation["waste_kg"][0].tolist() == [4.0, 0.0]
+    assert simulation["stockout_kg"][0].tolist() == [1.0, 0.0]
+    assert simulation["end_inventory_kg"][0].tolist() == [0.0, 3.0]
+    assert simulation["holding_cost"][0] == 9.0 + 20.0
+    assert simulation["stockout_cost"][0] == 10.0
+    assert simulation["purchase_cost"] == 30.0
+    assert simulation["total_cost"][0] == 30.0 + 29.0 + 10.0
+    assert simulation["fill_rate"][0] == pytest.approx(1 - 1 / 24)
+
+
+def test_oldest_stock_is_issued_first():
+    # FIFO serves day 1 from day 0's order, so only 1 kg of it expires and day 1's 5 kg are held
+    simulation = simulate_plan(np.array([[5.0, 5.0, 0.0]]), np.array([[[0.0, 4.0, 0.0]]]), 0.0, [1.0],
+                               shelf_life=[2])
+    assert simulation["holding_cost"][0] == 5.0 + 5.0 + 0.0
+    assert simulation["waste_kg"][0, 0] == 6.0
+
+
+def test_initial_stock_does_not_expire():
+    simulation = simulate_plan(np.zeros((1, 4)), np.array([[[1.0, 0.0, 0.0, 1.0]]]), 0.0, [0.0],
+                               shelf_life=[2], initial_inventory=[3.0])
+    assert simulation["waste_kg"][0, 0] == 0.0 and simulation["end_inventory_kg"][0, 0] == 1.0
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_matches_a_scalar_replay(seed):
+    rng = np.random.default_rng(seed)
+    n_items, n_days = 4, 7
+    orders = np.where(rng.random((n_items, n_days)) < 0.5, rng.uniform(0, 30, (n_items, n_days)), 0.0)
+    demand = rng.uniform(0, 12, (50, n_items, n_days))
+    life = np.array([0, 1, 2, 4])
+    start = rng.uniform(0, 5, n_items)
+    simulation = simulate_plan(orders, demand, 1.0, np.ones(n_items), shelf_life=life, initial_inventory=start)
+    for path in range(len(demand)):
+        for item in range(n_items):
+            lost, wasted, held, end = _replay(orders[item], demand[path, item], life[item], start[item])
+            assert simulation["stockout_kg"][path, item] == pytest.approx(lost, abs=1e-9)
+            assert simulation["waste_kg"][path, item] == pytest.approx(wasted, abs=1e-9)
+            assert simulation["end_inventory_kg"][path, item] == pytest.approx(end, abs=1e-9)
+        assert simulation["holding_cost"][path] == pytest.approx(
+            sum(_replay(orders[i], demand[path, i], life[i], start[i])[2] for i in range(n_items)), abs=1e-9)
+
+
+def test_results_and_summary(default_inputs):
+    expiry = {"Milk Foam": 2}
+    result = om.enhanced_solve_ordering_plan(**default_inputs, expiry_days=expiry)
+    demand = np.array([[default_inputs["demand"][ing][day] for day in om.DAYS] for ing in om.INGREDIENTS])
+    paths = demand[None] * np.random.default_rng(0).uniform(0.8, 1.2, (200, 1, 1))
+    simulation = simulate_results(result, paths, default_inputs["standard_costs"],
+                                  default_inputs["thursday_discount_rate"], default_inputs["holding_costs"],
+                                  expiry_days=expiry)
+    exact = simulate_results(result, demand[None], default_inputs["standard_costs"],
+                             default_inputs["thursday_discount_rate"], default_inputs["holding_costs"],
+                             expiry_days=expiry)
+    assert exact["total_cost"][0] == pytest.approx(result["total_cost"], rel=1e-9)
+    assert exact["fill_rate"][0] == pytest.approx(1.0)
+    summary = summarize_simulation(simulation)
+    assert list(summary.index) == list(PATH_METRICS)
+    assert list(summary.columns) == ["mean", "std", "p5", "p50", "p95"]
+    assert summary.loc["total_cost", "mean"] == pytest.approx(simulation["total_cost"].mean())
+    assert summary.loc["waste_kg", "p50"] == pytest.approx(np.median(simulation["waste_kg"].sum(axis=1)))
@@ -0,0 +1,106 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+import ordering_model as om
+from job_executor import JobExecutor
+from planning_service import PlanningService, make_server
+
+
+@pytest.fixture(scope="module")
+def service_url():
+    service = PlanningService(executor=JobExecutor(max_workers=1, cache=None))
+    server = make_server(port=0, service=service)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", service
+    server.shutdown()
+    server.server_close()
+    service.close()
+
+
+def request(url, path, body=None, raw=None):
+    data = raw if raw is not None else (None if body is None else json.dumps(body).encode("utf-8"))
+    req = urllib.request.Request(url + path, data=data, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=60) as response:
+            return response.status, json.load(response)
+    except urllib.error.HTTPError as error:
+        return error.code, json.load(error)
+
+
+def test_health(service_url):
+    url, _ = service_url
+    code, payload = request(url, "/health")
+    assert code == 200 and payload["status"] == "ok"
+
+
+def test_solve_matches_the_solver(service_url):
+    url, _ = service_url
+    code, payload = request(url, "/solve", {})
+    expected = om.solve_ordering_plan(om.calculate_demand_from_sales(om.PREDICTED_SALES),
+                                      om.DEFAULT_STANDARD_COSTS, om.DEFAULT_THURSDAY_DISCOUNT_RATE,
+                                      om.DEFAULT_HOLDING_COSTS)
+    assert code == 200 and payload["status"] == "Optimal"
+    assert payload["total_cost"] == pytest.approx(expected["total_cost"], rel=1e-9)
+    assert payload["ingredients"] == om.INGREDIENTS
+
+
+def test_enhanced_solve_in_the_pool(service_url):
+    url, _ = service_url
+    body = {"min_order_quantities": {"Milk Foam": 5}, "stockout_costs": {"Coffee Beans": 100.0}}
+    code, payload = request(url, "/enhanced_solve", body)
+    assert code == 200 and payload["status"] == "Optimal"
+    assert payload["diagnostics"]["backend"] == "cbc"
+
+
+def test_partial_stockout_costs_are_not_free(service_url):
+    url, _ = service_url
+    _, plain = request(url, "/enhanced_solve", {})
+    code, partial = request(url, "/enhanced_solve", {"stockout_costs": {"Coffee Beans": 100.0}})
+    assert code == 200
+    assert partial["total_cost"] == pytest.approx(plain["total_cost"], rel=1e-9)
+
+
+def test_sensitivity(service_url):
+    url, _ = service_url
+    code, payload = request(url, "/sensitivity", {"parameter_name": "demand_factor", "values": [0.5, 1.0]})
+    assert code == 200
+    costs = [point["total_cost"] for point in payload["points"]]
+    assert costs[0] == pytest.approx(costs[1] / 2, rel=1e-9)
+
+
+@pytest.mark.parametrize("path, body", [
+    ("/solve", {"unknown": 1}),
+    ("/solve", {"demand": {"Coffee Beans": [1] * 7}}),
+    ("/solve", {"backend": "gurobi"}),
+    ("/enhanced_solve", {"stockout_costs": {"Sugar": 1.0}}),
+    ("/enhanced_solve", {"demand": {ing: [1, 2] for ing in om.INGREDIENTS}}),
+    ("/sensitivity", {"parameter_name": "demand_factor"}),
+    ("/demand_from_sales", {}),
+])
+def test_bad_input_is_400(service_url, path, body):
+    url, _ = service_url
+    code, payload = request(url, path, body)
+    assert code == 400 and payload["error"]
+
+
+def test_bad_json_is_400(service_url):
+    url, _ = service_url
+    code, payload = request(url, "/solve", raw=b"{not json")
+    assert code == 400 and "error" in payload
+
+
+def test_unknown_endpoint_is_404(service_url):
+    url, _ = service_url
+    assert request(url, "/nowhere", {})[0] == 404
+
+
+def test_timeout_is_504(service_url, monkeypatch):
+    url, service = service_url
+    monkeypatch.setattr(service, "request_timeout", 1e-4)
+    code, payload = request(url, "/enhanced_solve", {"min_order_quantities": {"Steamed Milk": 7.25}})
+    assert code == 504 and "did not finish" in payload["error"]
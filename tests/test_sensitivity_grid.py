@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+import ordering_model as om
+
+DISCOUNTS = [0.0, 0.15, 0.4]
+HOLDING_FACTORS = [0.5, 1.0, 2.5]
+DEMAND_FACTORS = [0.8, 1.3]
+
+
+def _pointwise(inputs, discount, holding_factor, demand_factor, ordering_days=None):
+    return om.enhanced_solve_ordering_plan(
+        {ing: {day: kg * demand_factor for day, kg in days.items()} for ing, days in inputs["demand"].items()},
+        inputs["standard_costs"], discount,
+        {ing: cost * holding_factor for ing, cost in inputs["holding_costs"].items()},
+        ordering_days=ordering_days, use_fast_path=False, backend="highs", output="arrays")
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_grid_matches_pointwise_solves(random_inputs, seed):
+    inputs = random_inputs(seed)
+    ordering_days = None if seed == 0 else [0, 2, 3, 5]
+    grid = om.run_sensitivity_grid(inputs["demand"], inputs["standard_costs"], inputs["holding_costs"],
+                                   DISCOUNTS, HOLDING_FACTORS, DEMAND_FACTORS, ordering_days=ordering_days)
+    n_cells = len(om.INGREDIENTS) * len(om.DAYS)
+    assert len(grid) == len(DISCOUNTS) * len(HOLDING_FACTORS) * len(DEMAND_FACTORS) * n_cells
+    for (discount, holding_factor, demand_factor), point in grid.groupby(
+            ["thursday_discount", "holding_cost_factor", "demand_factor"], sort=False):
+        expected = _pointwise(inputs, discount, holding_factor, demand_factor, ordering_days)
+        assert (point["status"] == expected["status"]).all()
+        assert point["total_cost"].iloc[0] == pytest.approx(expected["total_cost"], rel=1e-7, abs=1e-6)
+        # The tidy rows are ingredient-major, one per day
+        orders = point["order_kg"].to_numpy().reshape(len(om.INGREDIENTS), len(om.DAYS))
+        assert list(point["ingredient"].iloc[::len(om.DAYS)]) == om.INGREDIENTS
+        assert list(point["day"].iloc[:len(om.DAYS)]) == om.DAY_NAMES
+        if ordering_days is not None:
+            closed = [day for day in om.DAYS if day not in ordering_days]
+            assert np.all(orders[:, closed] == 0.0)
+
+
+def test_scalar_axes_and_cbc_fallback(default_inputs):
+    # A discount above 100% gives negative Thursday prices: outside the fast path, solved by CBC
+    grid = om.run_sensitivity_grid(default_inputs["demand"], default_inputs["standard_costs"],
+                                   default_inputs["holding_costs"], [0.15, 1.2])
+    assert list(grid["thursday_discount"].unique()) == [0.15, 1.2]
+    assert set(grid["holding_cost_factor"]) == {1.0} and set(grid["demand_factor"]) == {1.0}
+    points = grid.groupby("thursday_discount", sort=False)[["status", "total_cost"]].first()
+    for discount, point in points.iterrows():
+        cbc = om.enhanced_solve_ordering_plan(**dict(default_inputs, thursday_discount_rate=discount),
+                                              use_fast_path=False)
+        assert point["status"] == cbc["status"] == "Optimal"
+        assert point["total_cost"] == pytest.approx(cbc["total_cost"], rel=1e-7)
@@ -0,0 +1,105 @@
+import importlib
+import sys
+
+import numpy as np
+import pytest
+
+import ordering_model as om
+from solve_cache import SolveCache, cache_key, solver_code_hash
+
+
+def _counting_solver(status="Optimal"):
+    calls = []
+
+    def solver(**inputs):
+        calls.append(inputs)
+        return {"status": status, "total_cost": float(len(calls)), "diagnostics": {}}
+    return solver, calls
+
+
+def test_key_ignores_representation_but_not_values(default_inputs):
+    solver = om.enhanced_solve_ordering_plan
+    key = cache_key(solver, **default_inputs)
+    reordered = {ing: dict(reversed(list(days.items())))
+                 for ing, days in reversed(list(default_inputs["demand"].items()))}
+    assert cache_key(solver, **dict(default_inputs, demand=reordered)) == key
+    assert cache_key(solver, **default_inputs, ordering_days=[0, 2, 3]) == \
+        cache_key(solver, **default_inputs, ordering_days=np.array([0.0, 2.0, 3.0]))
+    assert cache_key(solver, **dict(default_inputs, thursday_discount_rate=0.16)) != key
+    assert cache_key(solver, **default_inputs, expiry_days=None) != key  # an explicit default is another call
+    assert cache_key(om.solve_ordering_plan, **default_inputs) != key
+    with pytest.raises(TypeError):
+        cache_key(solver, demand=object())
+
+
+def test_lru_eviction():
+    cache = SolveCache(max_entries=2)
+    for key in "abc":
+        cache.put(key, {"key": key})
+        if key == "b":
+            assert cache.get("a") == {"key": "a"}  # a is now the most recent
+    assert cache.get("b") is None
+    assert cache.get("a") == {"key": "a"} and cache.get("c") == {"key": "c"}
+    assert cache.stats() == {"hits": 3, "disk_hits": 0, "misses": 1, "hit_rate": 0.75, "entries": 2,
+                             "max_entries": 2}
+
+
+def test_results_are_copies():
+    cache = SolveCache()
+    result = {"plan": [1.0, 2.0]}
+    cache.put("k", result)
+    result["plan"].append(3.0)
+    cache.get("k")["plan"].append(4.0)
+    assert cache.get("k") == {"plan": [1.0, 2.0]}
+
+
+def test_solve_only_on_a_miss_and_keeps_definitive_outcomes():
+    cache = SolveCache()
+    solver, calls = _counting_solver()
+    first = cache.solve(solver, x=1.0)
+    again = cache.solve(solver, x=1)
+    assert len(calls) == 1 and again["total_cost"] == first["total_cost"]
+    assert again["diagnostics"]["cached"] and "cached" not in first["diagnostics"]
+    cache = SolveCache()
+    limited, limited_calls = _counting_solver("TimeLimitReached")
+    cache.solve(limited, x=1.0)
+    cache.solve(limited, x=1.0)
+    assert len(limited_calls) == 2
+
+
+def test_disk_tier_survives_a_new_cache(tmp_path):
+    solver, calls = _counting_solver()
+    SolveCache(disk_dir=str(tmp_path)).solve(solver, x=2.0)
+    fresh = SolveCache(disk_dir=str(tmp_path))
+    assert fresh.solve(solver, x=2.0)["total_cost"] == 1.0 and len(calls) == 1
+    assert fresh.stats()["disk_hits"] == 1
+    fresh.solve(solver, x=2.0)
+    assert fresh.stats()["hits"] == 1  # promoted to memory
+    fresh.clear(disk=True)
+    assert not list(tmp_path.glob("*.pkl"))
+    assert SolveCache(disk_dir=str(tmp_path)).get(cache_key(solver, x=2.0)) is None
+
+
+def test_corrupt_disk_entry_is_a_miss(tmp_path):
+    cache = SolveCache(disk_dir=str(tmp_path))
+    (tmp_path / "broken.pkl").write_bytes(b"not a pickle")
+    assert cache.get("broken") is None and cache.stats()["misses"] == 1
+
+
+def test_solver_source_change_invalidates(tmp_path, monkeypatch):
+    monkeypatch.syspath_prepend(str(tmp_path))
+    source = tmp_path / "cache_probe_solver.py"
+    source.write_text("def solve(x):\n    return {'status': 'Optimal', 'total_cost': x}\n")
+    importlib.invalidate_caches()
+    probe = importlib.import_module("cache_probe_solver")
+    monkeypatch.delitem(sys.modules, "cache_probe_solver")
+    cache = SolveCache(disk_dir=str(tmp_path / "cache"))
+    key = cache_key(probe.solve, x=1.0)
+    cache.solve(probe.solve, x=1.0)
+    assert cache.get(key) is not None
+
+    source.write_text("def solve(x):\n    return {'status': 'Optimal', 'total_cost': 2 * x}\n")
+    solver_code_hash.cache_clear()  # the hash is computed once per process
+    assert cache_key(probe.solve, x=1.0) != key
+    assert SolveCache(disk_dir=str(tmp_path / "cache")).get(cache_key(probe.solve, x=1.0)) is None
+    solver_code_hash.cache_clear()
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+import ordering_model as om
+from stochastic_model import stochastic_solve_ordering_plan
+
+EXPIRY = {"Milk Foam": 2, "Steamed Milk": 3}
+MOQ = {"Milk Foam": 40.0, "Steamed Milk": 60.0}
+
+
+def _demand_array(inputs):
+    return np.array([[inputs["demand"][ing][day] for day in om.DAYS] for ing in om.INGREDIENTS])
+
+
+@pytest.mark.parametrize("options", [{"expiry_days": EXPIRY},
+                                     {"expiry_days": EXPIRY, "min_order_quantities": MOQ},
+                                     {"expiry_days": EXPIRY, "stockout_costs": {ing: 15.0 for ing in om.INGREDIENTS}}],
+                         ids=["expiry", "expiry_moq", "expiry_stockouts"])
+def test_one_scenario_is_the_deterministic_model(default_inputs, options):
+    expected = om.enhanced_solve_ordering_plan(**default_inputs, **options, use_fast_path=False, backend="highs",
+                                               output="arrays")
+    result = stochastic_solve_ordering_plan(_demand_array(default_inputs)[None], default_inputs["standard_costs"],
+                                            default_inputs["thursday_discount_rate"],
+                                            default_inputs["holding_costs"], output="arrays", **options)
+    assert result["status"] == "Optimal"
+    assert result["total_cost"] == pytest.approx(expected["total_cost"], rel=1e-7)
+    assert result["waste_levels"].sum() == pytest.approx(expected["waste_levels"].sum(), abs=1e-6)
+
+
+def test_stock_is_never_older_than_its_shelf_life(default_inputs):
+    rng = np.random.default_rng(0)
+    scenarios = _demand_array(default_inputs)[None] * rng.uniform(0.6, 1.4, (30, 1, len(om.DAYS)))
+    result = stochastic_solve_ordering_plan(scenarios, default_inputs["standard_costs"],
+                                            default_inputs["thursday_discount_rate"],
+                                            default_inputs["holding_costs"], expiry_days=EXPIRY,
+                                            min_order_quantities=MOQ, output="arrays")
+    assert result["status"] == "Optimal"
+    orders, inventory = result["order_plan"], result["inventory_levels"]  # inventory is the scenario mean
+    for i, life in enumerate(om.shelf_life_array(EXPIRY)):
+        for t in om.DAYS:
+            fresh = orders[i, max(0, t - life + 2):t + 1].sum() if life else np.inf
+            assert inventory[i, t] <= fresh + 1e-6
+        if not life:
+            assert np.allclose(result["waste_levels"][i], 0.0)
+    assert result["waste_levels"].sum() > 1.0  # the MOQs buy more than is used before it expires